@@ -7,17 +7,32 @@ Supports two methods:
 
 Tokens are ~1 hour TTL. AuthSession keeps the browser context alive so the
 itsme session cookies persist, enabling silent re-authentication without
-requiring the user to confirm on their phone again.
+requiring the user to confirm on their phone again. Optionally the context's
+storage state (cookies + localStorage) is saved to disk, so a restart within
+the itsme session lifetime gets a token silently too. With http_refresh, a
+refresh first replays the login redirect chain over plain HTTP with those
+cookies (see oidc_refresh) and only uses the browser if that fails.
 """
 
 import base64
 import json
+import os
 import queue
+import re
 import threading
 import time
 from datetime import datetime, timezone
 
-from constants import SBAT_LOGIN_URL, AVAILABLE_URL
+from constants import SBAT_LOGIN_URL, AVAILABLE_URL, TOKEN_REFRESH_MARGIN, TOKEN_RETRY_INTERVAL, USER_AGENT
+from metrics import TOKEN_REFRESH_DURATION
+from oidc_refresh import FAILED, HttpTokenRefresher, IDP_URL_PATTERN, NEEDS_CONFIRMATION, TOKEN, token_from_callback
+
+# Seconds a silent refresh may stay on the itsme IDP without navigating on
+# before it is treated as waiting for a phone confirmation
+ITSME_GRACE = 5
+# Seconds the interactive login watches the SPA's API requests for a token it
+# restored from localStorage (a session that is still logged in skips itsme)
+STORED_TOKEN_WAIT = 5
 
 
 def _decode_jwt_exp(token):
@@ -41,6 +56,17 @@ def _decode_jwt_exp(token):
     return None
 
 
+# Not needed for the OIDC flow. Analytics are always blocked; stylesheets,
+# images, fonts and media only during silent refresh, when nobody looks at the
+# page (the clicks there target elements that are in the DOM either way).
+_ANALYTICS_URL_PATTERN = re.compile(
+    r"google-analytics\.com|googletagmanager\.com|doubleclick\.net|hotjar\.com|facebook\.net|clarity\.ms"
+)
+_STATIC_URL_PATTERN = re.compile(
+    r"\.(css|png|jpe?g|gif|webp|svg|ico|woff2?|ttf|otf|eot|mp4|webm|mp3)(\?|#|$)", re.IGNORECASE
+)
+
+
 def _capture_token_from_request(request):
     """
     Try to extract a Bearer token from a Playwright request.
@@ -49,15 +75,9 @@ def _capture_token_from_request(request):
     url = request.url
 
     # Method 1: Token in callback URL query parameter
-    if "callback" in url and "token=" in url:
-        try:
-            from urllib.parse import urlparse, parse_qs
-            parsed = urlparse(url)
-            token_values = parse_qs(parsed.query).get("token", [])
-            if token_values:
-                return token_values[0]
-        except Exception:
-            pass
+    token = token_from_callback(url)
+    if token:
+        return token
 
     # Method 2: Bearer token in Authorization request header
     if "rijbewijs" in url and "sbat" in url:
@@ -81,11 +101,31 @@ class AuthSession:
 
     Uses a dedicated background thread for all Playwright operations (Playwright
     sync API must be used from a single thread).
+
+    storage_state_path: if set, the browser context is restored from this file
+    at start and saved to it after every successful authentication.
+
+    hibernate: instead of keeping Chromium running between refreshes, save the
+    session state after each successful auth and close the browser (and the
+    Playwright driver) completely. Each refresh relaunches it from the saved
+    state — headless for the silent attempt, headed only when the user has
+    to confirm on their phone.
+
+    http_refresh: try each refresh over plain HTTP first by replaying the
+    login redirect chain seen in the browser with the saved cookies. The
+    browser is only used when that fails; if the itsme IDP asked for a phone
+    confirmation, it goes straight to the interactive login.
     """
 
-    def __init__(self, log_fn=None, event_fn=None):
+    def __init__(self, log_fn=None, event_fn=None, storage_state_path=None, hibernate=False,
+                 http_refresh=False):
         self._log_fn = log_fn
         self._event_fn = event_fn
+        self._storage_state_path = storage_state_path
+        self._hibernate = hibernate
+        self._http_refresh = http_refresh
+        self._saved_state = None  # Last storage state dict, kept in memory for hibernation/HTTP refresh
+        self._login_url = None  # First URL of the last redirect chain that ended in a token callback
         self._command_queue = queue.Queue()
         self._thread = None
         self.token = None
@@ -126,12 +166,51 @@ class AuthSession:
         Blocks until a token is captured or both paths time out.
         Returns the new token string, or None on failure.
         """
+        self.last_refresh_was_reauth = False
         result = {"token": None}
         done = threading.Event()
         self._command_queue.put(("refresh", result, done))
         done.wait(timeout=200)  # silent (~7s fast-fail) + re-auth (120s) + buffer
         return result["token"]
 
+    def _http_refresh_first(self, cmd):
+        """
+        Try a "refresh" command over HTTP before the browser gets it.
+        Returns (token, command left for the browser): "reauth" if the itsme
+        IDP asked for a phone confirmation, since the browser's silent flow
+        would end on the same page.
+
+        Runs on the Playwright thread like every other command, so the
+        session state is only ever changed from that thread.
+        """
+        if cmd != "refresh" or not (self._http_refresh and self._login_url and self._saved_state):
+            return None, cmd
+        token, outcome = self._refresh_over_http()
+        if outcome == NEEDS_CONFIRMATION:
+            return None, "reauth"
+        return token, cmd
+
+    def _refresh_over_http(self):
+        """Replay the login redirect chain without the browser. Returns (token, outcome)."""
+        started = time.monotonic()
+        refresher = HttpTokenRefresher(self._login_url, self._saved_state.get("cookies", []))
+        token, outcome = refresher.refresh()
+        # Keep the cookies the chain rotated, so the browser fallback and the
+        # next refresh start from the same IDP session
+        self._saved_state = dict(self._saved_state, cookies=refresher.cookies)
+        if token is not None and token == self.token:
+            token, outcome = None, FAILED  # The chain replayed the expiring token
+        if outcome == TOKEN:
+            self.token = token
+            self.token_expiry = _decode_jwt_exp(token)
+            self._write_storage_state()
+            self._log(f"Token refreshed over HTTP in {(time.monotonic() - started) * 1000:.0f} ms.")
+        elif outcome == NEEDS_CONFIRMATION:
+            self._log("HTTP refresh: itsme session expired, phone confirmation required.")
+        else:
+            self._log(f"HTTP refresh failed at {refresher.last_url}. Falling back to the browser.")
+        return token, outcome
+
     def _set_window_state(self, context, page, state):
         """Set the browser window state via CDP. state: 'minimized' | 'normal'."""
         try:
@@ -144,6 +223,60 @@ class AuthSession:
         except Exception:
             pass
 
+    def _save_storage_state(self, context):
+        """
+        Keep cookies + localStorage in memory (hibernation) and write them to
+        storage_state_path with owner-only permissions, if set.
+        """
+        if not (self._storage_state_path or self._hibernate or self._http_refresh):
+            return
+        try:
+            self._saved_state = context.storage_state()
+        except Exception as e:
+            self._log(f"Could not save browser session ({e}).")
+            return
+        self._write_storage_state()
+
+    def _write_storage_state(self):
+        """Write the in-memory storage state to storage_state_path, if set."""
+        if not self._storage_state_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self._storage_state_path), exist_ok=True)
+            with open(self._storage_state_path, "w", encoding="utf-8") as f:
+                os.chmod(self._storage_state_path, 0o600)
+                json.dump(self._saved_state, f)
+        except OSError as e:
+            self._log(f"Could not save browser session ({e}).")
+
+    def _sync_cookies(self, context):
+        """Copy cookies rotated by an HTTP refresh into the live browser context."""
+        if self._http_refresh and self._saved_state:
+            try:
+                context.add_cookies(self._saved_state.get("cookies", []))
+            except Exception:
+                pass
+
+    def _new_context(self, browser):
+        """Create a browser context from the saved session, if any. Returns (context, restored)."""
+        state = self._saved_state
+        if state is None and self._storage_state_path and os.path.exists(self._storage_state_path):
+            state = self._storage_state_path
+        if state is not None:
+            try:
+                return browser.new_context(storage_state=state), True
+            except Exception as e:
+                self._log(f"Could not restore saved browser session ({e}). Starting fresh.")
+        return browser.new_context(), False
+
+    @staticmethod
+    def _launch(p, headless):
+        # Try system Chrome first, fall back to Playwright's bundled Chromium
+        try:
+            return p.chromium.launch(headless=headless, channel="chrome")
+        except Exception:
+            return p.chromium.launch(headless=headless)
+
     def close(self):
         """Clean up the browser and stop the Playwright thread."""
         if self._thread and self._thread.is_alive():
@@ -163,22 +296,28 @@ class AuthSession:
             initial_done.set()
             return
 
-        with sync_playwright() as p:
-            # Try system Chrome first, fall back to Playwright's bundled Chromium
-            try:
-                browser = p.chromium.launch(headless=False, channel="chrome")
-            except Exception:
-                browser = p.chromium.launch(headless=False)
+        if self._hibernate:
+            self._run_hibernating(sync_playwright, initial_result, initial_done)
+            return
 
-            context = browser.new_context()
+        with sync_playwright() as p:
+            browser = self._launch(p, headless=False)
+            context, restored = self._new_context(browser)
             page = context.new_page()
 
             # --- Initial authentication ---
-            token = self._wait_for_token(page, timeout=120)
+            token = None
+            if restored:
+                # Saved itsme cookies may still be valid: try the silent flow first
+                self._log("Restored saved browser session. Trying silent login...")
+                token = self._wait_for_token(page, timeout=60, silent=True)
+            if not token:
+                token = self._wait_for_token(page, timeout=120, silent=False)
             initial_result["token"] = token
             if token:
                 self.token = token
                 self.token_expiry = _decode_jwt_exp(token)
+                self._save_storage_state(context)
             initial_done.set()
 
             if not token:
@@ -192,23 +331,27 @@ class AuthSession:
 
             # --- Command loop: process refresh/close requests ---
             while True:
-                try:
-                    cmd, result, done = self._command_queue.get(timeout=1)
-                except queue.Empty:
-                    continue
+                cmd, result, done = self._command_queue.get()  # Blocks until a command arrives
 
                 if cmd == "close":
                     break
 
-                if cmd == "refresh":
-                    self.last_refresh_was_reauth = False
-                    new_token = self._wait_for_token(
-                        page, timeout=60, skip_token=self.token
-                    )
+                if cmd in ("refresh", "reauth"):
+                    new_token, cmd = self._http_refresh_first(cmd)
+                    if new_token:
+                        result["token"] = new_token
+                        done.set()
+                        continue
+                    self._sync_cookies(context)
+                    if cmd == "refresh":
+                        new_token = self._wait_for_token(
+                            page, timeout=60, silent=True, skip_token=self.token
+                        )
                     if new_token:
                         self.token = new_token
                         self.token_expiry = _decode_jwt_exp(new_token)
                         self._log("Token refreshed silently.")
+                        self._save_storage_state(context)
                     else:
                         # Silent refresh failed (itsme session expired).
                         # Restore the browser window and wait for the user to
@@ -219,12 +362,13 @@ class AuthSession:
                         )
                         self._emit_event("REAUTH_NEEDED")
                         self._set_window_state(context, page, "normal")
-                        new_token = self._wait_for_token(page, timeout=120)
+                        new_token = self._wait_for_token(page, timeout=120, silent=False)
                         if new_token:
                             self.token = new_token
                             self.token_expiry = _decode_jwt_exp(new_token)
                             self.last_refresh_was_reauth = True
                             self._log("Re-authenticated via itsme. Resuming.")
+                            self._save_storage_state(context)
                             self._set_window_state(context, page, "minimized")
                         else:
                             self._log("Re-authentication timed out.")
@@ -233,10 +377,85 @@ class AuthSession:
 
             browser.close()
 
-    def _wait_for_token(self, page, timeout, skip_token=None):
+    def _run_hibernating(self, sync_playwright, initial_result, initial_done):
+        """
+        Hibernate-mode main loop: the browser only runs while authenticating.
+        Between commands nothing but this idle thread is left.
+        """
+        token = None
+        if self._saved_state is not None or (
+            self._storage_state_path and os.path.exists(self._storage_state_path)
+        ):
+            self._log("Restored saved browser session. Trying silent login...")
+            token = self._authenticate_once(sync_playwright, silent=True)
+        if not token:
+            token = self._authenticate_once(sync_playwright, silent=False)
+        initial_result["token"] = token
+        if token:
+            self.token = token
+            self.token_expiry = _decode_jwt_exp(token)
+            self._log("Browser closed until the next token refresh.")
+        initial_done.set()
+        if not token:
+            return
+
+        while True:
+            cmd, result, done = self._command_queue.get()
+            if cmd == "close":
+                break
+            if cmd in ("refresh", "reauth"):
+                new_token, cmd = self._http_refresh_first(cmd)
+                if new_token:
+                    result["token"] = new_token
+                    done.set()
+                    continue
+                if cmd == "refresh":
+                    new_token = self._authenticate_once(sync_playwright, silent=True, skip_token=self.token)
+                if new_token:
+                    self._log("Token refreshed silently.")
+                else:
+                    self._log(
+                        "Silent refresh failed. "
+                        "Please confirm itsme on your phone to re-authenticate..."
+                    )
+                    self._emit_event("REAUTH_NEEDED")
+                    new_token = self._authenticate_once(sync_playwright, silent=False)
+                    if new_token:
+                        self.last_refresh_was_reauth = True
+                        self._log("Re-authenticated via itsme. Resuming.")
+                    else:
+                        self._log("Re-authentication timed out.")
+                if new_token:
+                    self.token = new_token
+                    self.token_expiry = _decode_jwt_exp(new_token)
+                result["token"] = new_token
+                done.set()
+
+    def _authenticate_once(self, sync_playwright, silent, skip_token=None):
+        """
+        Launch a browser from the saved session, capture one token, save the
+        session and shut everything down again. Silent attempts run headless.
+        """
+        with sync_playwright() as p:
+            browser = self._launch(p, headless=silent)
+            try:
+                context, _ = self._new_context(browser)
+                page = context.new_page()
+                token = self._wait_for_token(
+                    page, timeout=60 if silent else 120, silent=silent, skip_token=skip_token
+                )
+                if token:
+                    self._save_storage_state(context)
+                return token
+            finally:
+                browser.close()
+
+    def _wait_for_token(self, page, timeout, silent, skip_token=None):
         """
         Navigate to the SBAT app and wait for a token to be captured.
 
+        silent:     True for the silent flow below, False for the interactive
+                    login (browser window shown, user confirms on the phone).
         skip_token: if set, ignore any captured token that matches this value.
                     Used during refresh to avoid re-capturing the expiring token
                     that the SBAT SPA sends in Authorization headers on page load.
@@ -249,21 +468,53 @@ class AuthSession:
 
         Returns the token string or None on timeout.
         """
-        captured = {"token": None}
-
-        def on_request(request):
-            if captured["token"]:
+        from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+        # idp_since: when the main frame arrived on the itsme.services page it
+        # still shows (None: elsewhere)
+        captured = {"token": None, "idp_since": None}
+        deadline = time.monotonic() + timeout
+
+        def accept(token):
+            """Keep the first usable token. Returns True once one is kept."""
+            if token and not captured["token"] and token != skip_token:
+                # A restored session replays its old token from localStorage
+                exp = _decode_jwt_exp(token)
+                if not exp or exp > datetime.now(timezone.utc):
+                    self._log("Token captured.")
+                    captured["token"] = token
+            return captured["token"] is not None
+
+        def on_navigated(frame):
+            # Navigation events reach Python anyway; the callback token is read
+            # from the URL the main frame committed to
+            if frame != page.main_frame:
                 return
-            token = _capture_token_from_request(request)
-            if token and token != skip_token:
-                self._log("Token captured.")
-                captured["token"] = token
+            accept(token_from_callback(frame.url))
+            if not IDP_URL_PATTERN.search(frame.url):
+                captured["idp_since"] = None
+            elif captured["idp_since"] is None:
+                captured["idp_since"] = time.monotonic()
 
-        page.on("request", on_request)
+        def lands_on_idp_or_callback(url):
+            return bool(IDP_URL_PATTERN.search(url) or token_from_callback(url))
+
+        def abort_route(route):
+            route.abort()
+
+        routes = [(_ANALYTICS_URL_PATTERN, abort_route)]
+        if silent:
+            routes.append((_STATIC_URL_PATTERN, abort_route))
+        for pattern, handler in routes:
+            page.route(pattern, handler)
+        page.on("framenavigated", on_navigated)
 
         try:
-            if skip_token:
+            if silent:
                 self._log("Attempting silent token refresh...")
+                if page.url == "about:blank":
+                    # localStorage is only reachable once the page is on the SBAT origin
+                    page.goto("https://rijbewijs.sbat.be/praktijk/examen/overview")
                 # Clear localStorage so the SPA detects no token and redirects to login
                 page.evaluate("localStorage.clear()")
                 page.goto("https://rijbewijs.sbat.be/praktijk/examen/overview")
@@ -275,39 +526,238 @@ class AuthSession:
                 try:
                     page.click('label:has-text("privacybeleid")', timeout=5000)
                     self._log("Checked privacy policy checkbox.")
-                    page.click('div.btn', timeout=5000)
-                    self._log("Clicked itsme login button.")
+                    # The response of the navigation the button starts carries
+                    # its redirect chain, for the HTTP refresh (a timeout of 0
+                    # would wait forever)
+                    with page.expect_navigation(
+                        url=lands_on_idp_or_callback, wait_until="commit",
+                        timeout=max(1, (deadline - time.monotonic()) * 1000),
+                    ) as navigation:
+                        page.click('div.btn', timeout=5000)
+                        self._log("Clicked itsme login button.")
+                    if navigation.value is not None:
+                        self._remember_login_url(navigation.value.request)
                 except Exception as e:
                     self._log(f"[diag] Login interaction failed: {e}")
 
-                if not captured["token"]:
-                    # Wait a few seconds to see where the itsme redirect lands.
-                    # If still on itsme.be after this, the IDP session expired and
-                    # phone confirmation is required — fail fast instead of waiting 60s.
-                    page.wait_for_timeout(5000)
-                    post_click_url = page.url
-                    self._log(f"[diag] post-click URL: {post_click_url}")
-                    if "itsme.services" in post_click_url:
-                        self._log("itsme session expired. Phone confirmation required — silent refresh not possible.")
-                        return None
             else:
                 self._log("Opening browser for itsme authentication...")
                 self._log("Please confirm your identity in the itsme app on your phone.")
-                page.goto(SBAT_LOGIN_URL)
-
-            start = time.time()
-            while not captured["token"] and time.time() - start < timeout:
+                # A session that is still logged in sends its token in the
+                # Authorization header of the SPA's first API calls; only those
+                # few seconds of requests are routed through Python
                 try:
-                    page.wait_for_timeout(500)
-                except Exception:
-                    break
+                    with page.expect_request(
+                        lambda request: accept(_capture_token_from_request(request)),
+                        timeout=STORED_TOKEN_WAIT * 1000,
+                    ):
+                        response = page.goto(SBAT_LOGIN_URL)
+                        if response is not None:
+                            self._remember_login_url(response.request)
+                except PlaywrightTimeoutError:
+                    pass
+
+            if not captured["token"] and not self._await_token(page, captured, deadline, silent):
+                return None
         finally:
-            page.remove_listener("request", on_request)
+            page.remove_listener("framenavigated", on_navigated)
+            for pattern, handler in routes:
+                try:
+                    page.unroute(pattern, handler)
+                except Exception:
+                    pass
 
         if not captured["token"]:
             self._log(f"Authentication timed out after {timeout}s.")
         return captured["token"]
 
+    def _remember_login_url(self, request):
+        """
+        Remember where the redirect chain that delivered a callback token
+        started, for the HTTP refresh. Chains that start on the itsme IDP
+        follow a phone confirmation and cannot be replayed.
+        """
+        if not token_from_callback(request.url):
+            return
+        first = request
+        while first.redirected_from:
+            first = first.redirected_from
+        if first is not request and not IDP_URL_PATTERN.search(first.url):
+            self._login_url = first.url
+
+    def _await_token(self, page, captured, deadline, silent):
+        """
+        Block until the token is captured or the monotonic deadline passes.
+
+        Each wait blocks in the driver until the main frame navigates, which
+        is when the framenavigated listener can have captured the token.
+        During silent refresh, a committed navigation to the itsme IDP that
+        is not followed by another navigation within ITSME_GRACE seconds
+        means the phone must confirm: returns False right away instead of
+        waiting for the timeout. Returns True otherwise.
+        """
+        from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+        while not captured["token"]:
+            now = time.monotonic()
+            until = deadline
+            if silent and captured["idp_since"] is not None:
+                grace_end = captured["idp_since"] + ITSME_GRACE
+                if now >= grace_end:
+                    self._log(f"[diag] still on {page.url}")
+                    self._log("itsme session expired. Phone confirmation required — silent refresh not possible.")
+                    return False
+                until = min(until, grace_end)
+            if now >= deadline:
+                return True
+            try:
+                page.wait_for_event(
+                    "framenavigated",
+                    predicate=lambda frame: frame == page.main_frame,
+                    timeout=(until - now) * 1000,
+                )
+            except PlaywrightTimeoutError:
+                pass
+            except Exception:
+                return True  # The page was closed
+        return True
+
+
+class TokenManager:
+    """
+    Keeps a valid token available to the polling loop without pausing it.
+
+    A background thread refreshes the token through the AuthSession
+    TOKEN_REFRESH_MARGIN seconds before the JWT exp claim, and swaps it in
+    atomically; pollers simply call headers() for every cycle. If a request
+    still gets a 401, renew() returns the token that replaced the stale one,
+    refreshing on the spot if no newer token exists yet (only one refresh
+    runs at a time, however many threads ask).
+
+    Without an AuthSession (manually pasted token) nothing can be refreshed
+    and renew() returns None once the token is rejected.
+
+    on_refresh(token, was_reauth) is called after every successful refresh.
+    """
+
+    def __init__(self, token, session=None, log_fn=None, on_refresh=None,
+                 margin=TOKEN_REFRESH_MARGIN):
+        self._session = session
+        self._log_fn = log_fn
+        self._on_refresh = on_refresh
+        self._margin = margin
+        self._lock = threading.Lock()  # Guards _token/_expiry
+        self._refresh_lock = threading.Lock()  # Single-flight refresh
+        self._stop = threading.Event()
+        self._thread = None
+        self._token = token
+        self._expiry = _decode_jwt_exp(token)
+        self._obtained = time.monotonic()
+
+    def _log(self, msg):
+        if self._log_fn:
+            self._log_fn(msg)
+        else:
+            print(msg)
+
+    @property
+    def token(self):
+        with self._lock:
+            return self._token
+
+    @property
+    def expiry(self):
+        with self._lock:
+            return self._expiry
+
+    @property
+    def token_age(self):
+        """Seconds since the current token was obtained."""
+        with self._lock:
+            return time.monotonic() - self._obtained
+
+    def headers(self, token=None):
+        """Request headers carrying `token` (default: the current token)."""
+        return {
+            "Content-Type": "application/json",
+            "User-Agent": USER_AGENT,
+            "Authorization": f"Bearer {token or self.token}",
+        }
+
+    def start(self):
+        """Start (or resume) refreshing in the background; no-op without an AuthSession."""
+        if self._session and not (self._thread and self._thread.is_alive()):
+            self._stop = threading.Event()
+            self._thread = threading.Thread(
+                target=self._refresh_loop, args=(self._stop,), daemon=True, name="sbat-token"
+            )
+            self._thread.start()
+
+    def stop(self):
+        """Stop background refreshing; renew() keeps working on demand."""
+        self._stop.set()
+
+    def renew(self, stale_token):
+        """
+        Return a token newer than stale_token, refreshing if necessary.
+        Returns None if no new token could be obtained.
+        """
+        with self._refresh_lock:
+            current = self.token
+            if current != stale_token:
+                return current  # Another thread already rotated it
+            if not self._session:
+                return None
+            return self._refresh()
+
+    def _refresh(self):
+        """Refresh through the AuthSession. Caller must hold _refresh_lock."""
+        started = time.monotonic()
+        new_token = self._session.refresh_token()
+        elapsed = time.monotonic() - started
+        if not new_token:
+            TOKEN_REFRESH_DURATION.labels("failed").observe(elapsed)
+            self._log("Token refresh failed.")
+            return None
+        with self._lock:
+            self._token = new_token
+            self._expiry = _decode_jwt_exp(new_token)
+            self._obtained = time.monotonic()
+        was_reauth = self._session.last_refresh_was_reauth
+        TOKEN_REFRESH_DURATION.labels("reauth" if was_reauth else "silent").observe(elapsed)
+        self._log(f"Token {'re-authenticated' if was_reauth else 'refreshed'} in {elapsed:.1f}s.")
+        if self._on_refresh:
+            self._on_refresh(new_token, was_reauth)
+        return new_token
+
+    def seconds_until_refresh(self):
+        """Seconds until the next scheduled refresh, or None if expiry is unknown."""
+        expiry = self.expiry
+        if not expiry:
+            return None
+        return (expiry - datetime.now(timezone.utc)).total_seconds() - self._margin
+
+    def _refresh_loop(self, stop):
+        while not stop.is_set():
+            wait = self.seconds_until_refresh()
+            if wait is None:
+                self._log("Token expiry unknown; it will be refreshed when the API rejects it.")
+                return
+            if wait > 0:
+                self._log(
+                    f"Token valid for {int((wait + self._margin) / 60)} min. "
+                    f"Background refresh scheduled in {int(wait / 60)} min."
+                )
+                if stop.wait(wait):
+                    return
+            with self._refresh_lock:
+                wait = self.seconds_until_refresh()
+                if wait is not None and wait > 0:
+                    continue  # Rotated by renew() while we were sleeping
+                new_token = self._refresh()
+            if not new_token and stop.wait(TOKEN_RETRY_INTERVAL):
+                return
+
 
 # ---------------------------------------------------------------------------
 # Standalone helpers — used for manual token paste and CLI --token flag
@@ -315,8 +765,8 @@ class AuthSession:
 
 def test_token(token):
     """Test if a Bearer token is still valid by making a lightweight API request."""
-    import requests
-    from constants import CENTER_IDS, USER_AGENT
+    from constants import CENTER_IDS
+    from transport import post
     from datetime import timedelta
 
     headers = {
@@ -331,7 +781,7 @@ def test_token(token):
         "startDate": f"{(datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')}T00:00",
     }
     try:
-        response = requests.post(AVAILABLE_URL, headers=headers, json=payload, timeout=10)
+        response = post(AVAILABLE_URL, headers=headers, json=payload, timeout=10)
         return response.status_code == 200
     except Exception:
         return False
@@ -0,0 +1,128 @@
+"""
+Benchmark: matching new slots against 10k subscriptions.
+
+Compares SubscriptionIndex with testing every Subscription directly, on
+random filters over CENTER_IDS and a diff of new slots spread over the next
+three months. Run from the repository root:
+
+    python3 benchmarks/bench_subscriptions.py [--subscribers 10000] [--slots 200] [--narrow]
+
+The default filters are broad (most slots match over a thousand of them), so
+every method spends most of its time producing the matches and the index can
+win at most a few times over the scan. --narrow gives each subscriber one
+center and a date range of at most a week, where the cost of finding the
+candidates dominates and the interval index pays off.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from constants import CENTER_IDS  # noqa: E402
+from slot_diff import ADDED, SlotEvent  # noqa: E402
+from slot_model import MINUTES_PER_DAY, Slot  # noqa: E402
+from subscriptions import SubscriptionIndex  # noqa: E402
+
+CENTERS = [name for _, name in CENTER_IDS]
+
+
+def random_filter(rng, today):
+    data = {}
+    if rng.random() < 0.8:
+        data["centers"] = rng.sample(CENTERS, rng.randint(1, 2))
+    if rng.random() < 0.7:
+        start = today + timedelta(days=rng.randint(0, 60))
+        data["from"] = start.isoformat()
+        data["until"] = (start + timedelta(days=rng.randint(7, 60))).isoformat()
+    if rng.random() < 0.3:
+        data["weekdays"] = sorted(rng.sample(range(7), rng.randint(1, 5)))
+    if rng.random() < 0.3:
+        hour = rng.randint(7, 14)
+        data["timeFrom"] = f"{hour:02d}:00"
+        data["timeUntil"] = f"{hour + rng.randint(1, 4):02d}:00"
+    return data
+
+
+def narrow_filter(rng, today):
+    start = today + timedelta(days=rng.randint(0, 90))
+    return {
+        "centers": [rng.choice(CENTERS)],
+        "from": start.isoformat(),
+        "until": (start + timedelta(days=rng.randint(0, 6))).isoformat(),
+    }
+
+
+def random_events(rng, today, count):
+    events = []
+    for slot_id in range(count):
+        day = today.toordinal() + rng.randint(1, 90)
+        start = day * MINUTES_PER_DAY + rng.choice(range(8 * 60, 16 * 60, 30))
+        events.append(SlotEvent(ADDED, rng.choice(CENTERS), Slot(slot_id, start, start + 30), None))
+    return events
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--subscribers", type=int, default=10000)
+    parser.add_argument("--slots", type=int, default=200, help="New slots in the matched diff")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--narrow", action="store_true", help="One center and at most a week per subscriber")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    today = date.today()
+    index = SubscriptionIndex()
+    started = time.perf_counter()
+    make_filter = narrow_filter if args.narrow else random_filter
+    for _ in range(args.subscribers):
+        index.add(make_filter(rng, today))
+    register_seconds = time.perf_counter() - started
+    subscriptions = [index.get(i) for i in range(1, args.subscribers + 1)]
+    events = random_events(rng, today, args.slots)
+
+    def linear():
+        matches = {}
+        for event in events:
+            for subscription in subscriptions:
+                if subscription.matches(event.center, event.slot):
+                    matches.setdefault(subscription.id, []).append(event)
+        return matches
+
+    def indexed_cold():
+        index._day_cache.clear()  # Measure including the per-day index lookups
+        return index.match(events)
+
+    linear_seconds, expected = timed(linear, max(1, args.repeat // 2))
+    cold_seconds, matched = timed(indexed_cold, args.repeat)
+    warm_seconds, _ = timed(lambda: index.match(events), args.repeat)
+    if matched != expected:
+        sys.exit("Index and linear scan disagree!")
+
+    notified = sum(len(m) for m in matched.values())
+    print(f"{args.subscribers} subscriptions registered in {register_seconds * 1000:.0f} ms")
+    print(f"{args.slots} new slots -> {len(matched)} subscribers, {notified} notifications")
+    for label, seconds in (
+        ("linear scan", linear_seconds),
+        ("index (cold day cache)", cold_seconds),
+        ("index (warm day cache)", warm_seconds),
+    ):
+        print(f"  {label:<24} {seconds * 1000:8.2f} ms  ({seconds / args.slots * 1e6:8.1f} us/slot)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""
+Local stand-in for the SBAT availability API, for offline benchmarks.
+
+Serves POST /praktijk/api/exam/available with slot lists shaped like
+constants.response_example. Point a frontend at it with
+
+    SBAT_AVAILABLE_URL=http://127.0.0.1:PORT/praktijk/api/exam/available
+
+Behaviour is set by a JSON config (every key optional):
+
+    {
+        "slots": 20,                      free slots per center, or {"7": 5, "10": 0}
+        "latency": {                      per-request delay in seconds
+            "distribution": "lognormal",  fixed | uniform | lognormal
+            "median": 0.03, "sigma": 0.5, lognormal; fixed uses median only
+            "min": 0.01, "max": 0.05,     uniform
+            "tail": 0.02, "tailLatency": 1.5
+                                          this fraction of requests takes tailLatency instead
+        },
+        "tokenTtl": 5,                    tokens from POST /_mock/token expire after this many
+                                          seconds and are rejected with 401 (null: any token works)
+        "rateLimit": 20,                  requests per second before 429 (null: unlimited)
+        "retryAfter": 1,                  Retry-After of a 429
+        "errorRate": 0.01,                this fraction of requests gets a 429 anyway
+        "releases": [                     slot release script, seconds after startup;
+            {"at": 2, "center": 7, "slots": 3}
+                                          negative slots books that many slots away
+        ]
+    }
+
+Control endpoints used by run_benchmarks.py:
+
+    POST /_mock/token    {"token": "..."}, a fresh token
+    GET  /_mock/stats    request and status counts, and the releases applied so far
+                         with their release time (epoch seconds)
+
+Run standalone:
+
+    python3 benchmarks/mock_api.py [--port 8780] [--config scenario.json]
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from constants import CENTER_IDS  # noqa: E402
+
+AVAILABLE_PATH = "/praktijk/api/exam/available"
+FIRST_SLOT_ID = 400000
+SLOTS_PER_DAY = 8
+EXAM_MINUTES = 55
+
+
+class LatencyModel:
+    """Draws request delays from the "latency" config."""
+
+    def __init__(self, config=None):
+        config = config or {}
+        self.distribution = config.get("distribution", "fixed")
+        if self.distribution not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution {self.distribution!r}")
+        self.median = config.get("median", 0.0)
+        self.sigma = config.get("sigma", 0.5)
+        self.low = config.get("min", 0.0)
+        self.high = config.get("max", self.low)
+        self.tail = config.get("tail", 0.0)
+        self.tail_latency = config.get("tailLatency", 0.0)
+
+    def sample(self, rng):
+        if self.tail and rng.random() < self.tail:
+            return self.tail_latency
+        if self.distribution == "uniform":
+            return rng.uniform(self.low, self.high)
+        if self.distribution == "lognormal" and self.median > 0:
+            return rng.lognormvariate(0, self.sigma) * self.median
+        return self.median
+
+
+class MockState:
+    """Slots, tokens and counters of the mock, shared by all request threads."""
+
+    def __init__(self, config=None, seed=0):
+        config = config or {}
+        self.started = time.time()
+        self.latency = LatencyModel(config.get("latency"))
+        self.token_ttl = config.get("tokenTtl")
+        self.rate_limit = config.get("rateLimit")
+        self.retry_after = config.get("retryAfter", 1)
+        self.error_rate = config.get("errorRate", 0.0)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(FIRST_SLOT_ID)
+        self._tokens = {}  # token -> issue time
+        self._recent = deque()  # Request times within the last second, for rateLimit
+        self.requests = 0
+        self.status = Counter()
+        self.released = []  # {"slotId", "center", "releasedAt"} of applied releases
+        self._script = sorted(config.get("releases", []), key=lambda release: release["at"])
+
+        slots = config.get("slots", 20)
+        self._slots = {}  # center id -> {slot id: slot dict}
+        self._bodies = {}  # center id -> serialized body, rebuilt after a change
+        for center_id, _ in CENTER_IDS:
+            count = slots.get(str(center_id), 0) if isinstance(slots, dict) else slots
+            self._slots[center_id] = {}
+            self._add_slots(center_id, count)
+
+    # --- Slots ---
+
+    def _add_slots(self, center_id, count):
+        center = self._slots.setdefault(center_id, {})
+        added = []
+        first_day = date.today() + timedelta(days=2)
+        for _ in range(count):
+            slot_id = next(self._ids)
+            index = slot_id - FIRST_SLOT_ID
+            start = datetime.combine(first_day + timedelta(days=index // SLOTS_PER_DAY), datetime.min.time())
+            start += timedelta(hours=8, minutes=(index % SLOTS_PER_DAY) * EXAM_MINUTES)
+            center[slot_id] = {
+                "id": slot_id,
+                "typesBlob": '["B"]',
+                "examTypesBlob": '["E2"]',
+                "examType": "E2",
+                "from": start.strftime("%Y-%m-%dT%H:%M:%S"),
+                "till": (start + timedelta(minutes=EXAM_MINUTES)).strftime("%Y-%m-%dT%H:%M:%S"),
+                "dayScheduleId": 131 + index % 5,
+                "examCenterId": center_id,
+                "drivingSchool": None,
+                "examinee": None,
+                "isPublic": True,
+            }
+            added.append(slot_id)
+        self._bodies.pop(center_id, None)
+        return added
+
+    def _apply_releases(self, now):
+        """Apply the scripted releases that are due. Caller must hold _lock."""
+        while self._script and self.started + self._script[0]["at"] <= now:
+            release = self._script.pop(0)
+            center_id = int(release["center"])
+            released_at = self.started + release["at"]
+            count = release.get("slots", 1)
+            if count >= 0:
+                for slot_id in self._add_slots(center_id, count):
+                    self.released.append({"slotId": slot_id, "center": center_id, "releasedAt": released_at})
+            else:
+                center = self._slots.get(center_id, {})
+                for slot_id in list(center)[:-count]:
+                    del center[slot_id]
+                self._bodies.pop(center_id, None)
+
+    def body(self, center_id):
+        with self._lock:
+            self._apply_releases(time.time())
+            body = self._bodies.get(center_id)
+            if body is None:
+                slots = sorted(self._slots.get(center_id, {}).values(), key=lambda slot: slot["from"])
+                body = self._bodies[center_id] = json.dumps(slots).encode("utf-8")
+            return body
+
+    # --- Tokens, limits and counters ---
+
+    def issue_token(self):
+        with self._lock:
+            token = f"mock-{len(self._tokens) + 1}-{self._rng.getrandbits(32):08x}"
+            self._tokens[token] = time.time()
+            return token
+
+    def token_valid(self, authorization):
+        if self.token_ttl is None:
+            return True
+        token = (authorization or "").removeprefix("Bearer ").strip()
+        with self._lock:
+            issued = self._tokens.get(token)
+        return issued is not None and time.time() - issued < self.token_ttl
+
+    def admit(self):
+        """Count a request; return True if it is rate limited."""
+        now = time.monotonic()
+        with self._lock:
+            self.requests += 1
+            self._recent.append(now)
+            while self._recent and now - self._recent[0] > 1.0:
+                self._recent.popleft()
+            if self.rate_limit is not None and len(self._recent) > self.rate_limit:
+                return True
+            return bool(self.error_rate) and self._rng.random() < self.error_rate
+
+    def delay(self):
+        with self._lock:
+            seconds = self.latency.sample(self._rng)
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def record(self, status):
+        with self._lock:
+            self.status[status] += 1
+
+    def stats(self):
+        with self._lock:
+            self._apply_releases(time.time())
+            return {
+                "startedAt": self.started,
+                "requests": self.requests,
+                "status": {str(code): count for code, count in sorted(self.status.items())},
+                "releases": list(self.released),
+            }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "sbat-mock"
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real API
+    disable_nagle_algorithm = True  # Headers and body are separate writes
+
+    def do_POST(self):
+        state = self.server.state
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length) if length else b""
+        if self.path == "/_mock/token":
+            self._send(200, json.dumps({"token": state.issue_token()}).encode("utf-8"))
+            return
+        if self.path != AVAILABLE_PATH:
+            self._send(404, b'{"error":"not found"}')
+            return
+
+        limited = state.admit()
+        state.delay()
+        if not state.token_valid(self.headers.get("Authorization")):
+            self._reply(401, b"")
+            return
+        if limited:
+            self._reply(429, b"", {"Retry-After": str(state.retry_after)})
+            return
+        try:
+            center_id = int(json.loads(raw)["examCenterId"])
+        except (ValueError, KeyError, TypeError):
+            self._reply(400, b'{"error":"bad payload"}')
+            return
+        self._reply(200, state.body(center_id))
+
+    def do_GET(self):
+        if self.path == "/_mock/stats":
+            self._send(200, json.dumps(self.server.state.stats()).encode("utf-8"))
+        else:
+            self._send(404, b'{"error":"not found"}')
+
+    def _reply(self, status, body, headers=None):
+        self.server.state.record(status)
+        self._send(status, body, headers)
+
+    def _send(self, status, body, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(config=None, host="127.0.0.1", port=0, seed=0):
+    """Create (but do not start) a mock server; returns (httpd, url of the availability endpoint)."""
+    httpd = ThreadingHTTPServer((host, port), _Handler)
+    httpd.daemon_threads = True
+    httpd.state = MockState(config, seed=seed)
+    bound_host, bound_port = httpd.server_address[:2]
+    return httpd, f"http://{bound_host}:{bound_port}{AVAILABLE_PATH}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the SBAT availability API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8780, help="0 picks a free port")
+    parser.add_argument("--config", help="JSON file, or an inline JSON object")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = {}
+    if args.config:
+        if args.config.lstrip().startswith("{"):
+            config = json.loads(args.config)
+        else:
+            with open(args.config, encoding="utf-8") as f:
+                config = json.load(f)
+    httpd, url = serve(config, args.host, args.port, args.seed)
+    print(url, flush=True)  # First line of output: run_benchmarks.py reads the URL from it
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
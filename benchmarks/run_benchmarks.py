@@ -0,0 +1,486 @@
+"""
+Offline benchmark suite for the polling loops.
+
+Every scenario starts benchmarks/mock_api.py with its own config and runs a
+frontend against it in a fresh process, with SBAT_AVAILABLE_URL pointing at
+the mock and HOME in a temporary directory (so ~/.sbat_checker is not
+touched):
+
+    cli  the real sbat.py main loop (run with runpy)
+    gui  the real sbat_gui_pyside.run_checks(), without a window (skipped if
+         PySide6 is not installed)
+
+Only two things are swapped out: the sleep between cycles becomes the
+scenario's interval, and authentication is a stand-in AuthSession that gets
+its tokens from the mock (so 401 expiry goes through TokenManager.renew).
+Per scenario and frontend the suite reports:
+
+    cycleLatency       seconds from the start of a cycle until it goes to sleep
+    requestsPerSecond  availability requests received by the mock per second
+    cpuPerCycle        CPU seconds of the frontend process (all threads) per cycle
+    memoryGrowthKiB    resident memory growth from the first to the last cycle
+    timeToDetect       seconds from a scripted slot release until the end of
+                       the cycle that reported it
+    status             HTTP statuses sent by the mock
+    tokenRefreshes     token renewals after a 401
+
+The first cycle (connection setup, initial snapshot) is excluded from the
+per-cycle numbers. Results are saved as JSON, by default to
+benchmarks/results/<revision>-<time>.json; --compare prints the change
+against an earlier result file. Run from the repository root:
+
+    python3 benchmarks/run_benchmarks.py [--scenarios steady,release] [--frontends cli,gui]
+                                         [--compare benchmarks/results/OLD.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import runpy
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from constants import CENTER_IDS  # noqa: E402
+from slot_diff import ADDED  # noqa: E402
+
+MOCK = os.path.join(ROOT, "benchmarks", "mock_api.py")
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+FRONTENDS = ("cli", "gui")
+# Client request rate; high enough that the rate limiter does not set the pace
+DEFAULT_RATE = 1000.0
+WORKER_TIMEOUT_MARGIN = 60
+
+SCENARIOS = {
+    "steady": {
+        "description": "5 centers with 40 slots each, ~30 ms lognormal latency, nothing changes",
+        "mock": {"slots": 40, "latency": {"distribution": "lognormal", "median": 0.03, "sigma": 0.4}},
+        "cycles": 30,
+        "interval": 0.2,
+    },
+    "throughput": {
+        "description": "no latency and no sleep: the client's own overhead per cycle",
+        "mock": {"slots": 40},
+        "cycles": 100,
+        "interval": 0,
+    },
+    "churn": {
+        "description": "500 slots per center and a release every 0.3 s, so bodies are decoded and diffed",
+        "mock": {
+            "slots": 500,
+            "latency": {"distribution": "uniform", "min": 0.01, "max": 0.03},
+            "releases": [
+                {"at": 1 + i * 0.3, "center": CENTER_IDS[i % len(CENTER_IDS)][0], "slots": 1 if i % 3 else -1}
+                for i in range(60)
+            ],
+        },
+        "cycles": 60,
+        "interval": 0.1,
+    },
+    "slow-tail": {
+        "description": "~30 ms latency with 3% of requests taking 1.5 s (hedging)",
+        "mock": {
+            "slots": 40,
+            "latency": {"distribution": "lognormal", "median": 0.03, "sigma": 0.4, "tail": 0.03, "tailLatency": 1.5},
+        },
+        "cycles": 40,
+        "interval": 0.1,
+    },
+    "rate-limited": {
+        "description": "the API allows 8 requests/s and answers 429 with Retry-After: 1 above that",
+        "mock": {"slots": 40, "rateLimit": 8, "retryAfter": 1, "latency": {"median": 0.01}},
+        "cycles": 20,
+        "interval": 0,
+    },
+    "token-expiry": {
+        "description": "tokens expire after 1.5 s, so cycles regularly hit 401 and renew the token",
+        "mock": {"slots": 40, "tokenTtl": 1.5, "latency": {"median": 0.01}},
+        "cycles": 25,
+        "interval": 0.2,
+    },
+    "release": {
+        "description": "2 slots released at a random center every 1.3 s, polled every 0.5 s",
+        "mock": {
+            "slots": 10,
+            "latency": {"distribution": "lognormal", "median": 0.03, "sigma": 0.4},
+            "releases": [
+                {"at": 2 + i * 1.3, "center": CENTER_IDS[(i * 3) % len(CENTER_IDS)][0], "slots": 2}
+                for i in range(8)
+            ],
+        },
+        "cycles": 26,
+        "interval": 0.5,
+    },
+}
+
+
+def _distribution(values):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return {
+        "mean": statistics.fmean(ordered),
+        "p50": ordered[len(ordered) // 2],
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "max": ordered[-1],
+    }
+
+
+def _rss_kib():
+    """
+    Current resident set size in KiB (peak RSS where /proc is unavailable),
+    or None where neither is (Windows).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except OSError:
+        pass
+    try:
+        import resource  # Unix only
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+# ---------------------------------------------------------------------------
+# Worker: runs one frontend against the mock (in its own process)
+# ---------------------------------------------------------------------------
+
+class BenchmarkFinished(Exception):
+    """Raised from the cycle sleep to end the CLI loop through its normal cleanup."""
+
+
+def _get_json(url):
+    import requests
+
+    response = requests.get(url, timeout=10)
+    response.raise_for_status()
+    return response.json()
+
+
+class BenchSession:
+    """Stands in for auth.AuthSession; tokens come from the mock."""
+
+    last_refresh_was_reauth = False
+
+    def __init__(self, control_url, **kwargs):
+        self._control_url = control_url
+        self.refreshes = 0
+
+    def _new_token(self):
+        import requests
+
+        response = requests.post(f"{self._control_url}/_mock/token", timeout=10)
+        response.raise_for_status()
+        return response.json()["token"]
+
+    def start(self):
+        return self._new_token()
+
+    def refresh_token(self):
+        self.refreshes += 1
+        return self._new_token()
+
+    def close(self):
+        pass
+
+
+class CycleProbe:
+    """
+    Replaces transport.wait_for_next_cycle: timestamps the end of every
+    cycle, sleeps the scenario's interval and ends the run after `cycles`.
+    """
+
+    def __init__(self, cycles, interval, control_url):
+        self.cycles = cycles
+        self.interval = interval
+        self.control_url = control_url
+        self.stop = None  # Set by the GUI worker; the CLI is stopped with BenchmarkFinished
+        self.completed = 0
+        self.latencies = []
+        self.detected = {}  # slot id -> wall time of the end of the cycle that reported it
+        self._pending = []  # Slot ids added during the current cycle
+        self._resumed = None  # perf_counter when the current cycle started
+        self._resumed_at = 0.0  # Wall time of the same moment
+        self.first = self.last = None  # (perf_counter, process_time, rss, mock stats) at cycle 1 and N
+
+    def saw(self, events):
+        self._pending.extend(event.slot.id for event in events if event.kind == ADDED)
+
+    def _mark(self):
+        return time.perf_counter(), time.process_time(), _rss_kib(), _get_json(f"{self.control_url}/_mock/stats")
+
+    def wait(self, duration, wait=time.sleep, log=print, next_window=None, connections=None):
+        ended = time.perf_counter()
+        now = time.time()
+        for slot_id in self._pending:
+            self.detected.setdefault(slot_id, now)
+        self._pending.clear()
+        if self._resumed is not None:
+            self.latencies.append(ended - self._resumed)
+        self.completed += 1
+
+        if self.completed == 1:
+            self.first = self._mark()
+        elif self.completed >= self.cycles:
+            self.last = self._mark()
+            if self.stop is None:
+                raise BenchmarkFinished()
+            self.stop()
+            return True
+
+        stopped = bool(wait(self.interval)) if self.interval else False
+        self._resumed = time.perf_counter()
+        self._resumed_at = time.time()
+        return stopped
+
+    def results(self):
+        if self.first is None or self.last is None:
+            return {"error": f"stopped after {self.completed} of {self.cycles} cycles"}
+        (t0, cpu0, rss0, stats0), (t1, cpu1, rss1, stats1) = self.first, self.last
+        measured = self.completed - 1
+        # Slots released after the last cycle started cannot have been seen yet
+        released = [r for r in stats1["releases"] if r["releasedAt"] <= self._resumed_at]
+        detect = [self.detected[r["slotId"]] - r["releasedAt"] for r in released if r["slotId"] in self.detected]
+        return {
+            "cycles": measured,
+            "wallSeconds": t1 - t0,
+            "cycleLatency": _distribution(self.latencies),
+            "requests": stats1["requests"] - stats0["requests"],
+            "requestsPerSecond": (stats1["requests"] - stats0["requests"]) / (t1 - t0) if t1 > t0 else None,
+            "requestsPerCycle": (stats1["requests"] - stats0["requests"]) / measured,
+            "cpuPerCycle": (cpu1 - cpu0) / measured,
+            "rssStartKiB": rss0,
+            "rssEndKiB": rss1,
+            "memoryGrowthKiB": rss1 - rss0 if rss0 is not None and rss1 is not None else None,
+            "timeToDetect": dict(_distribution(detect) or {}, released=len(released), detected=len(detect)),
+            "status": stats1["status"],
+        }
+
+
+def run_worker(frontend, cycles, interval, rate, mock_url, output):
+    import auth
+    import release_model
+    import slot_diff
+    import transport
+    from mock_api import AVAILABLE_PATH
+
+    control_url = mock_url[: -len(AVAILABLE_PATH)]
+    probe = CycleProbe(cycles, interval, control_url)
+    session = BenchSession(control_url)
+
+    # Patched before the frontend imports them
+    transport.wait_for_next_cycle = probe.wait
+    release_model.ReleaseModel.save = lambda self: None
+    original_update = slot_diff.SlotDiff.update
+
+    def update(self, center, slots):
+        events = original_update(self, center, slots)
+        probe.saw(events)
+        return events
+
+    slot_diff.SlotDiff.update = update
+    result = {}
+
+    if frontend == "cli":
+        auth.AuthSession = lambda **kwargs: session
+        sys.argv = ["sbat.py", "--notify", "stdout", "--rate", str(rate)]
+        try:
+            runpy.run_path(os.path.join(ROOT, "sbat.py"), run_name="__main__")
+        except BenchmarkFinished:
+            pass
+        except SystemExit as e:
+            result["error"] = f"sbat.py exited with {e.code}"
+    else:
+        try:
+            import sbat_gui_pyside as gui
+        except ImportError as e:
+            result["skipped"] = f"GUI not importable ({e})"
+        else:
+            # No window: drain the bridge buffer directly and watch for the loop giving up
+            gui.bridge.items_pending.connect(lambda: gui.bridge.take())
+            gui.bridge.checks_stopped.connect(lambda expired, message: result.setdefault("error", message))
+            gui.slot_store = gui.SlotStore()
+            gui.slot_diff = gui.SlotDiff(store=gui.slot_store)
+            gui.token_manager = auth.TokenManager(session.start(), session=session, log_fn=gui.log_message)
+            gui.fetcher.bucket.rate = rate
+            probe.stop = gui.stop_event.set
+            gui.run_checks()
+            gui.hedged_fetcher.close()
+            gui.slot_store.close()
+
+    if "skipped" not in result:
+        result = dict(probe.results(), **result)
+        result["tokenRefreshes"] = session.refreshes
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f)
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+def run_scenario(scenario, frontend, cycles, rate, seed):
+    """Start a mock for the scenario and run one frontend against it in a child process."""
+    cycles = cycles or scenario["cycles"]
+    with tempfile.TemporaryDirectory(prefix="sbat-bench-") as home:
+        mock = subprocess.Popen(
+            [sys.executable, MOCK, "--port", "0", "--seed", str(seed), "--config", json.dumps(scenario["mock"])],
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        try:
+            url = mock.stdout.readline().strip()
+            if not url:
+                return {"error": "mock API did not start"}
+            output = os.path.join(home, "result.json")
+            env = dict(os.environ, HOME=home, USERPROFILE=home, SBAT_AVAILABLE_URL=url)
+            command = [
+                sys.executable, os.path.abspath(__file__), "--worker", frontend, "--mock-url", url,
+                "--cycles", str(cycles), "--interval", str(scenario["interval"]), "--rate", str(rate),
+                "--output", output,
+            ]
+            timeout = cycles * (scenario["interval"] + 5) + WORKER_TIMEOUT_MARGIN
+            try:
+                proc = subprocess.run(command, env=env, stdout=subprocess.DEVNULL, timeout=timeout)
+            except subprocess.TimeoutExpired:
+                return {"error": f"timed out after {timeout:.0f}s"}
+            if not os.path.exists(output):
+                return {"error": f"worker exited with {proc.returncode}"}
+            with open(output, encoding="utf-8") as f:
+                return json.load(f)
+        finally:
+            mock.terminate()
+            mock.wait()
+
+
+def revision():
+    """(short commit hash, has uncommitted changes) of the tree, or ("unknown", None)."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip()
+        return commit, bool(dirty)
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", None
+
+
+def _headline(metrics):
+    """The numbers printed in the summary and compared by --compare."""
+    if not metrics or "cycleLatency" not in metrics or not metrics["cycleLatency"]:
+        return {}
+    detect = metrics.get("timeToDetect") or {}
+    return {
+        "cycle p50 ms": metrics["cycleLatency"]["p50"] * 1000,
+        "cycle p95 ms": metrics["cycleLatency"]["p95"] * 1000,
+        "req/s": metrics["requestsPerSecond"],
+        "CPU ms/cycle": metrics["cpuPerCycle"] * 1000,
+        "mem growth KiB": metrics["memoryGrowthKiB"],
+        "detect p50 s": detect.get("p50"),
+    }
+
+
+def print_summary(results, previous=None):
+    for name, scenario in results["scenarios"].items():
+        for frontend in FRONTENDS:
+            metrics = scenario.get(frontend)
+            if metrics is None:
+                continue
+            label = f"{name:<13} {frontend:<4}"
+            if "error" in metrics or "skipped" in metrics:
+                print(label, metrics.get("error") or f"skipped: {metrics['skipped']}")
+                continue
+            old = _headline(((previous or {}).get("scenarios", {}).get(name) or {}).get(frontend))
+            parts = []
+            for key, value in _headline(metrics).items():
+                if value is None:
+                    continue
+                part = f"{key} {value:.1f}"
+                if old.get(key):
+                    part += f" ({(value - old[key]) / old[key] * 100:+.0f}%)"
+                parts.append(part)
+            print(label, ", ".join(parts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks of the SBAT polling loops against a mock API")
+    parser.add_argument("--scenarios", help=f"Comma-separated scenarios (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument("--frontends", default=",".join(FRONTENDS), help="cli, gui or both (default: both)")
+    parser.add_argument("--cycles", type=int, help="Override the number of cycles of every scenario")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help=f"Client request rate (default: {DEFAULT_RATE:g}/s)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the mock's latency and error draws")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/<revision>-<time>.json)")
+    parser.add_argument("--compare", metavar="OLD_JSON", help="Print changes against an earlier result file")
+    # Internal: run one frontend in this process (started by the runner)
+    parser.add_argument("--worker", choices=FRONTENDS, help=argparse.SUPPRESS)
+    parser.add_argument("--mock-url", help=argparse.SUPPRESS)
+    parser.add_argument("--interval", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        run_worker(args.worker, args.cycles, args.interval, args.rate, args.mock_url, args.output)
+        return
+
+    names = [name.strip() for name in args.scenarios.split(",")] if args.scenarios else list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown scenario(s): {', '.join(unknown)}")
+    frontends = [name.strip() for name in args.frontends.split(",")]
+    if not set(frontends) <= set(FRONTENDS):
+        parser.error("--frontends takes cli, gui or cli,gui")
+
+    commit, dirty = revision()
+    results = {
+        "revision": commit,
+        "dirty": dirty,
+        "createdAt": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "rate": args.rate,
+        "scenarios": {},
+    }
+    for name in names:
+        scenario = SCENARIOS[name]
+        entry = results["scenarios"][name] = {
+            "description": scenario["description"],
+            "interval": scenario["interval"],
+            "mock": scenario["mock"],
+        }
+        for frontend in frontends:
+            print(f"Running {name} ({frontend})...", flush=True)
+            entry[frontend] = run_scenario(scenario, frontend, args.cycles, args.rate, args.seed)
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{commit}{'-dirty' if dirty else ''}-{stamp}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)
+        print(f"\nCompared with {previous.get('revision')} ({previous.get('createdAt')}):")
+    else:
+        print()
+    print_summary(results, previous)
+    print(f"\nResults saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
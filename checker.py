@@ -0,0 +1,164 @@
+"""
+Polling helpers shared by the CLI (sbat.py) and the GUI (sbat_gui_pyside.py).
+
+All availability requests of a check cycle are fanned out over a thread pool,
+so a cycle takes about as long as the slowest single center instead of the
+sum of all round-trips. Requests go over the shared keep-alive session in
+transport.py. Every request gets its own payload dict; the shared
+PAYLOAD_BASE is never mutated.
+
+Most cycles return exactly the same body for every center. ResponseCache
+fingerprints the raw bytes per target and sends If-None-Match /
+If-Modified-Since when the API provides validators, so unchanged responses
+skip JSON decoding and diffing altogether.
+"""
+
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+
+from constants import AVAILABLE_URL, MAX_CONCURRENT_REQUESTS, PAYLOAD_BASE
+from matrix import DEFAULT_TARGETS
+from metrics import REQUEST_DURATION, RESPONSES
+from transport import post
+
+
+def build_payload(target):
+    """Return a fresh request payload for one matrix Target."""
+    payload = PAYLOAD_BASE.copy()
+    payload["examCenterId"] = target.center_id
+    payload["licenseType"] = target.license_type
+    payload["examType"] = target.exam_type
+    # Start date is always calculated relative to now, not to import time
+    payload["startDate"] = (
+        f"{(datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')}T00:00"
+    )
+    return payload
+
+
+class ResponseCache:
+    """
+    Per-target body fingerprints and HTTP validators.
+
+    unchanged() tells whether a response carries the same slots as the
+    previous one for that target (a 304, or a 200 with an identical body).
+    fast_path_cycles counts cycles in which every response was unchanged.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # target -> (body digest, ETag, Last-Modified)
+        self.cycles = 0
+        self.fast_path_cycles = 0
+
+    def conditional_headers(self, target):
+        """Validator headers to send with the next request for target."""
+        with self._lock:
+            entry = self._entries.get(target)
+        if not entry:
+            return {}
+        _, etag, last_modified = entry
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def unchanged(self, target, response):
+        """
+        Return True if response holds the same slots as the last one seen.
+
+        Only the raw bytes are hashed; the body is never decoded here.
+        """
+        if response.status_code == 304:
+            return True  # Validators are only sent once a body was fingerprinted
+        digest = hashlib.blake2b(response.content, digest_size=16).digest()
+        entry = (digest, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        with self._lock:
+            previous = self._entries.get(target)
+            self._entries[target] = entry
+        return previous is not None and previous[0] == digest
+
+    def forget(self, target):
+        """Drop the fingerprint so the next response for target is fully processed."""
+        with self._lock:
+            self._entries.pop(target, None)
+
+    def record_cycle(self, fast_path):
+        self.cycles += 1
+        if fast_path:
+            self.fast_path_cycles += 1
+
+    def summary(self):
+        return f"fast path {self.fast_path_cycles}/{self.cycles} cycles"
+
+
+class CycleDeadlineExceeded(TimeoutError):
+    """Result of a target that had not answered when the cycle deadline passed."""
+
+    def __init__(self, deadline):
+        super().__init__(f"no answer within the {deadline:g}s cycle deadline")
+
+
+def is_success(response):
+    """200, or 304 Not Modified in reply to a conditional request."""
+    return response.status_code in (200, 304)
+
+
+def fetch_center(target, headers, timeout=None, cache=None, session=None):
+    """POST the availability request for a single Target and return the response."""
+    if cache:
+        headers = {**headers, **cache.conditional_headers(target)}
+    started = time.monotonic()
+    try:
+        response = post(
+            AVAILABLE_URL, session=session, headers=headers, json=build_payload(target), timeout=timeout
+        )
+    except Exception:
+        RESPONSES.labels(target.label, "error").inc()
+        raise
+    finally:
+        # Failed attempts (timeouts above all) count towards the latency too
+        REQUEST_DURATION.labels(target.label).observe(time.monotonic() - started)
+    RESPONSES.labels(target.label, response.status_code).inc()
+    return response
+
+
+def fetch_all(headers, targets=DEFAULT_TARGETS, max_workers=MAX_CONCURRENT_REQUESTS, timeout=None,
+              cache=None, fetch_fn=None, deadline=None):
+    """
+    Query every target concurrently.
+
+    At most max_workers requests are in flight at once (1 = sequential).
+    fetch_fn replaces fetch_center, e.g. with a resilience.ResilientFetcher.
+    Returns a list of (target, result) tuples in the same order as targets,
+    where result is either a requests.Response or the exception raised while
+    fetching — one failing center never hides the results of the others.
+    After `deadline` seconds the call returns regardless; targets still
+    pending get a CycleDeadlineExceeded result.
+    """
+    targets = list(targets)
+    if not targets:
+        return []
+
+    fetch_fn = fetch_fn or fetch_center
+
+    def fetch(target):
+        try:
+            return fetch_fn(target, headers, timeout=timeout, cache=cache)
+        except Exception as e:
+            return e
+
+    workers = max(1, min(max_workers, len(targets)))
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sbat-poll")
+    futures = [pool.submit(fetch, target) for target in targets]
+    done, _ = wait(futures, timeout=deadline)
+    # Stragglers finish in the background (bounded by their request timeouts)
+    pool.shutdown(wait=False, cancel_futures=True)
+    return [
+        (target, future.result() if future in done else CycleDeadlineExceeded(deadline))
+        for target, future in zip(targets, futures)
+    ]
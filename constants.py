@@ -1,6 +1,8 @@
+import os
 from datetime import datetime, timedelta
 
-AVAILABLE_URL = "https://api-rijbewijs.sbat.be/praktijk/api/exam/available"
+# SBAT_AVAILABLE_URL points the checker at another server, e.g. benchmarks/mock_api.py
+AVAILABLE_URL = os.environ.get("SBAT_AVAILABLE_URL", "https://api-rijbewijs.sbat.be/praktijk/api/exam/available")
 SBAT_LOGIN_URL = "https://rijbewijs.sbat.be/praktijk/examen/login"
 USER_AGENT = "SBAT Exam Check GUI (github.com/fre-db/sbat-exam-check)"
 CENTER_IDS = [
@@ -10,6 +12,55 @@ CENTER_IDS = [
     (9, "Erembodegem"),
     (8, "Eeklo"),
 ]
+# Region of the exam centers in CENTER_IDS (default request matrix catalog)
+DEFAULT_REGION = "Oost-Vlaanderen"
+# Global rate limit for the request matrix scheduler
+REQUESTS_PER_SECOND = 2
+# Maximum number of availability requests in flight at the same time
+MAX_CONCURRENT_REQUESTS = 5
+# A check cycle stops waiting for centers that have not answered after this many seconds
+CYCLE_DEADLINE = 30
+# Brussels hours at which new slots are usually released; polled fast until the release model has learned better
+HOT_HOURS = {7, 16}
+# Seconds before a release window at which connections to the API are pre-warmed
+PREWARM_LEAD_SECONDS = 10
+# Poll intervals chosen by the learned release model (release_model.py)
+SLEEP_PEAK = 20
+# Peak interval while the model still leans on the HOT_HOURS prior: the old fixed schedule's, so an untrained model polls no more often than it did
+SLEEP_PRIOR_PEAK = 30
+SLEEP_DEFAULT = 120
+SLEEP_DEAD = 300
+# Refresh the token this many seconds before the JWT expires, retry failed refreshes after
+TOKEN_REFRESH_MARGIN = 300
+TOKEN_RETRY_INTERVAL = 60
+# Directory for state that survives restarts
+STATE_DIR = os.path.join(os.path.expanduser("~"), ".sbat_checker")
+RELEASE_MODEL_PATH = os.path.join(STATE_DIR, "release_model.json")
+SLOT_DB_PATH = os.path.join(STATE_DIR, "slots.db")
+# Slot events (and slots removed) longer ago than this many days are pruned from SLOT_DB_PATH
+SLOT_HISTORY_DAYS = 90
+# Saved browser cookies/localStorage for instant re-auth after a restart (contains
+# session cookies, so it is opt-in: CLI --persist-session, GUI via this flag)
+BROWSER_STATE_PATH = os.path.join(STATE_DIR, "browser_state.json")
+PERSIST_BROWSER_SESSION = False
+# Close the browser between token refreshes instead of keeping it running (CLI: --hibernate-browser)
+HIBERNATE_BROWSER = False
+# Refresh tokens by replaying the login redirects over HTTP before using the browser (CLI: --browser-refresh disables)
+HTTP_TOKEN_REFRESH = True
+# Local JSON API of `sbat.py --daemon` (see daemon.py)
+DAEMON_HOST = "127.0.0.1"
+DAEMON_PORT = 8765
+# Prometheus metrics (see metrics.py): served on METRICS_HOST:METRICS_PORT and/or written
+# to METRICS_FILE; None disables (CLI: --metrics-port / --metrics-file)
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = None
+METRICS_FILE = None
+# Lines kept in the GUI log view; older lines are dropped
+GUI_LOG_MAX_LINES = 2000
+# The first new-slot alert is shown at once; alerts in the next this many milliseconds follow as one notification
+GUI_ALERT_COALESCE_MS = 2000
+# Alerts kept in the GUI's new-slots panel until dismissed
+GUI_ALERT_HISTORY = 20
 PAYLOAD_BASE = {
     "licenseType": "B",
     "examType": "E2",
@@ -0,0 +1,205 @@
+"""
+Daemon mode: one poller, many readers.
+
+`sbat.py --daemon` runs the normal polling loop (one AuthSession, one token,
+one poll of every center) headless and serves its state over a local JSON
+API, so any number of clients can watch slots without adding a single
+request to SBAT:
+
+    GET /slots                               current free slots per center
+    GET /history?since=TS&limit=N&center=C   slot events, oldest first
+    GET /status                              poller and token health
+    POST /subscriptions                      register a filter (see subscriptions.py)
+    GET /subscriptions/ID                    the filter and the new slots it matched
+    DELETE /subscriptions/ID                 unregister it
+
+The poller publishes a snapshot after every cycle. It is serialized once and
+the same bytes are handed to every reader, so reads never wait on the
+polling loop. History comes from the SlotStore database (read-only), which
+lags the poller by at most slot_store.FLUSH_INTERVAL. New slots are matched
+against the subscriptions through a SubscriptionIndex when they are
+published; each subscription keeps its last MATCH_HISTORY matches.
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from constants import DAEMON_HOST, DAEMON_PORT
+from subscriptions import SubscriptionIndex
+
+HISTORY_DEFAULT_LIMIT = 100
+HISTORY_MAX_LIMIT = 1000
+MATCH_HISTORY = 100
+MAX_REQUEST_BYTES = 64 * 1024
+
+
+def _encode(data):
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "sbat-daemon"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        state = self.server.state
+        try:
+            if url.path == "/slots":
+                body = state.slots_body
+            elif url.path == "/status":
+                body = state.status_body
+            elif url.path.startswith("/subscriptions/"):
+                body = state.subscription(self._subscription_id(url.path))
+                if body is None:
+                    self._send(404, _encode({"error": "Unknown subscription"}))
+                    return
+            elif url.path == "/history":
+                body = _encode(state.history(
+                    since=float(query.get("since", ["0"])[0]),
+                    limit=int(query.get("limit", [HISTORY_DEFAULT_LIMIT])[0]),
+                    center=query.get("center", [None])[0],
+                ))
+            else:
+                self._send(404, _encode({"error": f"Unknown path {url.path}"}))
+                return
+        except ValueError as e:
+            self._send(400, _encode({"error": str(e)}))
+            return
+        self._send(200, body)
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/subscriptions":
+            self._send(404, _encode({"error": f"Unknown path {self.path}"}))
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            if length > MAX_REQUEST_BYTES:
+                raise ValueError("Request body too large")
+            data = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(data, dict):
+                raise ValueError("Expected a JSON object")
+            subscription = self.server.state.subscribe(data)
+        except (ValueError, TypeError, AttributeError) as e:
+            self._send(400, _encode({"error": str(e)}))
+            return
+        self._send(201, _encode(subscription.to_dict()))
+
+    def do_DELETE(self):
+        path = urlparse(self.path).path
+        try:
+            removed = path.startswith("/subscriptions/") and self.server.state.unsubscribe(
+                self._subscription_id(path)
+            )
+        except ValueError as e:
+            self._send(400, _encode({"error": str(e)}))
+            return
+        if removed:
+            self._send(200, _encode({"deleted": True}))
+        else:
+            self._send(404, _encode({"error": "Unknown subscription"}))
+
+    @staticmethod
+    def _subscription_id(path):
+        return int(path.rsplit("/", 1)[1])
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Keep the poller's console output readable
+
+
+class StateServer:
+    """Serves the poller's published state over HTTP on a background thread."""
+
+    def __init__(self, store, host=DAEMON_HOST, port=DAEMON_PORT):
+        self._store = store
+        self.subscriptions = SubscriptionIndex()
+        self._matches = {}  # subscription id -> deque of matched slot dicts
+        self._matches_lock = threading.Lock()
+        self._started = time.time()
+        self._cycles = 0
+        self.slots_body = _encode({"updatedAt": None, "centers": {}})
+        self.status_body = _encode({"startedAt": self._started, "cycles": 0})
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.state = self
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True, name="sbat-daemon")
+
+    @property
+    def address(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+
+    def publish(self, slot_diff, events=(), cycle_completed=True, **status):
+        """
+        Replace the served snapshot with the slots currently known to
+        slot_diff and match the cycle's events against the subscriptions.
+        Extra keyword arguments are included in /status.
+        """
+        now = time.time()
+        if cycle_completed:
+            self._cycles += 1
+            self.subscriptions.expire_cache()
+        matches = self.subscriptions.match(events)
+        with self._matches_lock:
+            for subscription_id, matched in matches.items():
+                history = self._matches.get(subscription_id)
+                if history is not None:  # None if unsubscribed while matching
+                    history.extend({"ts": now, "center": e.center, "slot": e.slot.to_dict()} for e in matched)
+        centers = {
+            center: [slot.to_dict() for slot in sorted(slot_diff.slots(center).values(), key=lambda s: s.start or 0)]
+            for center in sorted(slot_diff.centers())
+        }
+        self.slots_body = _encode({"updatedAt": now, "centers": centers})
+        self.status_body = _encode(dict(
+            status,
+            startedAt=self._started,
+            updatedAt=now,
+            cycles=self._cycles,
+            centers=len(centers),
+            slots=sum(len(slots) for slots in centers.values()),
+            subscriptions=len(self.subscriptions),
+        ))
+
+    def subscribe(self, data):
+        subscription = self.subscriptions.add(data)
+        with self._matches_lock:
+            self._matches[subscription.id] = deque(maxlen=MATCH_HISTORY)
+        return subscription
+
+    def unsubscribe(self, subscription_id):
+        with self._matches_lock:
+            self._matches.pop(subscription_id, None)
+        return self.subscriptions.remove(subscription_id)
+
+    def subscription(self, subscription_id):
+        """JSON body for one subscription, or None if it does not exist."""
+        subscription = self.subscriptions.get(subscription_id)
+        with self._matches_lock:
+            history = self._matches.get(subscription_id)
+            matches = list(history) if history is not None else None
+        if subscription is None or matches is None:
+            return None
+        return _encode(dict(subscription.to_dict(), matches=matches))
+
+    def history(self, since=0.0, limit=HISTORY_DEFAULT_LIMIT, center=None):
+        if limit < 1:
+            raise ValueError("limit must be positive")
+        return {"events": self._store.history(since, min(limit, HISTORY_MAX_LIMIT), center)}
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -0,0 +1,155 @@
+"""
+Latency-derived deadlines and hedged requests.
+
+LatencyTracker keeps the latencies of recent availability requests (all
+centers share the API host, so one window is used for all). A sample is the
+time from the first submit to the response, hedge delay included, so the
+window describes the latency the checker actually gets. A request that ends
+in a timeout counts with the time it waited, so a run of timeouts raises the
+percentiles instead of leaving them at the last good values. From the window,
+HedgedFetcher derives:
+
+* a per-request timeout of TIMEOUT_FACTOR x p95, clamped to
+  [MIN_TIMEOUT, MAX_TIMEOUT], so one hung connection can never stall a cycle,
+* a hedge delay equal to the p95 (at least MIN_HEDGE_DELAY, so ordinary
+  jitter is not hedged): a request still unanswered after that gets
+  a second attempt on a separate session (its own connection pool), and
+  whichever answers first wins. By definition only ~5% of requests are
+  hedged, so the extra load stays small while the slow tail is cut off.
+
+Until MIN_SAMPLES latencies are known, DEFAULT_TIMEOUT and
+DEFAULT_HEDGE_DELAY are used.
+"""
+
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+
+from constants import MAX_CONCURRENT_REQUESTS
+from transport import get_hedge_session, get_session, set_pool_size
+
+WINDOW = 200
+MIN_SAMPLES = 20
+TIMEOUT_FACTOR = 4.0
+MIN_TIMEOUT = 3.0
+MAX_TIMEOUT = 20.0
+DEFAULT_TIMEOUT = 10.0
+DEFAULT_HEDGE_DELAY = 2.0
+MIN_HEDGE_DELAY = 0.25
+
+
+class LatencyTracker:
+    """Sliding window of request latencies with percentile estimates."""
+
+    def __init__(self, window=WINDOW):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def count_hedge(self, won=False):
+        """Count a hedge that was sent (won=False) or that answered first (won=True)."""
+        with self._lock:
+            if won:
+                self.hedge_wins += 1
+            else:
+                self.hedged += 1
+
+    def percentile(self, p):
+        """p-th percentile (0-100) of the window, or None with too few samples."""
+        with self._lock:
+            samples = list(self._samples)
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return statistics.quantiles(samples, n=100, method="inclusive")[min(98, max(0, p - 1))]
+
+    def request_timeout(self):
+        p95 = self.percentile(95)
+        if p95 is None:
+            return DEFAULT_TIMEOUT
+        return min(MAX_TIMEOUT, max(MIN_TIMEOUT, p95 * TIMEOUT_FACTOR))
+
+    def hedge_delay(self):
+        p95 = self.percentile(95)
+        return DEFAULT_HEDGE_DELAY if p95 is None else max(MIN_HEDGE_DELAY, p95)
+
+    def summary(self):
+        p50, p95 = self.percentile(50), self.percentile(95)
+        if p95 is None:
+            return "latency not measured yet"
+        with self._lock:
+            hedged, hedge_wins = self.hedged, self.hedge_wins
+        return (
+            f"latency p50 {p50 * 1000:.0f} ms, p95 {p95 * 1000:.0f} ms, "
+            f"{hedged} hedged ({hedge_wins} won)"
+        )
+
+
+class HedgedFetcher:
+    """
+    Wraps fetch_center(target, headers, timeout=..., session=..., **kwargs)
+    with a latency-derived timeout and a hedged second attempt.
+
+    An explicit timeout from the caller caps the derived one.
+    """
+
+    def __init__(self, fetch_fn, tracker=None, max_workers=MAX_CONCURRENT_REQUESTS):
+        self._fetch_fn = fetch_fn
+        self.tracker = tracker or LatencyTracker()
+        # Primary and hedge attempts of every concurrent request
+        self._pool = ThreadPoolExecutor(max_workers=2 * max_workers, thread_name_prefix="sbat-hedge")
+        # A hedged request leaves its losing attempt running, so up to two
+        # attempts per worker can hold a connection of the same session
+        set_pool_size(2 * max_workers)
+
+    def _attempt(self, target, headers, session, timeout, kwargs):
+        return self._fetch_fn(target, headers, timeout=timeout, session=session, **kwargs)
+
+    def __call__(self, target, headers, timeout=None, **kwargs):
+        derived = self.tracker.request_timeout()
+        timeout = min(timeout, derived) if timeout else derived
+        started = time.monotonic()
+        primary = self._pool.submit(self._attempt, target, headers, get_session(), timeout, kwargs)
+        done, _ = wait([primary], timeout=min(self.tracker.hedge_delay(), timeout))
+        if done:
+            return self._finish([primary], started)
+
+        self.tracker.count_hedge()
+        hedge = self._pool.submit(self._attempt, target, headers, get_hedge_session(), timeout, kwargs)
+        pending = {primary, hedge}
+        failed = []
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self.tracker.count_hedge(won=True)
+                    return self._finish([future], started)
+                failed.append(future)
+        return self._finish(failed, started)  # Both attempts failed
+
+    def _finish(self, futures, started):
+        """
+        Record the latency since `started` and return the response of the
+        first future, or raise the error of the last one. Failures are
+        only recorded if one of the attempts timed out.
+        """
+        elapsed = time.monotonic() - started
+        errors = [future.exception() for future in futures]
+        if errors[0] is None:
+            self.tracker.record(elapsed)
+            return futures[0].result()
+        if any(isinstance(error, requests.Timeout) for error in errors):
+            self.tracker.record(elapsed)
+        raise errors[-1]
+
+    def close(self):
+        self._pool.shutdown(wait=False)
@@ -0,0 +1,193 @@
+"""
+Request matrix: every (exam center, license type, exam type) combination to poll.
+
+The matrix is built from a catalog, either the built-in default (the
+CENTER_IDS of East Flanders with PAYLOAD_BASE's license and exam type) or a
+JSON file of the form:
+
+    {
+        "regions": {
+            "Oost-Vlaanderen": [[7, "Brakel"], [10, "Sint-Niklaas"]],
+            "Antwerpen": [[2, "Deurne"]]
+        },
+        "licenseTypes": ["B", "AM"],
+        "examTypes": ["E2"]
+    }
+
+MatrixScheduler spreads the requests of one cycle evenly over the cycle
+under a global rate limit instead of firing them in one burst, and keeps
+track of how often each combination was actually polled.
+"""
+
+import json
+import statistics
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from constants import (
+    CENTER_IDS,
+    DEFAULT_REGION,
+    MAX_CONCURRENT_REQUESTS,
+    PAYLOAD_BASE,
+    REQUESTS_PER_SECOND,
+)
+
+
+class Target(namedtuple("Target", "center_id center_name region license_type exam_type")):
+    """One polled combination of exam center, license type and exam type."""
+
+    __slots__ = ()
+
+    @property
+    def label(self):
+        """Human-readable name; just the center name for the default license/exam type."""
+        if (self.license_type, self.exam_type) == (PAYLOAD_BASE["licenseType"], PAYLOAD_BASE["examType"]):
+            return self.center_name
+        return f"{self.center_name} ({self.license_type}/{self.exam_type})"
+
+
+DEFAULT_CATALOG = {
+    "regions": {DEFAULT_REGION: [list(center) for center in CENTER_IDS]},
+    "licenseTypes": [PAYLOAD_BASE["licenseType"]],
+    "examTypes": [PAYLOAD_BASE["examType"]],
+}
+
+
+def load_catalog(path):
+    """Read a catalog JSON file (see module docstring for the format)."""
+    with open(path, encoding="utf-8") as f:
+        catalog = json.load(f)
+    if not catalog.get("regions"):
+        raise ValueError(f"Catalog {path} does not list any regions")
+    catalog.setdefault("licenseTypes", DEFAULT_CATALOG["licenseTypes"])
+    catalog.setdefault("examTypes", DEFAULT_CATALOG["examTypes"])
+    return catalog
+
+
+def build_matrix(catalog=None, regions=None, license_types=None, exam_types=None):
+    """
+    Expand a catalog into the list of Targets to poll.
+
+    regions, license_types and exam_types optionally narrow or override the
+    catalog's own lists.
+    """
+    catalog = catalog or DEFAULT_CATALOG
+    license_types = license_types or catalog["licenseTypes"]
+    exam_types = exam_types or catalog["examTypes"]
+    targets = []
+    for region, centers in catalog["regions"].items():
+        if regions and region not in regions:
+            continue
+        for center_id, center_name in centers:
+            for license_type in license_types:
+                for exam_type in exam_types:
+                    targets.append(Target(center_id, center_name, region, license_type, exam_type))
+    return targets
+
+
+DEFAULT_TARGETS = build_matrix()
+
+
+class MatrixScheduler:
+    """
+    Polls a large request matrix at a steady pace.
+
+    Requests of one cycle are dispatched at evenly spaced moments over the
+    cycle, never faster than `rate` requests per second overall. If the
+    matrix is too large to fit in the cycle at that rate, the cycle is
+    stretched instead of bursting.
+    """
+
+    def __init__(self, targets, fetch_fn, rate=REQUESTS_PER_SECOND,
+                 max_workers=MAX_CONCURRENT_REQUESTS):
+        self.targets = list(targets)
+        self.rate = rate
+        self._fetch_fn = fetch_fn
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sbat-matrix")
+        self._last_polled = {}  # Target -> monotonic time of last dispatch
+        self._intervals = {}  # Target -> smoothed seconds between polls
+
+    def run_cycle(self, headers, cycle_seconds, wait=time.sleep):
+        """
+        Poll every target once, spread over cycle_seconds.
+
+        fetch_fn(target, headers) is called on the worker pool. wait is called
+        with a number of seconds; if it returns True (a stop event was set)
+        dispatching stops early. Returns a list of (target, result) tuples
+        for the targets that were dispatched, where result is a response or
+        the exception raised while fetching.
+        """
+        if not self.targets:
+            wait(cycle_seconds)
+            return []
+
+        spacing = max(1.0 / self.rate, cycle_seconds / len(self.targets))
+        start = time.monotonic()
+        futures = []
+        for i, target in enumerate(self.targets):
+            delay = start + i * spacing - time.monotonic()
+            if delay > 0 and wait(delay):
+                break
+            self._record_dispatch(target)
+            futures.append((target, self._pool.submit(self._fetch, target, headers)))
+
+        results = [(target, future.result()) for target, future in futures]
+
+        # Keep the gap before the next cycle's first request at `spacing` too
+        remaining = start + len(self.targets) * spacing - time.monotonic()
+        if len(futures) == len(self.targets) and remaining > 0:
+            wait(remaining)
+        return results
+
+    def retry(self, headers, targets, wait=time.sleep):
+        """
+        Fetch `targets` again (e.g. after a 401) on the same worker pool,
+        spaced 1/rate apart so retries stay within the global rate too.
+        Retries do not count as polls in the frequency report. Returns
+        (target, result) tuples like run_cycle().
+        """
+        spacing = 1.0 / self.rate
+        start = time.monotonic()
+        futures = []
+        for i, target in enumerate(targets):
+            delay = start + i * spacing - time.monotonic()
+            if delay > 0 and wait(delay):
+                break
+            futures.append((target, self._pool.submit(self._fetch, target, headers)))
+        return [(target, future.result()) for target, future in futures]
+
+    def _fetch(self, target, headers):
+        try:
+            return self._fetch_fn(target, headers)
+        except Exception as e:
+            return e
+
+    def _record_dispatch(self, target):
+        now = time.monotonic()
+        last = self._last_polled.get(target)
+        self._last_polled[target] = now
+        if last is not None:
+            interval = now - last
+            previous = self._intervals.get(target)
+            # Exponential moving average so the report follows changes in pace
+            self._intervals[target] = interval if previous is None else 0.8 * previous + 0.2 * interval
+
+    def frequency_report(self):
+        """Return {target: achieved polls per hour} for every target polled at least twice."""
+        return {target: 3600.0 / interval for target, interval in self._intervals.items() if interval > 0}
+
+    def summary(self):
+        """One-line summary of the achieved per-combination polling frequency."""
+        report = self.frequency_report()
+        if not report:
+            return f"{len(self.targets)} combinations, polling frequency not measured yet"
+        per_hour = sorted(report.values())
+        return (
+            f"{len(self.targets)} combinations polled "
+            f"{per_hour[0]:.1f}-{per_hour[-1]:.1f}/h (median {statistics.median(per_hour):.1f}/h, "
+            f"every {3600 / statistics.median(per_hour):.1f}s)"
+        )
+
+    def close(self):
+        self._pool.shutdown(wait=False)
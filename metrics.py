@@ -0,0 +1,373 @@
+"""
+Counters and histograms of polling and auth health, in Prometheus text format.
+
+The polling code only increments numbers in memory (a dict lookup, a bisect
+and a short lock per observation); the text exposition is rendered when it
+is read, either by a scraper or by the file exporter:
+
+    MetricsServer(port)        serves GET /metrics on a local port
+                               (CLI: --metrics-port, GUI: METRICS_PORT)
+    MetricsFileWriter(path)    rewrites the file every FILE_INTERVAL seconds,
+                               e.g. for node_exporter's textfile collector
+                               (CLI: --metrics-file, GUI: METRICS_FILE)
+
+Exported metrics:
+
+    sbat_request_duration_seconds{center}         availability request latency (every attempt)
+    sbat_responses_total{center,status}           HTTP status per center ("error" if no response)
+    sbat_cycle_duration_seconds                   check cycle, from the first request to the sleep
+    sbat_sleep_seconds                            sleep chosen before the next cycle
+    sbat_slots{center}                            free slots currently known
+    sbat_slot_events_total{kind}                  added / removed / changed slots
+    sbat_new_slot_poll_interval_seconds           poll interval of a center at the polls that found
+                                                  new slots (the release time itself is unknown, so
+                                                  this bounds the detection delay, it is not one)
+    sbat_token_age_seconds                        age of the current token
+    sbat_token_expires_in_seconds                 time left before the token expires
+    sbat_token_refresh_duration_seconds{outcome}  AuthSession refresh: silent, reauth or failed
+"""
+
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from constants import METRICS_HOST
+from slot_diff import ADDED
+
+FILE_INTERVAL = 15
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# ---------------------------------------------------------------------------
+# Metric types
+# ---------------------------------------------------------------------------
+
+class _Metric(ABC):
+    """A metric family; labels(...) returns the child for one label combination."""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}  # label values -> child
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def labels(self, *values):
+        key = tuple(map(str, values))
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            children = sorted(self._children.items())
+        for key, child in children:
+            lines.extend(self._render_child(key, child))
+        return lines
+
+    @abstractmethod
+    def _new_child(self):
+        """A fresh child holding the value(s) of one label combination."""
+
+    @abstractmethod
+    def _render_child(self, key, child):
+        """Exposition lines of one child, whose label values are `key`."""
+
+
+class _Value:
+    __slots__ = ("value", "function", "lock")
+
+    def __init__(self):
+        self.value = 0
+        self.function = None
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def set(self, value):
+        self.value = value
+
+    def set_function(self, function):
+        """Read the value from function() at exposition time; None leaves it out."""
+        self.function = function
+
+    def get(self):
+        return self.function() if self.function else self.value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._children[()].inc(amount)
+
+    def _render_child(self, key, child):
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(child.get())}"]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value):
+        self._children[()].set(value)
+
+    def set_function(self, function):
+        self._children[()].set_function(function)
+
+    def _render_child(self, key, child):
+        value = child.get()
+        if value is None:
+            return []
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"]
+
+
+class _Buckets:
+    __slots__ = ("bounds", "counts", "sum", "lock")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Last one is +Inf
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=()):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _Buckets(self.buckets)
+
+    def observe(self, value):
+        self._children[()].observe(value)
+
+    def _render_child(self, key, child):
+        with child.lock:
+            counts, total = list(child.counts), child.sum
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [('le', _number(bound))])} {cumulative}")
+        labels = _labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_number(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def exposition(self):
+        """All metrics in the Prometheus text format."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_DURATION = REGISTRY.register(Histogram(
+    "sbat_request_duration_seconds", "Availability request latency per center, every attempt.",
+    ["center"], buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20),
+))
+RESPONSES = REGISTRY.register(Counter(
+    "sbat_responses_total", "Availability responses per center and HTTP status (error: no response).",
+    ["center", "status"],
+))
+CYCLE_DURATION = REGISTRY.register(Histogram(
+    "sbat_cycle_duration_seconds", "Duration of a check cycle.",
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+))
+SLEEP_SECONDS = REGISTRY.register(Histogram(
+    "sbat_sleep_seconds", "Sleep chosen before the next check cycle.",
+    buckets=(5, 10, 20, 30, 60, 120, 300, 600),
+))
+SLOTS = REGISTRY.register(Gauge("sbat_slots", "Free slots currently known per center.", ["center"]))
+SLOT_EVENTS = REGISTRY.register(Counter("sbat_slot_events_total", "Slot changes seen, by kind.", ["kind"]))
+NEW_SLOT_POLL_INTERVAL = REGISTRY.register(Histogram(
+    "sbat_new_slot_poll_interval_seconds",
+    "Time since the previous poll of a center, at the polls that found new slots there.",
+    buckets=(10, 20, 30, 60, 120, 300, 600, 1800),
+))
+TOKEN_AGE = REGISTRY.register(Gauge("sbat_token_age_seconds", "Age of the current token."))
+TOKEN_EXPIRES_IN = REGISTRY.register(Gauge(
+    "sbat_token_expires_in_seconds", "Seconds until the current token expires."
+))
+TOKEN_REFRESH_DURATION = REGISTRY.register(Histogram(
+    "sbat_token_refresh_duration_seconds", "Duration of AuthSession token refreshes, by outcome.",
+    ["outcome"], buckets=(0.5, 1, 2, 5, 10, 30, 60, 120, 300),
+))
+
+
+# ---------------------------------------------------------------------------
+# Helpers for the polling loops
+# ---------------------------------------------------------------------------
+
+class PollTracker:
+    """Per-center bookkeeping for SLOTS, SLOT_EVENTS and NEW_SLOT_POLL_INTERVAL."""
+
+    def __init__(self):
+        self._last_poll = {}  # center -> monotonic time of its last successful poll
+
+    def polled(self, center, events=(), slot_count=None):
+        """
+        Record a successful poll of center with the events of its diff
+        (none if the response was unchanged).
+        """
+        now = time.monotonic()
+        previous = self._last_poll.get(center)
+        self._last_poll[center] = now
+        if slot_count is not None:
+            SLOTS.labels(center).set(slot_count)
+        added = False
+        for event in events:
+            SLOT_EVENTS.labels(event.kind).inc()
+            added = added or event.kind == ADDED
+        # The first poll after startup has nothing to compare with
+        if added and previous is not None:
+            NEW_SLOT_POLL_INTERVAL.observe(now - previous)
+
+
+def watch_token(get_manager):
+    """Export the age and remaining lifetime of get_manager()'s token (None: no token)."""
+
+    def age():
+        manager = get_manager()
+        return manager.token_age if manager else None
+
+    def expires_in():
+        manager = get_manager()
+        expiry = manager.expiry if manager else None
+        return expiry.timestamp() - time.time() if expiry else None
+
+    TOKEN_AGE.set_function(age)
+    TOKEN_EXPIRES_IN.set_function(expires_in)
+
+
+# ---------------------------------------------------------------------------
+# Exporters
+# ---------------------------------------------------------------------------
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "sbat-metrics"
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.server.registry.exposition().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes would flood the console
+
+
+class MetricsServer:
+    """Serves GET /metrics on a background thread."""
+
+    def __init__(self, port, host=METRICS_HOST, registry=REGISTRY):
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.registry = registry
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True, name="sbat-metrics")
+        self._thread.start()
+
+    @property
+    def address(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+class MetricsFileWriter:
+    """Rewrites path every `interval` seconds (atomically, so readers never see half a file)."""
+
+    def __init__(self, path, interval=FILE_INTERVAL, registry=REGISTRY):
+        self.path = path
+        self._interval = interval
+        self._registry = registry
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="sbat-metrics-file")
+        self._thread.start()
+
+    def write(self):
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(self._registry.exposition())
+        os.replace(temp_path, self.path)
+
+    def _run(self):
+        while True:
+            try:
+                self.write()
+            except OSError as e:
+                print(f"Could not write metrics to {self.path}: {e}")
+            if self._stop.wait(self._interval):
+                return
+
+    def close(self):
+        """Stop and write the final values."""
+        self._stop.set()
+        self._thread.join(timeout=5)
+        try:
+            self.write()
+        except OSError:
+            pass
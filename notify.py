@@ -0,0 +1,239 @@
+"""
+Asynchronous notification dispatcher for the CLI.
+
+The polling loop only calls NotificationDispatcher.notify(), which puts the
+alert on a bounded queue and returns immediately. A worker thread drains the
+queue, batches alerts that arrive within BATCH_SECONDS into one notification
+per title, drops repeats of an alert already delivered in the last
+DEDUPE_SECONDS, and hands the result to every sink. An alert only counts as
+delivered once at least one sink accepted it, so a repeat of an alert that
+every sink failed on is sent again. A failing sink is retried
+with jittered exponential backoff on the worker thread, so the polling loop
+never waits for it.
+
+Sinks are objects with a send(notification) method that raises on failure:
+
+    desktop           macOS dialog / Windows message box / notify-send, never blocking
+    stdout            print to the terminal
+    webhook=URL       POST the notification as JSON
+    file=PATH         append one JSON line; PATH may be a FIFO
+"""
+
+import json
+import os
+import platform
+import queue
+import random
+import shutil
+import stat
+import subprocess
+import threading
+import time
+from collections import namedtuple
+
+import requests
+
+QUEUE_SIZE = 100
+BATCH_SECONDS = 1.0
+DEDUPE_SECONDS = 600
+RETRIES = 3
+BACKOFF_SECONDS = 1.0
+
+# key identifies the alert for deduplication (default: title + message)
+Notification = namedtuple("Notification", "title message key")
+
+
+# ---------------------------------------------------------------------------
+# Sinks
+# ---------------------------------------------------------------------------
+
+class DesktopSink:
+    """Native dialog; the dialog runs on its own so a pending click blocks nothing."""
+
+    name = "desktop"
+
+    def send(self, notification):
+        system = platform.system()
+        if system == "Darwin":
+            script = """
+            on run argv
+                tell app "System Events"
+                    display dialog (item 2 of argv) with title (item 1 of argv)
+                end tell
+            end run
+            """
+            subprocess.Popen(
+                ["osascript", "-e", script, notification.title, notification.message],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        elif system == "Windows":
+            import ctypes
+
+            # Not a daemon: an alert flushed by NotificationDispatcher.close()
+            # stays on screen until dismissed instead of dying with the process
+            threading.Thread(
+                target=ctypes.windll.user32.MessageBoxW,
+                args=(0, notification.message, notification.title, 0),
+                name="sbat-messagebox",
+            ).start()
+        elif shutil.which("notify-send"):
+            subprocess.run(["notify-send", notification.title, notification.message], check=True, timeout=10)
+        else:  # Fallback to printing in the terminal
+            print(f"{notification.title}:\n{notification.message}")
+
+
+class StdoutSink:
+    name = "stdout"
+
+    def send(self, notification):
+        print(f"{notification.title}:\n{notification.message}", flush=True)
+
+
+class WebhookSink:
+    """POSTs {"title", "message", "ts"} as JSON to url."""
+
+    def __init__(self, url, timeout=5):
+        self.name = f"webhook {url}"
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, notification):
+        response = requests.post(
+            self.url,
+            json={"title": notification.title, "message": notification.message, "ts": time.time()},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+
+
+class FileSink:
+    """
+    Appends one JSON line per notification. On a FIFO, the write fails
+    (and is retried) instead of blocking while no reader is attached.
+    """
+
+    def __init__(self, path):
+        self.name = f"file {path}"
+        self.path = path
+
+    def send(self, notification):
+        line = json.dumps({"title": notification.title, "message": notification.message, "ts": time.time()})
+        flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT
+        try:
+            if stat.S_ISFIFO(os.stat(self.path).st_mode):
+                flags = os.O_WRONLY | os.O_NONBLOCK
+        except FileNotFoundError:
+            pass
+        fd = os.open(self.path, flags, 0o600)
+        try:
+            os.write(fd, (line + "\n").encode("utf-8"))
+        finally:
+            os.close(fd)
+
+
+def parse_sink(spec):
+    """Build a sink from a --notify value: desktop, stdout, webhook=URL or file=PATH."""
+    kind, _, arg = spec.partition("=")
+    if kind == "desktop" and not arg:
+        return DesktopSink()
+    if kind == "stdout" and not arg:
+        return StdoutSink()
+    if kind == "webhook" and arg:
+        return WebhookSink(arg)
+    if kind == "file" and arg:
+        return FileSink(arg)
+    raise ValueError(f"Unknown notification sink {spec!r} (use desktop, stdout, webhook=URL or file=PATH)")
+
+
+# ---------------------------------------------------------------------------
+# Dispatcher
+# ---------------------------------------------------------------------------
+
+class NotificationDispatcher:
+    """Bounded queue plus a worker thread that batches, dedupes and delivers notifications."""
+
+    def __init__(self, sinks, log_fn=print):
+        self.sinks = list(sinks)
+        self.dropped = 0
+        self._log = log_fn
+        self._queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self._stop = threading.Event()
+        self._delivered = {}  # key -> monotonic time of last delivery
+        self._thread = threading.Thread(target=self._worker, daemon=True, name="sbat-notify")
+        self._thread.start()
+
+    def notify(self, title, message, key=None):
+        """Queue a notification; never blocks. Drops it if the queue is full."""
+        try:
+            self._queue.put_nowait(Notification(title, message, key or (title, message)))
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout=5):
+        """Deliver what is queued (retries are cut short) and stop the worker."""
+        if self._thread.is_alive():
+            self._stop.set()
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+            self._thread.join(timeout=timeout)
+
+    def _worker(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + BATCH_SECONDS
+            while batch[-1] is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            stop = batch[-1] is None
+            for notification, keys in self._coalesce(item for item in batch if item is not None):
+                # Every sink gets its attempt, even after another one succeeded
+                delivered = [self._deliver(sink, notification) for sink in self.sinks]
+                if any(delivered):
+                    now = time.monotonic()
+                    for key in keys:
+                        self._delivered[key] = now
+            if stop:
+                return
+
+    def _coalesce(self, notifications):
+        """
+        Drop recently delivered duplicates and merge the rest per title.
+        Returns (notification, keys of the alerts merged into it) pairs.
+        """
+        now = time.monotonic()
+        for key, delivered in list(self._delivered.items()):
+            if now - delivered > DEDUPE_SECONDS:
+                del self._delivered[key]
+        merged = {}  # title -> (list of messages in arrival order, set of keys)
+        for notification in notifications:
+            if notification.key in self._delivered:
+                continue
+            messages, keys = merged.setdefault(notification.title, ([], set()))
+            keys.add(notification.key)
+            if notification.message not in messages:
+                messages.append(notification.message)
+        return [
+            (Notification(title, "\n".join(messages), title), keys)
+            for title, (messages, keys) in merged.items()
+        ]
+
+    def _deliver(self, sink, notification):
+        """Send with retries; returns True if the sink accepted the notification."""
+        for attempt in range(RETRIES + 1):
+            try:
+                sink.send(notification)
+                return True
+            except Exception as e:
+                if attempt == RETRIES or self._stop.is_set():
+                    self._log(f"Notification via {sink.name} failed: {e}")
+                    return False
+                # Exponential backoff with jitter; cut short when closing
+                self._stop.wait(BACKOFF_SECONDS * 2 ** attempt * random.uniform(0.5, 1.5))
@@ -0,0 +1,123 @@
+"""
+Browserless token refresh: replays the OIDC login redirect chain over HTTP.
+
+A silent refresh in the browser only works because the itsme IDP still
+recognises its session cookies and redirects straight back to the SBAT
+callback with a new token. HttpTokenRefresher does the same with a plain
+requests.Session: it loads the cookies of the browser context, requests the
+URL where the browser's login redirect chain started, and follows the
+Location headers until one points at the `callback?token=` URL. Nothing is
+rendered and no JavaScript runs, so a refresh costs a few round trips
+instead of a Chromium navigation.
+
+The chain ends without a token when the IDP answers with a page of its own
+(the user has to confirm on their phone: NEEDS_CONFIRMATION) or with
+anything else unexpected (FAILED). AuthSession then falls back to the
+browser.
+
+Nothing here is tied to the real hosts: the start URL and cookies are passed
+in and the IDP is recognised by a regex, so the refresher can be pointed at
+a local stand-in OIDC server.
+"""
+
+import re
+from urllib.parse import parse_qs, urljoin, urlparse
+
+import requests
+from requests.cookies import RequestsCookieJar, create_cookie
+
+from constants import USER_AGENT
+
+# Outcomes of HttpTokenRefresher.refresh()
+TOKEN = "token"
+NEEDS_CONFIRMATION = "needs_confirmation"
+FAILED = "failed"
+
+MAX_REDIRECTS = 15
+CALLBACK_URL_PATTERN = re.compile(r"callback[^#]*[?&]token=")
+IDP_URL_PATTERN = re.compile(r"^https://([^/]+\.)?itsme\.services/")
+
+
+def token_from_callback(url):
+    """Return the token query parameter of an OIDC callback URL, or None."""
+    if not CALLBACK_URL_PATTERN.search(url):
+        return None
+    values = parse_qs(urlparse(url).query).get("token", [])
+    return values[0] if values else None
+
+
+def cookies_to_jar(cookies):
+    """Playwright cookie dicts (context.storage_state()["cookies"]) -> RequestsCookieJar."""
+    jar = RequestsCookieJar()
+    for cookie in cookies:
+        expires = cookie.get("expires", -1)
+        jar.set_cookie(create_cookie(
+            cookie["name"],
+            cookie["value"],
+            domain=cookie.get("domain", ""),
+            path=cookie.get("path", "/"),
+            secure=cookie.get("secure", False),
+            expires=None if expires is None or expires < 0 else int(expires),
+            rest={"HttpOnly": None} if cookie.get("httpOnly") else {},
+        ))
+    return jar
+
+
+def jar_to_cookies(jar, previous=()):
+    """RequestsCookieJar -> Playwright cookie dicts, keeping sameSite from `previous`."""
+    same_site = {(c["name"], c.get("domain"), c.get("path")): c.get("sameSite") for c in previous}
+    return [
+        {
+            "name": cookie.name,
+            "value": cookie.value,
+            "domain": cookie.domain,
+            "path": cookie.path,
+            "expires": cookie.expires if cookie.expires is not None else -1,
+            "httpOnly": cookie.has_nonstandard_attr("HttpOnly"),
+            "secure": bool(cookie.secure),
+            "sameSite": same_site.get((cookie.name, cookie.domain, cookie.path)) or "Lax",
+        }
+        for cookie in jar
+    ]
+
+
+class HttpTokenRefresher:
+    """
+    Follows the login redirect chain from start_url with the given cookies.
+
+    After refresh(), `cookies` holds the cookie list including whatever the
+    chain set or cleared, and `last_url` the last URL requested (for logs).
+    """
+
+    def __init__(self, start_url, cookies, idp_pattern=IDP_URL_PATTERN, timeout=10):
+        self.start_url = start_url
+        self.cookies = list(cookies)
+        self.idp_pattern = idp_pattern
+        self.timeout = timeout
+        self.last_url = None
+
+    def refresh(self):
+        """Return (token, outcome) with outcome TOKEN, NEEDS_CONFIRMATION or FAILED."""
+        session = requests.Session()
+        session.headers["User-Agent"] = USER_AGENT
+        session.cookies = cookies_to_jar(self.cookies)
+        url = self.start_url
+        try:
+            for _ in range(MAX_REDIRECTS):
+                self.last_url = url
+                token = token_from_callback(url)
+                if token:
+                    return token, TOKEN  # No need to load the SPA behind the callback
+                response = session.get(url, allow_redirects=False, timeout=self.timeout)
+                if response.is_redirect:
+                    url = urljoin(url, response.headers["Location"])
+                    continue
+                if response.ok and self.idp_pattern.search(url):
+                    return None, NEEDS_CONFIRMATION
+                return None, FAILED
+            return None, FAILED
+        except requests.RequestException:
+            return None, FAILED
+        finally:
+            self.cookies = jar_to_cookies(session.cookies, self.cookies)
+            session.close()
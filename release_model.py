@@ -0,0 +1,227 @@
+"""
+Learned model of when SBAT releases new exam slots.
+
+Every time new slots first appear at a center, the Brussels time is added to
+a per-center, per-weekday histogram of 10-minute bins. The poll interval is
+then derived from that histogram instead of a fixed hour list:
+
+* around observed release peaks the checker polls every SLEEP_PEAK seconds,
+* in hours where nothing has ever been released it backs off to SLEEP_DEAD,
+* everywhere else it polls every SLEEP_DEFAULT seconds.
+
+Until enough releases have been observed, the histogram is blended with a
+prior that spreads all releases evenly over HOT_HOURS, so a fresh install
+polls during exactly the old fixed 07:00-08:00 and 16:00-17:00 hours, and at
+the old rate (SLEEP_PRIOR_PEAK) until the observations are fully trusted.
+Peaks are narrower than those full hours and dead hours are skipped, so
+once trained the model makes fewer requests per day while polling harder
+when it matters.
+
+Only releases at centers polled within MAX_POLL_GAP are learned
+(record_releases): after a restart or an outage, slots that show up may
+have appeared at any time during the gap.
+
+next_peak() turns the same decision into the start of the next peak, which
+transport.wait_for_next_cycle() uses to pre-warm connections.
+
+The model is stored as JSON in STATE_DIR and survives restarts.
+"""
+
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+import pytz
+
+from constants import (
+    HOT_HOURS,
+    RELEASE_MODEL_PATH,
+    SLEEP_DEAD,
+    SLEEP_DEFAULT,
+    SLEEP_PEAK,
+    SLEEP_PRIOR_PEAK,
+)
+
+BRUSSELS_TZ = pytz.timezone("Europe/Brussels")
+BIN_MINUTES = 10
+BINS_PER_DAY = 24 * 60 // BIN_MINUTES
+# Poll fast if now ± this many minutes holds PEAK_FACTOR times the uniform share of releases
+PEAK_WINDOW_MINUTES = 20
+PEAK_FACTOR = 3.0
+# Back off if nothing was ever released within now ± this many minutes
+DEAD_WINDOW_MINUTES = 90
+# Number of observed releases after which the prior no longer contributes
+MIN_OBSERVATIONS = 20
+# New slots are only recorded as a release for centers polled at most this many
+# seconds earlier: after a longer gap (e.g. a restart) the time is unknown
+MAX_POLL_GAP = 2 * SLEEP_DEAD
+
+
+def _bin(dt):
+    return (dt.hour * 60 + dt.minute) // BIN_MINUTES
+
+
+def _window(center, minutes):
+    """Bins covering bin `center` ± minutes, wrapping around midnight."""
+    span = minutes // BIN_MINUTES
+    return [(center + offset) % BINS_PER_DAY for offset in range(-span, span + 1)]
+
+
+def _prior():
+    """Share of releases per bin before anything was observed: even over HOT_HOURS."""
+    prior = [0.0] * BINS_PER_DAY
+    for hour in HOT_HOURS:
+        for i in range(hour * 60 // BIN_MINUTES, (hour + 1) * 60 // BIN_MINUTES):
+            prior[i] = 1.0
+    return _normalized(prior)
+
+
+def _normalized(counts):
+    total = sum(counts)
+    return [c / total for c in counts] if total else [0.0] * len(counts)
+
+
+_PRIOR = _prior()
+
+
+class ReleaseModel:
+    """Per-center, per-weekday histogram of slot release times, persisted to disk."""
+
+    def __init__(self, path=RELEASE_MODEL_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        # center -> weekday (0=Monday) -> list of BINS_PER_DAY counts
+        self.histograms = {}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("binMinutes") != BIN_MINUTES:
+            return  # Incompatible layout; start learning from scratch
+        self.histograms = {
+            center: {int(weekday): counts for weekday, counts in days.items()}
+            for center, days in data.get("centers", {}).items()
+        }
+
+    def save(self):
+        """Atomically write the model to disk."""
+        with self._lock:
+            data = {
+                "binMinutes": BIN_MINUTES,
+                "centers": {
+                    center: {str(weekday): counts for weekday, counts in days.items()}
+                    for center, days in self.histograms.items()
+                },
+            }
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def record_release(self, center, when=None):
+        """Record that new slots first appeared at `center` at `when` (default: now)."""
+        when = (when or datetime.now(BRUSSELS_TZ)).astimezone(BRUSSELS_TZ)
+        with self._lock:
+            days = self.histograms.setdefault(center, {})
+            counts = days.setdefault(when.weekday(), [0] * BINS_PER_DAY)
+            counts[_bin(when)] += 1
+
+    def record_releases(self, centers, fresh, when=None):
+        """
+        Record a release for each center in `centers` (where new slots were
+        just added) that is also in `fresh`, the centers with a snapshot no
+        older than MAX_POLL_GAP (see SlotDiff.fresh_centers): elsewhere the
+        slots may have appeared at any time before. Saves the model if
+        anything was recorded and returns the recorded centers.
+        """
+        released = set(centers) & set(fresh)
+        for center in released:
+            self.record_release(center, when)
+        if released:
+            self.save()
+        return released
+
+    @property
+    def observations(self):
+        with self._lock:
+            return sum(sum(counts) for days in self.histograms.values() for counts in days.values())
+
+    def _observed_profile(self, weekday):
+        """Observed share of releases per bin for a weekday, all centers combined."""
+        same_day = [0] * BINS_PER_DAY
+        all_days = [0] * BINS_PER_DAY
+        with self._lock:
+            for days in self.histograms.values():
+                for day, counts in days.items():
+                    for i, count in enumerate(counts):
+                        all_days[i] += count
+                        if day == weekday:
+                            same_day[i] += count
+        if not any(same_day):
+            return _normalized(all_days)
+        # Weekday-specific data dominates, the other days smooth sparse histograms
+        return [0.7 * s + 0.3 * a for s, a in zip(_normalized(same_day), _normalized(all_days))]
+
+    def _trust(self):
+        """Weight of the observations against the prior, 0 to 1."""
+        return min(1.0, self.observations / MIN_OBSERVATIONS)
+
+    def _peak_share(self, observed, trust, index):
+        """
+        Expected share of releases per bin at bin `index`, if it is a peak
+        (None otherwise). The observed releases are averaged over ±
+        PEAK_WINDOW_MINUTES to absorb jitter; the prior is taken per bin, as
+        it already covers full hours, and fades out as observations come in.
+        """
+        bins = _window(index, PEAK_WINDOW_MINUTES)
+        share = trust * sum(observed[i] for i in bins) / len(bins) + (1 - trust) * _PRIOR[index]
+        return share if share >= PEAK_FACTOR / BINS_PER_DAY else None
+
+    def sleep_time(self, now=None):
+        """Return (seconds, reason) for the sleep before the next poll cycle."""
+        now = (now or datetime.now(BRUSSELS_TZ)).astimezone(BRUSSELS_TZ)
+        observed = self._observed_profile(now.weekday())
+        trust = self._trust()
+
+        share = self._peak_share(observed, trust, _bin(now))
+        if share is not None:
+            seconds = SLEEP_PEAK if trust >= 1.0 else SLEEP_PRIOR_PEAK
+            return seconds, f"release peak ({share:.0%} of releases per {BIN_MINUTES} min)"
+
+        if trust >= 1.0:
+            if not any(observed[i] for i in _window(_bin(now), DEAD_WINDOW_MINUTES)):
+                return SLEEP_DEAD, "no releases ever seen around this time"
+
+        return SLEEP_DEFAULT, "default interval"
+
+    def next_peak(self, now=None):
+        """
+        Start of the next release peak after now (aware datetime, Brussels
+        time), within the next two days; None if there is none. A peak
+        already running counts from its end on.
+        """
+        now = (now or datetime.now(BRUSSELS_TZ)).astimezone(BRUSSELS_TZ)
+        profiles = {}  # weekday -> observed profile
+        trust = self._trust()
+
+        def is_peak(when):
+            weekday = when.weekday()
+            if weekday not in profiles:
+                profiles[weekday] = self._observed_profile(weekday)
+            return self._peak_share(profiles[weekday], trust, _bin(when)) is not None
+
+        start = now.replace(minute=now.minute - now.minute % BIN_MINUTES, second=0, microsecond=0)
+        previous = is_peak(start)
+        for step in range(1, 2 * BINS_PER_DAY + 1):
+            when = BRUSSELS_TZ.normalize(start + timedelta(minutes=step * BIN_MINUTES))
+            peak = is_peak(when)
+            if peak and not previous:
+                return when
+            previous = peak
+        return None
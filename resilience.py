@@ -0,0 +1,239 @@
+"""
+Resilient request layer shared by the CLI and the GUI.
+
+ResilientFetcher wraps checker.fetch_center with:
+
+* a token bucket limiting the overall request rate (bursts up to the
+  concurrency limit are allowed, so a normal cycle is not slowed down),
+* retries of network errors, 429 and 5xx responses with jittered
+  exponential backoff, honoring Retry-After when the API sends it; a 429
+  also pauses the token bucket (at most MAX_RETRY_WAIT), since the API
+  limits the whole client,
+* a circuit breaker per target: after CIRCUIT_THRESHOLD failed requests in
+  a row (or a Retry-After longer than MAX_RETRY_WAIT) the target is skipped
+  for a cooldown that doubles on every re-open. Then one probe request is
+  let through. Healthy targets keep being polled normally.
+
+A skipped target yields CircuitOpenError instead of a response, which
+fetch_all returns like any other per-target exception.
+"""
+
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from constants import MAX_CONCURRENT_REQUESTS, REQUESTS_PER_SECOND
+
+RETRIES = 2
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+# Longer Retry-After values open the circuit instead of blocking a worker
+MAX_RETRY_WAIT = 10.0
+CIRCUIT_THRESHOLD = 3
+CIRCUIT_COOLDOWN = 60.0
+CIRCUIT_MAX_COOLDOWN = 900.0
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_MAX):
+    """Exponential backoff with full jitter for the given 0-based retry attempt."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def retry_after_seconds(response):
+    """Seconds requested by a Retry-After header (delta or HTTP date), or None."""
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` requests per second, bursts up to `capacity`."""
+
+    def __init__(self, rate=REQUESTS_PER_SECOND, capacity=MAX_CONCURRENT_REQUESTS):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._not_before = 0.0
+        self._lock = threading.Lock()
+
+    def defer(self, seconds):
+        """Hand out no tokens for the next `seconds` (e.g. after a 429)."""
+        with self._lock:
+            self._not_before = max(self._not_before, time.monotonic() + seconds)
+
+    def acquire(self, sleep=time.sleep):
+        """
+        Block until a token is available and take it. Returns False without
+        a token if sleep returns True (e.g. a stop event's wait()).
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now >= self._not_before:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return True
+                    wait = (1 - self._tokens) / self.rate
+                else:
+                    wait = self._not_before - now
+            if sleep(wait):
+                return False
+
+
+class StopRequested(Exception):
+    """Raised instead of a request when the fetcher's sleep was interrupted by a stop."""
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request to a target whose circuit is open."""
+
+    def __init__(self, target, seconds):
+        super().__init__(f"circuit open, next attempt in {seconds:.0f}s")
+        self.target = target
+        self.seconds = seconds
+
+
+class CircuitBreaker:
+    """
+    Closed: requests pass. Open: requests are refused until the cooldown
+    ends. Half-open: a single probe passes; success closes the circuit,
+    failure re-opens it with a doubled cooldown.
+    """
+
+    def __init__(self, threshold=CIRCUIT_THRESHOLD, cooldown=CIRCUIT_COOLDOWN, max_cooldown=CIRCUIT_MAX_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.failures = 0  # Consecutive failed requests
+        self._opened = 0  # Consecutive openings, for the cooldown growth
+        self._open_until = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self._opened > 0
+
+    def remaining(self):
+        """Seconds until the next request may pass (0 if it may pass now)."""
+        return max(0.0, self._open_until - time.monotonic())
+
+    def allow(self):
+        with self._lock:
+            if not self._opened:
+                return True
+            if time.monotonic() < self._open_until or self._probing:
+                return False
+            self._probing = True  # Half-open: let exactly one request through
+            return True
+
+    def cancel(self):
+        """End a request that stopped without an outcome, so a half-open probe can be retried."""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._opened = 0
+            self._probing = False
+
+    def record_failure(self, retry_after=None):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.failures >= self.threshold or self._opened or retry_after:
+                cooldown = min(self.max_cooldown, self.cooldown * 2 ** self._opened)
+                cooldown *= random.uniform(0.8, 1.2)
+                self._open_until = time.monotonic() + max(cooldown, retry_after or 0)
+                self._opened += 1
+
+
+class ResilientFetcher:
+    """
+    Drop-in replacement for checker.fetch_center(target, headers, **kwargs)
+    adding rate limiting, retries and a circuit breaker per target.
+
+    sleep is used for rate limit and backoff waits; pass a stop event's
+    wait() to keep them interruptible. Once it returns True, no further
+    attempt is made.
+    """
+
+    def __init__(self, fetch_fn, rate=REQUESTS_PER_SECOND, burst=MAX_CONCURRENT_REQUESTS,
+                 retries=RETRIES, sleep=time.sleep):
+        self._fetch_fn = fetch_fn
+        self.bucket = TokenBucket(rate, burst)
+        self.retries = retries
+        self._sleep = sleep
+        self._breakers = {}  # target -> CircuitBreaker
+        self._lock = threading.Lock()
+
+    def breaker(self, target):
+        with self._lock:
+            breaker = self._breakers.get(target)
+            if breaker is None:
+                breaker = self._breakers[target] = CircuitBreaker()
+            return breaker
+
+    def __call__(self, target, headers, **kwargs):
+        breaker = self.breaker(target)
+        if not breaker.allow():
+            raise CircuitOpenError(target, breaker.remaining())
+        settled = False
+        try:
+            for attempt in range(self.retries + 1):
+                if not self.bucket.acquire(sleep=self._sleep):
+                    raise StopRequested()
+                error = response = None
+                try:
+                    response = self._fetch_fn(target, headers, **kwargs)
+                except Exception as e:
+                    error = e
+                if response is not None and response.status_code not in RETRYABLE_STATUS:
+                    # A 401 or other client error says nothing about the center's health
+                    breaker.record_success()
+                    settled = True
+                    return response
+
+                retry_after = retry_after_seconds(response)
+                if response is not None and response.status_code == 429 and retry_after:
+                    # Pause everyone briefly; a longer wait only opens this target's circuit
+                    self.bucket.defer(min(retry_after, MAX_RETRY_WAIT))
+                if attempt == self.retries or (retry_after or 0) > MAX_RETRY_WAIT:
+                    breaker.record_failure(retry_after)
+                    settled = True
+                    if error:
+                        raise error
+                    return response
+                if self._sleep(retry_after if retry_after is not None else backoff_delay(attempt)):
+                    # Stop requested: hand back what we have instead of retrying
+                    if error:
+                        raise error
+                    return response
+        finally:
+            if not settled:
+                # Interrupted by a stop: don't leave a half-open circuit waiting for this probe
+                breaker.cancel()
+
+    def open_circuits(self):
+        """{target: seconds until the next attempt} for every target currently skipped."""
+        with self._lock:
+            breakers = list(self._breakers.items())
+        return {target: breaker.remaining() for target, breaker in breakers if breaker.is_open}
@@ -1,149 +1,312 @@
 import argparse
-import requests
-import time
-import pytz
-import subprocess
 import sys
-import platform
+import time
+from functools import partial
 
 from constants import *
-from auth import get_token, AuthSession
-
-all_dates_seen = set()
-previous_dates = set()
-
-
-def display_dialog(center_to_data: dict[str, list[dict]]):
-    center_messages = [
-        center + " " + ", ".join({slot.get("from", "")[:10] for slot in data}) + "\\n"
-        for center, data in center_to_data.items()
-    ]
-    message = "\\n".join(center_messages)
-
-    if platform.system() == "Darwin":  # macOS
-        script = f'''
-        tell app "System Events"
-            display dialog "{message}" with title "Dates available"
-        end tell
-        '''
-        subprocess.call(["osascript", "-e", script])
-    elif platform.system() == "Windows":
-        import ctypes
-
-        ctypes.windll.user32.MessageBoxW(0, message, "Dates available", 0)
-    else:  # For other operating systems (e.g., Linux)
-        print("Dates available:\n", message)  # Fallback to printing in the terminal
-
-
-def display_error(response):
-    """Display an error dialog box, cross-platform."""
-    error_message = response.text
-    if platform.system() == "Darwin":  # macOS
-        script = """
-        on run argv
-            set dialogText to item 1 of argv
-            tell app "System Events"
-                display dialog dialogText with title "Exam crawl failure"
-            end tell
-        end run
-        """
-        subprocess.call(["osascript", "-e", script, error_message])
-    elif platform.system() == "Windows":
-        import ctypes
-
-        ctypes.windll.user32.MessageBoxW(0, error_message, "Exam crawl failure", 0)
-    else:  # For other operating systems
-        print("Error:", error_message)  # Fallback to printing in the terminal
-
-
-def get_sleep_time() -> int:
-    # Checks every 2 minutes and every 30 seconds at 7AM and 4PM (most likely time for new dates)
-    hour_in_brussels = datetime.now().astimezone(pytz.timezone("Europe/Brussels")).hour
-    return 30 if hour_in_brussels in {7, 16} else 120
-
+from auth import get_token, AuthSession, TokenManager
+from checker import ResponseCache, fetch_all, fetch_center, is_success
+from daemon import StateServer
+from hedging import HedgedFetcher
+from matrix import DEFAULT_TARGETS, MatrixScheduler, build_matrix, load_catalog
+from metrics import CYCLE_DURATION, SLEEP_SECONDS, MetricsFileWriter, MetricsServer, PollTracker, watch_token
+from notify import NotificationDispatcher, parse_sink
+from release_model import MAX_POLL_GAP, ReleaseModel
+from resilience import CircuitOpenError, ResilientFetcher
+from slot_diff import ADDED, SeenDays, SlotDiff, summarize_added
+from slot_model import decode_slots
+from slot_store import SlotStore
+from transport import prewarming_wait, wait_for_next_cycle
 
-def refresh_auth(headers: dict, session: AuthSession) -> bool:
-    """
-    Try silent token refresh via existing session, fall back to full browser re-auth.
-    Updates headers in-place. Returns True on success, False on failure.
-    """
-    print("Token expired. Attempting silent refresh...")
-    new_token = session.refresh_token()
-    if new_token:
-        print("Token refreshed silently.")
-        headers["Authorization"] = f"Bearer {new_token}"
-        return True
+all_dates_seen = SeenDays()  # Bounded: past days are evicted every cycle
+response_cache = ResponseCache()  # Skips decoding responses identical to the previous cycle
+release_model = ReleaseModel()
+poll_tracker = PollTracker()
 
-    print("Silent refresh failed. Opening browser for re-authentication...")
-    new_token = session.start()
-    if new_token:
-        headers["Authorization"] = f"Bearer {new_token}"
-        return True
 
-    print("Re-authentication failed.")
-    return False
+def get_sleep_time() -> int:
+    # Polls fast around learned release peaks (7AM and 4PM until trained) and backs off in dead hours
+    seconds, _ = release_model.sleep_time()
+    SLEEP_SECONDS.observe(seconds)
+    return seconds
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="SBAT Exam Slot Checker")
     parser.add_argument("--token", help="Manually provide a Bearer token (skip browser auth)")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=MAX_CONCURRENT_REQUESTS,
+        help=f"Maximum number of centers queried in parallel (default: {MAX_CONCURRENT_REQUESTS}, 1 = sequential)",
+    )
+    parser.add_argument("--catalog", help="JSON catalog of regions and exam centers to poll (see matrix.py)")
+    parser.add_argument("--regions", help="Comma-separated catalog regions to poll (default: all)")
+    parser.add_argument("--license-types", help="Comma-separated license types, e.g. B,AM (default: from catalog)")
+    parser.add_argument("--exam-types", help="Comma-separated exam types, e.g. E2 (default: from catalog)")
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=REQUESTS_PER_SECOND,
+        help=f"Global request rate limit (default: {REQUESTS_PER_SECOND}/s)",
+    )
+    parser.add_argument(
+        "--persist-session",
+        action="store_true",
+        default=PERSIST_BROWSER_SESSION,
+        help=f"Save the browser session to {BROWSER_STATE_PATH} so a restart can log in without itsme confirmation",
+    )
+    parser.add_argument(
+        "--hibernate-browser",
+        action="store_true",
+        default=HIBERNATE_BROWSER,
+        help="Close the browser between token refreshes to save memory (relaunched shortly before expiry)",
+    )
+    parser.add_argument(
+        "--browser-refresh",
+        action="store_true",
+        default=not HTTP_TOKEN_REFRESH,
+        help="Always refresh the token in the browser instead of replaying the login redirects over HTTP first",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Run headless and serve the slot state as JSON on a local port (see daemon.py)",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=DAEMON_PORT,
+        help=f"Port of the --daemon JSON API on {DAEMON_HOST} (default: {DAEMON_PORT})",
+    )
+    parser.add_argument(
+        "--notify",
+        action="append",
+        metavar="SINK",
+        help="Where to send alerts: desktop, stdout, webhook=URL or file=PATH (a FIFO works too). "
+             "Repeat for several sinks (default: desktop, none with --daemon)",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=METRICS_PORT,
+        help=f"Serve Prometheus metrics on http://{METRICS_HOST}:PORT/metrics (see metrics.py)",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        default=METRICS_FILE,
+        help="Write Prometheus metrics to this file every few seconds (e.g. for node_exporter's textfile collector)",
+    )
     args = parser.parse_args()
+    started = time.monotonic()
+
+    # Opened here rather than at import, so importing this module starts no writer thread
+    slot_store = SlotStore()
+    slot_diff = SlotDiff(store=slot_store)  # Restores the slots known before the last exit
+    all_dates_seen.expire()
+    for center in slot_diff.centers():
+        for slot in slot_diff.slots(center).values():
+            all_dates_seen.add(center, slot.day)
+
+    def split_arg(value):
+        return [item.strip() for item in value.split(",") if item.strip()] if value else None
+
+    # Rate limit, retries with backoff and a circuit breaker per center, on top of
+    # latency-derived request timeouts with hedging of slow requests
+    hedged = HedgedFetcher(fetch_center, max_workers=args.concurrency)
+    fetcher = ResilientFetcher(hedged, rate=args.rate, burst=args.concurrency)
+
+    # A catalog or type selection switches to the paced matrix scheduler;
+    # the default five centers keep being polled in one concurrent burst.
+    scheduler = None
+    targets = DEFAULT_TARGETS
+    if args.catalog or args.regions or args.license_types or args.exam_types:
+        targets = build_matrix(
+            load_catalog(args.catalog) if args.catalog else None,
+            regions=split_arg(args.regions),
+            license_types=split_arg(args.license_types),
+            exam_types=split_arg(args.exam_types),
+        )
+        if not targets:
+            print("The selected catalog/regions/types produce no combinations to poll. Exiting.")
+            sys.exit(1)
+        scheduler = MatrixScheduler(
+            targets, partial(fetcher, cache=response_cache), rate=args.rate, max_workers=args.concurrency
+        )
+        print(f"Polling {len(targets)} combinations at up to {args.rate} requests/s.")
+        # The scheduler never sleeps through a release window, but pre-warms ahead of one all the same
+        matrix_wait = prewarming_wait(next_window=release_model.next_peak, connections=args.concurrency)
+
+    try:
+        sinks = [parse_sink(spec) for spec in args.notify or ([] if args.daemon else ["desktop"])]
+    except ValueError as e:
+        parser.error(str(e))
+    # Alerts are delivered on a worker thread; the loop only enqueues them
+    notifier = NotificationDispatcher(sinks)
 
     # --token: manual flow, no AuthSession
     session = None
     if args.token:
         token = get_token(manual_token=args.token)
     else:
-        session = AuthSession()
+        session = AuthSession(
+            storage_state_path=BROWSER_STATE_PATH if args.persist_session else None,
+            hibernate=args.hibernate_browser,
+            http_refresh=not args.browser_refresh,
+        )
         token = session.start()
 
     if not token:
         print("Authentication failed. Exiting.")
+        notifier.close()
         if session:
             session.close()
         sys.exit(1)
 
-    headers = {
-        "Content-Type": "application/json",
-        "User-Agent": USER_AGENT,
-        "Authorization": f"Bearer {token}",
-    }
+    # Refreshes the token in the background before it expires, so polling never pauses for it
+    token_manager = TokenManager(token, session=session)
+    token_manager.start()
+
+    watch_token(lambda: token_manager)
+    metrics_server = MetricsServer(args.metrics_port) if args.metrics_port else None
+    metrics_writer = MetricsFileWriter(args.metrics_file) if args.metrics_file else None
+    if metrics_server:
+        print(f"Serving metrics on {metrics_server.address}")
+
+    # --daemon: serve the state to local clients instead of showing dialogs
+    server = None
+    if args.daemon:
+        server = StateServer(slot_store, port=args.port)
+        server.publish(slot_diff, cycle_completed=False)
+        server.start()
+        print(f"Serving /slots, /history and /status on {server.address}")
 
     try:
         while True:
+            cycle_started = time.monotonic()
+            token = token_manager.token
+            headers = token_manager.headers(token)
             check_timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
-            centers_available, new_dates = {}, set()
-            for id, center in CENTER_IDS:
-                PAYLOAD_BASE["examCenterId"] = id
-                response = requests.post(AVAILABLE_URL, headers=headers, json=PAYLOAD_BASE)
-
-                if response.status_code == 401:
-                    if session and refresh_auth(headers, session):
-                        response = requests.post(AVAILABLE_URL, headers=headers, json=PAYLOAD_BASE)
-                    else:
-                        print("Authentication failed. Exiting.")
-                        sys.exit(1)
-
-                if response.status_code != 200:
-                    print(check_timestamp, "PROBLEM", response.status_code, response.content)
-                    display_error(response)
+            events, changed, failed = [], 0, 0
+            # Centers without a recent snapshot report slots as added that may have
+            # appeared long ago (all of them, without any), which must not be learned as a release
+            baseline = slot_diff.fresh_centers(MAX_POLL_GAP)
+            if scheduler:
+                # The scheduler spreads the cycle's requests over the sleep time itself
+                results = scheduler.run_cycle(headers, get_sleep_time(), wait=matrix_wait)
+            else:
+                results = fetch_all(
+                    headers, targets, max_workers=args.concurrency, cache=response_cache, fetch_fn=fetcher,
+                    deadline=CYCLE_DEADLINE,
+                )
+
+            # Retry only the targets that got a 401, with the token that replaced the stale one
+            expired = [target for target, result in results if getattr(result, "status_code", None) == 401]
+            if expired:
+                new_token = token_manager.renew(token)
+                if not new_token:
+                    print("Authentication failed. Exiting.")
                     sys.exit(1)
+                if scheduler:
+                    # Through the scheduler's pool and pacing, so the retry respects --rate
+                    retried = dict(scheduler.retry(token_manager.headers(new_token), expired))
+                else:
+                    retried = dict(fetch_all(
+                        token_manager.headers(new_token), expired, max_workers=args.concurrency,
+                        cache=response_cache, fetch_fn=fetcher, deadline=CYCLE_DEADLINE,
+                    ))
+                results = [(target, retried.get(target, result)) for target, result in results]
 
-                if data := response.json():
-                    centers_available[center] = data
-                    new_dates = new_dates.union(
-                        {center + " " + slot.get("from", "")[:10] for slot in data}
+            # A failing center is reported and skipped; the others are still diffed
+            for target, response in results:
+                center = target.label
+                if isinstance(response, CircuitOpenError):
+                    failed += 1
+                    print(check_timestamp, f"{center}: skipped, {response}")
+                    continue
+                if isinstance(response, Exception):
+                    failed += 1
+                    print(check_timestamp, f"{center}: request failed ({response})")
+                    continue
+
+                if not is_success(response):
+                    failed += 1
+                    print(check_timestamp, "PROBLEM", center, response.status_code, response.content[:200])
+                    notifier.notify(
+                        "Exam crawl failure", f"{center}: HTTP {response.status_code} {response.text[:200]}",
+                        key=(center, response.status_code),
                     )
+                    continue
+
+                # Same bytes as last time: nothing to decode or diff
+                if response_cache.unchanged(target, response):
+                    slot_diff.touch(center)
+                    poll_tracker.polled(center)
+                    continue
+                changed += 1
+                try:
+                    slots = decode_slots(response.content)
+                except ValueError as e:
+                    failed += 1
+                    # Don't let a bad body be skipped as "unchanged" next cycle
+                    response_cache.forget(target)
+                    print(check_timestamp, f"{center}: unexpected response ({e})")
+                    continue
+                center_events = slot_diff.update(center, slots)
+                poll_tracker.polled(center, center_events, len(slot_diff.slots(center)))
+                events.extend(center_events)
+
+            response_cache.record_cycle(fast_path=not changed and not failed)
+            if started is not None:
+                print(f"First check completed {time.monotonic() - started:.1f}s after start.")
+                started = None
 
-            all_dates_seen = all_dates_seen.union(new_dates)
-            if centers_available and not new_dates.issubset(previous_dates):
-                previous_dates = new_dates
-                print(check_timestamp, centers_available.items())
-                display_dialog(centers_available)
+            added = [event for event in events if event.kind == ADDED]
+            release_model.record_releases({event.center for event in added}, baseline)
+
+            all_dates_seen.expire()
+            for event in added:
+                all_dates_seen.add(event.center, event.slot.day)
+            if server:
+                expiry = token_manager.expiry
+                server.publish(
+                    slot_diff,
+                    events,
+                    lastCheck=check_timestamp,
+                    centersPolled=len(results),
+                    tokenExpiresAt=expiry.timestamp() if expiry else None,
+                    cache=response_cache.summary(),
+                )
+            if added:
+                new_slots = summarize_added(added)
+                print(check_timestamp, new_slots)
+                for center, slots in new_slots.items():
+                    notifier.notify("Dates available", f"{center} {slots}")
             else:
-                print(check_timestamp, "nothing new going on", all_dates_seen)
+                print(
+                    check_timestamp, "nothing new going on,", all_dates_seen.summary() + ",",
+                    response_cache.summary() + ",", hedged.tracker.summary(),
+                )
 
-            time.sleep(get_sleep_time())
+            CYCLE_DURATION.observe(time.monotonic() - cycle_started)
+            if scheduler:
+                print(check_timestamp, scheduler.summary())
+            else:
+                wait_for_next_cycle(
+                    get_sleep_time(), next_window=release_model.next_peak, connections=args.concurrency
+                )
     finally:
+        token_manager.stop()
+        notifier.close()  # Flushes alerts still queued
+        hedged.close()
+        if server:
+            server.close()
+        if metrics_server:
+            metrics_server.close()
+        if metrics_writer:
+            metrics_writer.close()  # Writes the final values
+        slot_store.close()
+        if scheduler:
+            scheduler.close()
         if session:
             session.close()
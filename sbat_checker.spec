@@ -34,6 +34,7 @@ a = Analysis(
         'playwright',
         'playwright.sync_api',
         'queue',
+        'orjson',
         'pytz',
         'requests',
     ],
@@ -1,12 +1,21 @@
 # sbat_gui_qt.py
 import requests
-import pytz
 import sys
 import threading
-import queue  # For thread-safe communication
+import time
+from bisect import bisect_left
+from collections import deque
 from constants import *
-from auth import AuthSession, test_token
-from datetime import timezone
+from auth import AuthSession, TokenManager, test_token
+from checker import CycleDeadlineExceeded, ResponseCache, fetch_all, fetch_center, is_success
+from hedging import HedgedFetcher
+from metrics import CYCLE_DURATION, SLEEP_SECONDS, MetricsFileWriter, MetricsServer, PollTracker, watch_token
+from release_model import MAX_POLL_GAP, ReleaseModel
+from resilience import CircuitOpenError, ResilientFetcher
+from slot_diff import ADDED, CHANGED, REMOVED, SlotDiff, summarize_added
+from slot_model import decode_slots
+from slot_store import SlotStore
+from transport import wait_for_next_cycle
 
 # --- PySide6 Imports ---
 from PySide6.QtWidgets import (
@@ -19,47 +28,140 @@ from PySide6.QtWidgets import (
     QLabel,
     QLineEdit,
     QPushButton,
-    QTextEdit,
+    QPlainTextEdit,
     QMessageBox,
     QSizePolicy,
+    QStyle,
+    QSystemTrayIcon,
+    QTableView,
+    QHeaderView,
 )
-from PySide6.QtCore import QTimer, Qt, Slot  # Import Slot explicitly
-from PySide6.QtGui import QTextCursor, QFont  # Import QFont
+from PySide6.QtCore import (  # Import Slot explicitly
+    QAbstractTableModel,
+    QModelIndex,
+    QObject,
+    QTimer,
+    Qt,
+    Signal,
+    Slot,
+)
+from PySide6.QtGui import QFont  # Import QFont
 
 
 # --- Global Variables ---
 checking_thread = None
 stop_event = threading.Event()
-auth_token = None
+token_manager = None  # Current token; refreshed in the background when backed by auth_session
 auth_session = None  # Persistent AuthSession for itsme (enables silent refresh)
-all_dates_seen = set()
-previous_dates = set()
-gui_queue = queue.Queue()  # Queue for thread-safe GUI updates
+response_cache = ResponseCache()  # Skips decoding responses identical to the previous cycle
+slot_store = None  # On-disk slot history, written in the background; opened in __main__
+slot_diff = SlotDiff()  # Last known slots per center, restored from slot_store in __main__
+# Rate limit, retries with backoff and a circuit breaker per center; backoff waits end on stop
+# Latency-derived request timeouts, hedging slow requests
+hedged_fetcher = HedgedFetcher(fetch_center)
+fetcher = ResilientFetcher(hedged_fetcher, sleep=stop_event.wait)
+app_started = time.monotonic()  # Cleared once the time to the first check is logged
+release_model = ReleaseModel()  # Learned slot release times, persisted between runs
+poll_tracker = PollTracker()  # Slot and new-slot poll interval metrics per center
+
+
+# --- Cross-thread Signals ---
+class GuiBridge(QObject):
+    """
+    Signals from worker threads to the window. The bridge lives in the GUI
+    thread, so every emit from another thread is delivered as a queued call
+    on the GUI event loop: no polling, and nothing runs while idle.
+
+    Log lines, slot table updates and new-slot alerts share one buffer of
+    (kind, payload) items, announced with one items_pending signal per
+    burst. The window handles them in the order the workers posted them, so
+    an alert can never show up before the log lines that led to it, and
+    consecutive log lines are still appended in a single batch.
+    """
+
+    LOG = "log"
+    SLOTS_CHANGED = "slots_changed"  # payload: list of slot_diff.SlotEvent of one cycle
+    SLOTS_FOUND = "slots_found"  # payload: one line per center
+
+    items_pending = Signal()
+    itsme_auth_finished = Signal(bool)  # succeeded
+    paste_token_checked = Signal(bool)  # valid
+    token_refreshed = Signal(bool)  # was_reauth
+    reauth_needed = Signal()
+    checks_stopped = Signal(bool, str)  # token_expired, log message
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._pending = []
+
+    def _post(self, kind, payload):
+        with self._lock:
+            self._pending.append((kind, payload))
+            first = len(self._pending) == 1
+        if first:
+            self.items_pending.emit()
+
+    def log(self, message):
+        self._post(self.LOG, message)
+
+    def post_slots_changed(self, events):
+        self._post(self.SLOTS_CHANGED, events)
+
+    def post_slots_found(self, message):
+        self._post(self.SLOTS_FOUND, message)
+
+    def take(self):
+        """Return and clear the buffered (kind, payload) items, oldest first."""
+        with self._lock:
+            items, self._pending = self._pending, []
+        return items
+
+
+bridge = GuiBridge()
 
 
 # --- Utility Functions ---
 def log_message(message):
-    """Safely adds a message to the GUI log area from any thread via queue."""
-    gui_queue.put(message)
+    """Safely adds a message to the GUI log area from any thread."""
+    bridge.log(message)
+
+
+def on_auth_event(event):
+    """AuthSession event callback (called from the Playwright thread)."""
+    if event == "REAUTH_NEEDED":
+        bridge.reauth_needed.emit()
+
+
+def use_token(token, session=None):
+    """Install a new token (and the AuthSession that can refresh it, if any)."""
+    global token_manager
+    if token_manager:
+        token_manager.stop()
+    token_manager = TokenManager(
+        token, session=session, log_fn=log_message, on_refresh=on_token_refreshed
+    )
+    token_manager.start()
+
+
+def on_token_refreshed(token, was_reauth):
+    """Called from the token manager thread after every successful refresh."""
+    bridge.token_refreshed.emit(was_reauth)
 
 
 def get_sleep_time() -> int:
-    """Calculates sleep time based on Brussels time."""
+    """Calculates sleep time from the learned release model (Brussels time)."""
     try:
-        brussels_tz = pytz.timezone("Europe/Brussels")
-        now_brussels = datetime.now(brussels_tz)
-        hour_in_brussels = now_brussels.hour
-        # New slots get added at these times usually
-        if hour_in_brussels == 7 or hour_in_brussels == 16:
-            log_message(
-                f"Brussels time {now_brussels.strftime('%H:%M')}. Using short sleep (30s)."
-            )
-            return 30
+        seconds, reason = release_model.sleep_time()
+        if seconds != SLEEP_DEFAULT:
+            log_message(f"Using {seconds}s sleep: {reason}.")
+        SLEEP_SECONDS.observe(seconds)
+        return seconds
     except Exception as e:
         log_message(
-            f"Warning: Could not determine Brussels time ({e}). Defaulting to 120s sleep."
+            f"Warning: Could not determine sleep time ({e}). Defaulting to {SLEEP_DEFAULT}s sleep."
         )
-    return 120
+    return SLEEP_DEFAULT
 
 
 # --- Qt Specific Helpers ---
@@ -73,70 +175,158 @@ def show_error_dialog_qt(title, message, parent=None):
     msg_box.exec()
 
 
-def show_info_dialog_qt(title, message, parent=None):
-    """Displays a Qt info message dialog."""
-    msg_box = QMessageBox(parent)
-    msg_box.setIcon(QMessageBox.Icon.Information)
-    msg_box.setWindowTitle(title)
-    msg_box.setText(message)  # Use setText for primary message if short
-    # msg_box.setInformativeText(message) # Use for longer secondary text if needed
-    msg_box.setStandardButtons(QMessageBox.StandardButton.Ok)
-    msg_box.exec()
+# --- Qt Models ---
+class SlotTableModel(QAbstractTableModel):
+    """
+    Currently free slots, sorted by start time. Rows are inserted, removed
+    and updated one by one from SlotEvents instead of rebuilding the table.
+    """
+
+    HEADERS = ("Date", "Time", "Center", "Exam type")
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._keys = []  # Sorted (start, center, slot id), parallel to _rows
+        self._rows = []  # (center, slot)
+
+    @staticmethod
+    def _key(center, slot):
+        return (slot.start if slot.start is not None else -1, center, slot.id)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole or not index.isValid():
+            return None
+        center, slot = self._rows[index.row()]
+        return (slot.date_str, slot.time_str, center, slot.exam_type or "")[index.column()]
+
+    def reset(self, snapshot):
+        """Replace all rows with {center: iterable of slots}."""
+        self.beginResetModel()
+        rows = sorted(
+            ((self._key(center, slot), (center, slot)) for center, slots in snapshot.items() for slot in slots),
+            key=lambda row: row[0],
+        )
+        self._keys = [key for key, _ in rows]
+        self._rows = [row for _, row in rows]
+        self.endResetModel()
+
+    def apply(self, events):
+        """Apply the events of one check cycle."""
+        for event in events:
+            if event.kind == ADDED:
+                self._insert(event.center, event.slot)
+            elif event.kind == REMOVED:
+                self._remove(event.center, event.slot)
+            elif event.kind == CHANGED:
+                if self._key(event.center, event.previous) == self._key(event.center, event.slot):
+                    row = self._find(event.center, event.slot)
+                    if row is not None:
+                        self._rows[row] = (event.center, event.slot)
+                        self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.HEADERS) - 1))
+                        continue
+                self._remove(event.center, event.previous)
+                self._insert(event.center, event.slot)
+
+    def _find(self, center, slot):
+        key = self._key(center, slot)
+        row = bisect_left(self._keys, key)
+        return row if row < len(self._keys) and self._keys[row] == key else None
+
+    def _insert(self, center, slot):
+        if self._find(center, slot) is not None:
+            return
+        key = self._key(center, slot)
+        row = bisect_left(self._keys, key)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._keys.insert(row, key)
+        self._rows.insert(row, (center, slot))
+        self.endInsertRows()
+
+    def _remove(self, center, slot):
+        row = self._find(center, slot)
+        if row is None:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._keys[row]
+        del self._rows[row]
+        self.endRemoveRows()
 
 
 # --- API Interaction ---
 def run_checks():
     """The main checking loop running in the background thread."""
-    global auth_token, all_dates_seen, previous_dates
-
-    if not auth_token:
+    global app_started
+    if not token_manager:
         log_message("No valid token. Stopping checks.")
-        gui_queue.put("STOPPED_AUTH_FAILURE")
+        bridge.checks_stopped.emit(True, "Authentication failed. Please re-authenticate.")
         return
 
     log_message("Starting SBAT exam check loop...")
     while not stop_event.is_set():
-        # Rebuild headers each cycle so a silently refreshed token is picked up
-        headers = {
-            "Content-Type": "application/json",
-            "User-Agent": USER_AGENT,
-            "Authorization": f"Bearer {auth_token}",
-        }
-        centers_with_new_data = {}
-        current_run_dates = set()
+        cycle_started = time.monotonic()
+        # Read the token each cycle so a background refresh is picked up
+        manager = token_manager
+        token = manager.token
+        events, changed = [], 0
+        # Centers without a recent snapshot report slots as added that may have
+        # appeared long ago (all of them, without any), which must not be learned as a release
+        baseline = slot_diff.fresh_centers(MAX_POLL_GAP)
         request_failed_in_cycle = False
         auth_needed = False
 
-        for center_id, center_name in CENTER_IDS:
+        results = fetch_all(
+            manager.headers(token), timeout=20, cache=response_cache, fetch_fn=fetcher, deadline=CYCLE_DEADLINE
+        )
+
+        # Retry rejected centers with the rotated token instead of stopping the loop
+        expired = [target for target, result in results if getattr(result, "status_code", None) == 401]
+        if expired and not stop_event.is_set():
+            log_message("Token rejected. Retrying with a refreshed token...")
+            new_token = manager.renew(token)
+            if new_token:
+                retried = dict(
+                    fetch_all(
+                        manager.headers(new_token), expired, timeout=20, cache=response_cache, fetch_fn=fetcher,
+                        deadline=CYCLE_DEADLINE,
+                    )
+                )
+                results = [(target, retried.get(target, result)) for target, result in results]
+
+        for target, response in results:
+            center_name = target.label
             if stop_event.is_set():
                 break  # Exit loop immediately if stop is requested
 
-            payload = PAYLOAD_BASE.copy()
-            payload["examCenterId"] = center_id
-            # Ensure start date is always calculated relative to now
-            payload["startDate"] = (
-                f"{(datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')}T00:00"
-            )
-
             try:
-                response = requests.post(
-                    AVAILABLE_URL, headers=headers, json=payload, timeout=20
-                )
-
-                if response.status_code == 200:
-                    if data := response.json():
-                        center_dates = {
-                            # Use YYYY-MM-DD format consistently
-                            center_name + " " + slot.get("from", "")[:10]
-                            for slot in data
-                            if slot.get("from")  # Ensure 'from' exists
-                        }
-                        current_run_dates.update(center_dates)
-                        # Find dates for this center that haven't been seen *at all* before
-                        new_dates_for_center = center_dates - all_dates_seen
-                        if new_dates_for_center:
-                            # Store the raw data for formatting later
-                            centers_with_new_data[center_name] = data
+                if isinstance(response, Exception):
+                    raise response
+
+                if is_success(response):
+                    # Same bytes as last time: nothing to decode or diff
+                    if response_cache.unchanged(target, response):
+                        slot_diff.touch(center_name)
+                        poll_tracker.polled(center_name)
+                        continue
+                    changed += 1
+                    try:
+                        center_events = slot_diff.update(center_name, decode_slots(response.content))
+                    except Exception:
+                        # Don't let a bad body be skipped as "unchanged" next cycle
+                        response_cache.forget(target)
+                        raise
+                    poll_tracker.polled(center_name, center_events, len(slot_diff.slots(center_name)))
+                    events.extend(center_events)
 
                 elif response.status_code == 401:
                     log_message(
@@ -149,6 +339,12 @@ def run_checks():
                     # Raise an exception for non-200/401 status codes
                     response.raise_for_status()
 
+            except CircuitOpenError as skipped:
+                log_message(f"Skipping {center_name}: {skipped}")
+                request_failed_in_cycle = True
+            except CycleDeadlineExceeded as late:
+                log_message(f"Timed out checking {center_name}: {late}")
+                request_failed_in_cycle = True
             except requests.exceptions.HTTPError as http_err:
                 log_message(
                     f"HTTP error checking {center_name}: {http_err.response.status_code} - {http_err.response.text[:200]}..."
@@ -168,84 +364,57 @@ def run_checks():
 
         if auth_needed:
             log_message("Token expired. Please re-authenticate via itsme.")
-            gui_queue.put("NEEDS_REAUTH")
+            bridge.checks_stopped.emit(True, "Token expired. Please re-authenticate via itsme to continue.")
             break
 
-        # Process results only if the cycle didn't fail and wasn't interrupted for auth
-        if not request_failed_in_cycle:
-            # Find dates found in this run that were not found in the *previous* run
-            newly_found_dates_since_last = current_run_dates - previous_dates
-
-            if centers_with_new_data and newly_found_dates_since_last:
-                center_messages = []
-                log_message("--- NEW DATES FOUND! ---")
-                # Sort centers by name for consistent output
-                for center in sorted(centers_with_new_data.keys()):
-                    data = centers_with_new_data[center]
-                    # Extract unique dates found *in this run* for this center
-                    dates_in_run = sorted(
-                        list(
-                            {
-                                slot.get("from", "")[:10]
-                                for slot in data
-                                if slot.get("from")
-                            }
-                        )
-                    )
-                    # Filter to show only dates that are actually new since the last check
-                    new_dates_output = [
-                        d
-                        for d in dates_in_run
-                        if f"{center} {d}" in newly_found_dates_since_last
-                    ]
-
-                    if new_dates_output:
-                        msg = f"  {center}: {', '.join(new_dates_output)}"
-                        center_messages.append(msg)
-                        log_message(msg)  # Log each center individually
-
-                log_message("-------------------------")
-
-                if center_messages:
-                    # Send message to GUI thread to show the dialog
-                    dialog_message = "\n".join(center_messages)
-                    gui_queue.put(("SHOW_INFO", dialog_message))
-                else:
-                    # This case might happen if data structure changes or filtering is too strict
-                    log_message(
-                        "New data detected but couldn't format message (or no truly new dates)."
-                    )
+        response_cache.record_cycle(fast_path=not changed and not request_failed_in_cycle)
+        if app_started is not None:
+            log_message(f"First check completed {time.monotonic() - app_started:.1f}s after start.")
+            app_started = None
+
+        if events:
+            bridge.post_slots_changed(events)
+
+        # Centers that answered are diffed even when another center failed;
+        # a failed center keeps its previous snapshot until it answers again.
+        added = [event for event in events if event.kind == ADDED]
+        if added:
+            center_messages = []
+            log_message("--- NEW SLOTS FOUND! ---")
+            for center, slots in summarize_added(added).items():
+                msg = f"  {center}: {slots}"
+                center_messages.append(msg)
+                log_message(msg)  # Log each center individually
+            log_message("-------------------------")
+            release_model.record_releases({event.center for event in added}, baseline)
+
+            # Let the GUI thread raise the alert
+            bridge.post_slots_found("\n".join(center_messages))
+        elif not request_failed_in_cycle:
+            log_message(
+                f"No new slots detected. {slot_diff.slot_count()} slots currently available "
+                f"({response_cache.summary()}, {hedged_fetcher.tracker.summary()})."
+            )
 
-                # Update seen dates *after* processing
-                all_dates_seen.update(current_run_dates)
-                previous_dates = current_run_dates.copy()
+        if request_failed_in_cycle:
+            log_message("Check cycle completed with errors. Will retry.")
 
-            elif not newly_found_dates_since_last and not request_failed_in_cycle:
-                log_message(
-                    f"No new dates detected. Total unique dates seen so far: {len(all_dates_seen)}"
-                )
-                # Still update previous_dates even if no new ones, in case some disappeared
-                previous_dates = current_run_dates.copy()
-                # Ensure all_dates_seen includes everything from this run too
-                all_dates_seen.update(current_run_dates)
-            else:
-                # This case covers request_failed_in_cycle = True
-                log_message("Check cycle completed with errors. Will retry.")
-                # Do not update previous_dates or all_dates_seen if errors occurred
+        CYCLE_DURATION.observe(time.monotonic() - cycle_started)
 
         # --- Sleep before next cycle ---
         if not stop_event.is_set():
             sleep_duration = get_sleep_time()
             log_message(f"Sleeping for {sleep_duration} seconds...")
-            stop_event.wait(sleep_duration)  # Use wait() for interruptible sleep
+            # stop_event.wait() keeps the sleep interruptible
+            wait_for_next_cycle(
+                sleep_duration, wait=stop_event.wait, log=log_message, next_window=release_model.next_peak
+            )
 
     # --- End of While Loop ---
     log_message("Checking loop stopped.")
     # Send stop message only if not already stopped by auth failure
     if not auth_needed:  # Avoid sending duplicate stop messages
-        # Check if queue is not full before putting (optional, good practice)
-        if not gui_queue.full():
-            gui_queue.put("STOPPED_NORMAL")
+        bridge.checks_stopped.emit(False, "Checker stopped.")
 
 
 # --- Qt Application Class ---
@@ -253,7 +422,7 @@ class SbatCheckerWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("SBAT Exam Slot Checker")
-        self.setGeometry(100, 100, 600, 450)  # x, y, width, height
+        self.setGeometry(100, 100, 700, 700)  # x, y, width, height
 
         self.central_widget = QWidget()
         self.setCentralWidget(self.central_widget)
@@ -306,8 +475,11 @@ class SbatCheckerWindow(QMainWindow):
         log_group = QGroupBox("Log Output")
         log_layout = QVBoxLayout(log_group)  # Use QVBoxLayout inside group
 
-        self.log_view = QTextEdit()
+        # Plain text with a block cap: a ring buffer whose memory and append
+        # cost stay constant however long the app runs
+        self.log_view = QPlainTextEdit()
         self.log_view.setReadOnly(True)
+        self.log_view.setMaximumBlockCount(GUI_LOG_MAX_LINES)
         log_layout.addWidget(self.log_view)
         # Make log area expand vertically and horizontally
         log_group.setSizePolicy(
@@ -319,29 +491,74 @@ class SbatCheckerWindow(QMainWindow):
 
         self.main_layout.addWidget(log_group)
 
+        # --- New Slots Panel (non-modal, hidden until an alert arrives) ---
+        self.alert_group = QGroupBox("NEW DATES FOUND")
+        alert_layout = QHBoxLayout(self.alert_group)
+        self.alert_label = QLabel()
+        self.alert_label.setWordWrap(True)
+        self.alert_label.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
+        dismiss_button = QPushButton("Dismiss")
+        dismiss_button.clicked.connect(self.dismiss_alerts)
+        alert_layout.addWidget(self.alert_label, 1)
+        alert_layout.addWidget(dismiss_button, alignment=Qt.AlignmentFlag.AlignTop)
+        self.alert_group.hide()
+        self.main_layout.insertWidget(2, self.alert_group)  # Between controls and log
+        self.alerts = deque(maxlen=GUI_ALERT_HISTORY)  # Newest last
+        self.pending_alerts = []  # Alerts of the current burst, not yet notified
+
+        # Runs after every tray notification; alerts arriving meanwhile are
+        # held and sent as one notification when it fires
+        self.alert_timer = QTimer(self)
+        self.alert_timer.setSingleShot(True)
+        self.alert_timer.setInterval(GUI_ALERT_COALESCE_MS)
+        self.alert_timer.timeout.connect(self.flush_alerts)
+
+        self.tray_icon = None
+        if QSystemTrayIcon.isSystemTrayAvailable():
+            self.tray_icon = QSystemTrayIcon(
+                self.style().standardIcon(QStyle.StandardPixmap.SP_MessageBoxInformation), self
+            )
+            self.tray_icon.setToolTip("SBAT Exam Slot Checker")
+            self.tray_icon.messageClicked.connect(self.bring_to_front)
+            self.tray_icon.show()
+
+        # --- Free Slots Table ---
+        slots_group = QGroupBox("Free Slots")
+        slots_layout = QVBoxLayout(slots_group)
+        self.slot_model = SlotTableModel(self)
+        self.slot_model.reset({center: slot_diff.slots(center).values() for center in slot_diff.centers()})
+        self.slot_table = QTableView()
+        self.slot_table.setModel(self.slot_model)
+        self.slot_table.verticalHeader().setVisible(False)
+        self.slot_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.slot_table.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
+        slots_layout.addWidget(self.slot_table)
+        self.main_layout.addWidget(slots_group)
+
         # --- Initial Setup ---
         self.append_log("Launching itsme authentication...")
 
-        # --- Queue Timer ---
-        self.queue_timer = QTimer(self)
-        self.queue_timer.timeout.connect(self.process_gui_queue_qt)
-        self.queue_timer.start(100)  # Check queue every 100ms
-
-        # --- Token Refresh Timer (fires once, before token expiry) ---
-        self.refresh_timer = QTimer(self)
-        self.refresh_timer.setSingleShot(True)
-        self.refresh_timer.timeout.connect(self._on_refresh_timer)
+        # --- Worker Signals ---
+        queued = Qt.ConnectionType.QueuedConnection
+        bridge.items_pending.connect(self.flush_pending, queued)
+        bridge.itsme_auth_finished.connect(self.on_itsme_auth_finished, queued)
+        bridge.paste_token_checked.connect(self.on_paste_token_checked, queued)
+        bridge.token_refreshed.connect(self.on_token_refreshed, queued)
+        bridge.reauth_needed.connect(self._notify_reauth_needed, queued)
+        bridge.checks_stopped.connect(self.on_checks_stopped, queued)
 
         # Auto-start itsme authentication so the user doesn't need to click
         QTimer.singleShot(200, self.on_itsme_login)
 
-    def append_log(self, message):
-        """Appends a message to the Qt QTextEdit."""
+    def append_log(self, *messages):
+        """
+        Appends messages to the log view in one batch (one layout pass).
+        The view follows new lines while it is scrolled to the bottom.
+        """
+        if not messages:
+            return
         timestamp = datetime.now().strftime("%H:%M:%S")
-        self.log_view.append(f"{timestamp} - {message}")
-        # Auto-scroll to the end
-        self.log_view.moveCursor(QTextCursor.MoveOperation.End)
-        # self.log_view.ensureCursorVisible() # Alternative scrolling method
+        self.log_view.appendPlainText("\n".join(f"{timestamp} - {message}" for message in messages))
 
     @Slot()
     def on_itsme_login(self):
@@ -353,46 +570,21 @@ class SbatCheckerWindow(QMainWindow):
         # Close any existing session before starting a new one
         if auth_session:
             auth_session.close()
-        auth_session = AuthSession(log_fn=log_message, event_fn=gui_queue.put)
+        auth_session = AuthSession(
+            log_fn=log_message,
+            event_fn=on_auth_event,
+            storage_state_path=BROWSER_STATE_PATH if PERSIST_BROWSER_SESSION else None,
+            hibernate=HIBERNATE_BROWSER,
+            http_refresh=HTTP_TOKEN_REFRESH,
+        )
         threading.Thread(target=self._do_itsme_auth, daemon=True).start()
 
     def _do_itsme_auth(self):
         """Run itsme browser auth in background thread."""
-        global auth_token, auth_session
         token = auth_session.start()
         if token:
-            auth_token = token
-            gui_queue.put("ITSME_AUTH_SUCCESS")
-        else:
-            gui_queue.put("ITSME_AUTH_FAILURE")
-
-    def _schedule_token_refresh(self):
-        """Schedule a silent token refresh 5 minutes before the token expires.
-
-        Token expiry is read from the JWT exp claim so timing is exact.
-        The itsme IDP session has a shorter idle timeout than the JWT TTL,
-        so silent refresh often falls back to full re-auth regardless of
-        how early we try. Refreshing at T-5min minimises how often the user
-        is interrupted while still leaving a small buffer before the token
-        actually expires.
-        """
-        global auth_session
-        if not auth_session or not auth_session.token_expiry:
-            return
-        now_utc = datetime.now(timezone.utc)
-        seconds_until_expiry = (auth_session.token_expiry - now_utc).total_seconds()
-        refresh_in = max(0, seconds_until_expiry - 300)  # 5 min before expiry
-        self.refresh_timer.start(int(refresh_in * 1000))
-        self.append_log(
-            f"Token valid for {int(seconds_until_expiry / 60)} min. "
-            f"Silent refresh scheduled in {int(refresh_in / 60)} min."
-        )
-
-    @Slot()
-    def _on_refresh_timer(self):
-        """Fired by the refresh timer — attempt silent token refresh."""
-        self.append_log("Refreshing token silently...")
-        threading.Thread(target=self._do_silent_refresh, daemon=True).start()
+            use_token(token, auth_session)
+        bridge.itsme_auth_finished.emit(bool(token))
 
     def _notify_reauth_needed(self):
         """Send an OS-level notification and bring the window to front."""
@@ -423,32 +615,9 @@ class SbatCheckerWindow(QMainWindow):
         self.raise_()
         self.activateWindow()
 
-    def _do_silent_refresh(self):
-        """Run token refresh in background thread.
-
-        Tries silent refresh first. If the itsme session has expired,
-        auth_session automatically restores the browser window and waits for
-        the user to confirm on their phone (handled inside refresh_token()).
-        Sends REAUTH_COMPLETED so the GUI can resume checking without a
-        manual restart.
-        """
-        global auth_token, auth_session
-        if not auth_session:
-            return
-        new_token = auth_session.refresh_token()
-        if new_token:
-            auth_token = new_token
-            if auth_session.last_refresh_was_reauth:
-                gui_queue.put("REAUTH_COMPLETED")
-            else:
-                gui_queue.put("TOKEN_REFRESHED")
-        else:
-            gui_queue.put("NEEDS_REAUTH")
-
     @Slot()
     def on_paste_token(self):
         """Handle manual token paste."""
-        global auth_token
         token = self.token_entry.text().strip()
         if not token:
             show_error_dialog_qt("Input Required", "Please paste a Bearer token.", parent=self)
@@ -459,81 +628,107 @@ class SbatCheckerWindow(QMainWindow):
 
     def _test_pasted_token(self, token):
         """Test pasted token in background thread."""
-        global auth_token
-        if test_token(token):
-            auth_token = token
-            gui_queue.put("PASTE_TOKEN_VALID")
+        valid = test_token(token)
+        if valid:
+            use_token(token)  # No AuthSession: a pasted token can't be refreshed
+        bridge.paste_token_checked.emit(valid)
+
+    @Slot()
+    def flush_pending(self):
+        """Handles everything worker threads posted, in order; runs of log lines in one batch."""
+        lines = []
+        for kind, payload in bridge.take():
+            if kind == GuiBridge.LOG:
+                lines.append(payload)
+                continue
+            if lines:
+                self.append_log(*lines)
+                lines = []
+            if kind == GuiBridge.SLOTS_CHANGED:
+                self.slot_model.apply(payload)
+            elif kind == GuiBridge.SLOTS_FOUND:
+                self.on_slots_found(payload)
+        if lines:
+            self.append_log(*lines)
+
+    @Slot(bool)
+    def on_itsme_auth_finished(self, succeeded):
+        if succeeded:
+            self.append_log("itsme authentication successful! Starting checks...")
+            self.auth_status_label.setText("Authenticated via itsme")
+            self.start_checking()
         else:
-            gui_queue.put("PASTE_TOKEN_INVALID")
+            self.append_log("itsme authentication failed or timed out.")
+            self.auth_status_label.setText("Authentication failed")
+            self.itsme_button.setEnabled(True)
+            self.token_entry.setEnabled(True)
+            self.token_paste_button.setEnabled(True)
+
+    @Slot(bool)
+    def on_paste_token_checked(self, valid):
+        if valid:
+            self.append_log("Pasted token is valid. Starting checks...")
+            self.auth_status_label.setText("Authenticated (pasted token)")
+            self.start_checking()
+        else:
+            self.append_log("Pasted token is invalid or expired.")
+            show_error_dialog_qt("Invalid Token", "The pasted token is not valid.", parent=self)
+            self.token_paste_button.setEnabled(True)
+
+    @Slot(bool)
+    def on_token_refreshed(self, was_reauth):
+        self.auth_status_label.setText("Authenticated via itsme")
+        if was_reauth:
+            self.append_log("Re-authenticated via itsme. Resuming checks...")
+            self.start_checking()  # Resume if the checking loop had stopped
+
+    @Slot(bool, str)
+    def on_checks_stopped(self, token_expired, message):
+        self.append_log(message)
+        self.set_stopped_state(token_expired=token_expired)
+
+    @Slot(str)
+    def on_slots_found(self, message):
+        """
+        Shows new slots in the panel right away. The first alert of a burst
+        is notified at once; the ones that follow within
+        GUI_ALERT_COALESCE_MS are combined into one notification.
+        """
+        alert = f"{datetime.now().strftime('%H:%M:%S')}\n{message}"
+        self.alerts.append(alert)
+        self.pending_alerts.append(alert)
+        self.alert_label.setText("\n\n".join(reversed(self.alerts)))
+        self.alert_group.show()
+        if not self.alert_timer.isActive():
+            self.flush_alerts()
+
+    @Slot()
+    def flush_alerts(self):
+        """Sends one notification for the held alerts and starts a new quiet window."""
+        if not self.pending_alerts:
+            return
+        title = "NEW DATES FOUND"
+        if len(self.pending_alerts) > 1:
+            title += f" ({len(self.pending_alerts)} updates)"
+        if self.tray_icon:
+            # Replaces the previous notification on most platforms
+            self.tray_icon.showMessage(
+                title, "\n\n".join(self.pending_alerts), QSystemTrayIcon.MessageIcon.Information, 15000
+            )
+        self.pending_alerts.clear()
+        QApplication.alert(self, 0)  # Bounce the Dock icon / flash the taskbar
+        self.alert_timer.start()
 
     @Slot()
-    def process_gui_queue_qt(self):
-        """Processes messages from the queue to update the GUI."""
-        try:
-            while not gui_queue.empty():
-                message_data = gui_queue.get_nowait()
-
-                if message_data == "CACHED_TOKEN_VALID":
-                    self.append_log("Cached token is valid. Auto-starting checks...")
-                    self.auth_status_label.setText("Authenticated (cached token)")
-                    self.start_checking()
-
-                elif message_data == "CACHED_TOKEN_INVALID":
-                    self.append_log("Cached token expired. Please re-authenticate.")
-                    self.auth_status_label.setText("")
-
-                elif message_data == "ITSME_AUTH_SUCCESS":
-                    self.append_log("itsme authentication successful! Starting checks...")
-                    self.auth_status_label.setText("Authenticated via itsme")
-                    self.start_checking()
-                    self._schedule_token_refresh()
-
-                elif message_data == "TOKEN_REFRESHED":
-                    self._schedule_token_refresh()
-
-                elif message_data == "REAUTH_COMPLETED":
-                    self.append_log("Re-authenticated via itsme. Resuming checks...")
-                    self.auth_status_label.setText("Authenticated via itsme")
-                    self._schedule_token_refresh()
-                    self.start_checking()  # Resume if the checking loop had stopped
-
-                elif message_data == "ITSME_AUTH_FAILURE":
-                    self.append_log("itsme authentication failed or timed out.")
-                    self.auth_status_label.setText("Authentication failed")
-                    self.itsme_button.setEnabled(True)
-                    self.token_entry.setEnabled(True)
-                    self.token_paste_button.setEnabled(True)
-
-                elif message_data == "PASTE_TOKEN_VALID":
-                    self.append_log("Pasted token is valid. Starting checks...")
-                    self.auth_status_label.setText("Authenticated (pasted token)")
-                    self.start_checking()
-
-                elif message_data == "PASTE_TOKEN_INVALID":
-                    self.append_log("Pasted token is invalid or expired.")
-                    show_error_dialog_qt("Invalid Token", "The pasted token is not valid.", parent=self)
-                    self.token_paste_button.setEnabled(True)
-
-                elif message_data == "REAUTH_NEEDED":
-                    self._notify_reauth_needed()
-
-                elif message_data == "NEEDS_REAUTH":
-                    self.append_log("Token expired. Please re-authenticate via itsme to continue.")
-                    self.refresh_timer.stop()
-                    self.set_stopped_state(token_expired=True)
-                elif message_data == "STOPPED_AUTH_FAILURE":
-                    self.append_log("Authentication failed. Please re-authenticate.")
-                    self.set_stopped_state(token_expired=True)
-                elif message_data == "STOPPED_NORMAL":
-                    self.append_log("Checker stopped.")
-                    self.set_stopped_state(token_expired=False)
-                elif isinstance(message_data, tuple) and message_data[0] == "SHOW_INFO":
-                    show_info_dialog_qt("NEW DATES FOUND", message_data[1], parent=self)
-                elif isinstance(message_data, str):
-                    self.append_log(message_data)
-
-        except queue.Empty:
-            pass
+    def dismiss_alerts(self):
+        self.alerts.clear()
+        self.alert_group.hide()
+
+    @Slot()
+    def bring_to_front(self):
+        self.showNormal()
+        self.raise_()
+        self.activateWindow()
 
     @Slot()
     def on_check_button_clicked(self):
@@ -543,17 +738,16 @@ class SbatCheckerWindow(QMainWindow):
             self.start_checking()
 
     def start_checking(self):
-        global checking_thread, stop_event, all_dates_seen, previous_dates
+        global checking_thread, stop_event
 
         if checking_thread and checking_thread.is_alive():
             return
 
-        if not auth_token:
+        if not token_manager:
             return
 
         stop_event.clear()
-        all_dates_seen = set()
-        previous_dates = set()
+        token_manager.start()  # Resume background refresh if checking was stopped
 
         self.itsme_button.setEnabled(False)
         self.token_entry.setEnabled(False)
@@ -569,16 +763,19 @@ class SbatCheckerWindow(QMainWindow):
         if checking_thread and checking_thread.is_alive():
             self.append_log("Stopping checker...")
             stop_event.set()
-            self.refresh_timer.stop()
+            if token_manager:
+                token_manager.stop()  # Don't prompt for re-auth while idle
             self.check_button.setEnabled(False)
             self.check_button.setText("Stopping...")
 
     def set_stopped_state(self, token_expired):
         """Update GUI after checking stops."""
-        global auth_token
+        global token_manager
 
         if token_expired:
-            auth_token = None
+            if token_manager:
+                token_manager.stop()
+            token_manager = None
             self.auth_status_label.setText("Token expired")
             self.itsme_button.setEnabled(True)
             self.token_entry.setEnabled(True)
@@ -590,15 +787,14 @@ class SbatCheckerWindow(QMainWindow):
             self.token_entry.setEnabled(True)
             self.token_paste_button.setEnabled(True)
             self.check_button.setText("Start Checking")
-            self.check_button.setEnabled(bool(auth_token))
+            self.check_button.setEnabled(bool(token_manager))
 
     def closeEvent(self, event):
         """Handles window close event."""
         global checking_thread, auth_session
         self.append_log("Close requested.")
-        if self.queue_timer:
-            self.queue_timer.stop()
-        self.refresh_timer.stop()
+        if token_manager:
+            token_manager.stop()
 
         if checking_thread and checking_thread.is_alive():
             self.append_log("Stopping checker thread...")
@@ -611,6 +807,12 @@ class SbatCheckerWindow(QMainWindow):
             auth_session.close()
             auth_session = None
 
+        if self.tray_icon:
+            self.tray_icon.hide()
+
+        hedged_fetcher.close()
+        if slot_store:
+            slot_store.close()
         self.append_log("Exiting application.")
         event.accept()
 
@@ -618,6 +820,18 @@ class SbatCheckerWindow(QMainWindow):
 # --- Main Execution ---
 if __name__ == "__main__":
     app = QApplication(sys.argv)
+    slot_store = SlotStore()
+    slot_diff = SlotDiff(store=slot_store)
+    watch_token(lambda: token_manager)
+    metrics_server = MetricsServer(METRICS_PORT) if METRICS_PORT else None
+    metrics_writer = MetricsFileWriter(METRICS_FILE) if METRICS_FILE else None
     win = SbatCheckerWindow()
     win.show()
-    sys.exit(app.exec())
+    if metrics_server:
+        log_message(f"Serving metrics on {metrics_server.address}")
+    exit_code = app.exec()
+    if metrics_server:
+        metrics_server.close()
+    if metrics_writer:
+        metrics_writer.close()
+    sys.exit(exit_code)
@@ -0,0 +1,162 @@
+"""
+Slot-level change detection shared by the CLI and the GUI.
+
+SlotDiff keeps the last known slots of every center keyed on the API's slot
+`id` and turns each new response into added / removed / changed events. A
+new slot on a day that already had free slots is therefore reported too,
+which the old per-date string sets could not see.
+
+Both frontends notify on "added" events only, so their alerts are identical.
+With a SlotStore attached, the snapshots are restored at startup and every
+update is persisted, so restarts don't re-alert on known slots.
+"""
+
+import time
+from collections import namedtuple
+from datetime import date, timedelta
+
+ADDED = "added"
+REMOVED = "removed"
+CHANGED = "changed"
+
+# kind: ADDED / REMOVED / CHANGED; slot: the current slot (the last known one
+# for REMOVED); previous: the slot before a CHANGED event, else None
+SlotEvent = namedtuple("SlotEvent", "kind center slot previous")
+
+
+class SlotDiff:
+    """Per-center slot snapshots keyed on slot id, optionally backed by a SlotStore."""
+
+    def __init__(self, store=None):
+        self._slots = {}  # center -> {slot id: slot}
+        self._polled = {}  # center -> epoch seconds of its last successful poll
+        self._store = store
+        if store:
+            for center, slots in store.load_snapshot().items():
+                self._slots[center] = {slot.id: slot for slot in slots}
+            self._polled.update(store.last_polled())
+
+    def update(self, center, slots):
+        """
+        Replace the snapshot of `center` with `slots` (slot_model.Slot records)
+        and return the events.
+
+        The first update of a center reports every slot as added.
+        """
+        previous = self._slots.get(center, {})
+        current = {slot.id: slot for slot in slots}
+        events = []
+        for slot_id, slot in current.items():
+            old = previous.get(slot_id)
+            if old is None:
+                events.append(SlotEvent(ADDED, center, slot, None))
+            elif old != slot:
+                events.append(SlotEvent(CHANGED, center, slot, old))
+        if len(previous) + sum(1 for e in events if e.kind == ADDED) != len(current):
+            # Only walk the old snapshot when something actually disappeared
+            events.extend(
+                SlotEvent(REMOVED, center, slot, None)
+                for slot_id, slot in previous.items()
+                if slot_id not in current
+            )
+        self._slots[center] = current
+        self._polled[center] = time.time()
+        if self._store:
+            self._store.record(center, events)
+        return events
+
+    def touch(self, center):
+        """Record a poll of `center` whose response is known to be unchanged."""
+        self._polled[center] = time.time()
+        if self._store:
+            self._store.record(center, [])
+
+    def fresh_centers(self, max_age):
+        """
+        Centers whose snapshot is at most max_age seconds old, including one
+        restored from the store. Slots added at any other center may have
+        appeared at any time since its last poll.
+        """
+        cutoff = time.time() - max_age
+        return {center for center, polled in self._polled.items() if polled >= cutoff}
+
+    def slots(self, center):
+        """Return the current slots of a center (slot id -> slot)."""
+        return self._slots.get(center, {})
+
+    def centers(self):
+        return list(self._slots)
+
+    def slot_count(self):
+        """Total number of currently known slots across all centers."""
+        return sum(len(slots) for slots in self._slots.values())
+
+
+class SeenDays:
+    """
+    Days on which free slots were ever seen, per center.
+
+    Days are stored as integer date ordinals instead of "center YYYY-MM-DD"
+    strings, and days before the first day of the query window (tomorrow,
+    like the request's startDate) are evicted, so the set stays bounded no
+    matter how long the process runs.
+    """
+
+    def __init__(self):
+        self._days = {}  # center -> set of date ordinals
+        self._cutoff = 0
+
+    def add(self, center, ordinal):
+        """Add a date ordinal (Slot.day); days outside the window are ignored."""
+        if ordinal is not None and ordinal >= self._cutoff:
+            self._days.setdefault(center, set()).add(ordinal)
+
+    def expire(self, today=None):
+        """Drop days before the query window; only does work once per day."""
+        cutoff = ((today or date.today()) + timedelta(days=1)).toordinal()
+        if cutoff == self._cutoff:
+            return
+        self._cutoff = cutoff
+        for center in list(self._days):
+            days = {ordinal for ordinal in self._days[center] if ordinal >= cutoff}
+            if days:
+                self._days[center] = days
+            else:
+                del self._days[center]
+
+    def __len__(self):
+        return sum(len(days) for days in self._days.values())
+
+    def summary(self):
+        """Constant-size description for log lines."""
+        if not self._days:
+            return "no upcoming days with free slots seen"
+        earliest = min(min(days) for days in self._days.values())
+        return (
+            f"{len(self)} upcoming days with free slots seen at {len(self._days)} centers, "
+            f"earliest {date.fromordinal(earliest).isoformat()}"
+        )
+
+
+def summarize_added(events):
+    """
+    Group ADDED events into one human-readable line per center.
+
+    Returns {center: "YYYY-MM-DD HH:MM, HH:MM; YYYY-MM-DD HH:MM"} with centers
+    and times sorted.
+    """
+    per_center = {}
+    for event in events:
+        if event.kind != ADDED:
+            continue
+        slot = event.slot
+        per_center.setdefault(event.center, {}).setdefault(slot.date_str, set()).add(slot.time_str)
+
+    summary = {}
+    for center in sorted(per_center):
+        days = per_center[center]
+        summary[center] = "; ".join(
+            f"{day} {', '.join(sorted(t for t in days[day] if t))}".strip()
+            for day in sorted(days)
+        )
+    return summary
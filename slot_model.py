@@ -0,0 +1,201 @@
+"""
+Typed, compact representation of one exam slot from the SBAT API.
+
+Responses (see constants.response_example) are decoded straight from the
+raw bytes, with orjson (in requirements.txt and the packaged build; the
+standard json module only stands in where it is missing), into Slot records. Timestamps are parsed once into integer
+minutes since 0001-01-01 (local Brussels time, like the API), so dates can
+be compared and bucketed without string slicing. typesBlob and
+examTypesBlob are only parsed when someone asks for them.
+"""
+
+import json
+from datetime import date
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+MINUTES_PER_DAY = 24 * 60
+# Slot fields that are parsed as text; anything but a string or null is rejected
+_TEXT_FIELDS = ("from", "till", "typesBlob", "examTypesBlob")
+
+
+def parse_minutes(value):
+    """"YYYY-MM-DDTHH:MM[:SS]" -> minutes since 0001-01-01, or None."""
+    if not value or len(value) < 16:
+        return None
+    try:
+        day = date(int(value[0:4]), int(value[5:7]), int(value[8:10])).toordinal()
+        return day * MINUTES_PER_DAY + int(value[11:13]) * 60 + int(value[14:16])
+    except ValueError:
+        return None
+
+
+def format_minutes(minutes):
+    """Minutes since 0001-01-01 -> "YYYY-MM-DDTHH:MM:00" (the API's format)."""
+    if minutes is None:
+        return ""
+    day, minute_of_day = divmod(minutes, MINUTES_PER_DAY)
+    return f"{date.fromordinal(day).isoformat()}T{minute_of_day // 60:02d}:{minute_of_day % 60:02d}:00"
+
+
+class Slot:
+    """One free exam slot. Compares equal when all API fields are equal."""
+
+    __slots__ = (
+        "id",
+        "start",
+        "end",
+        "exam_center_id",
+        "day_schedule_id",
+        "exam_type",
+        "is_public",
+        "driving_school",
+        "examinee",
+        "types_blob",
+        "exam_types_blob",
+        "_types",
+        "_exam_types",
+    )
+
+    def __init__(self, id, start, end, exam_center_id=None, day_schedule_id=None, exam_type=None,
+                 is_public=True, driving_school=None, examinee=None, types_blob=None, exam_types_blob=None):
+        self.id = id
+        self.start = start  # minutes since 0001-01-01, or None
+        self.end = end
+        self.exam_center_id = exam_center_id
+        self.day_schedule_id = day_schedule_id
+        self.exam_type = exam_type
+        self.is_public = is_public
+        self.driving_school = driving_school
+        self.examinee = examinee
+        self.types_blob = types_blob
+        self.exam_types_blob = exam_types_blob
+        self._types = None
+        self._exam_types = None
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a Slot from one API slot object."""
+        return cls(
+            data.get("id"),
+            parse_minutes(data.get("from")),
+            parse_minutes(data.get("till")),
+            data.get("examCenterId"),
+            data.get("dayScheduleId"),
+            data.get("examType"),
+            data.get("isPublic", True),
+            data.get("drivingSchool"),
+            data.get("examinee"),
+            data.get("typesBlob"),
+            data.get("examTypesBlob"),
+        )
+
+    def to_dict(self):
+        """Convert back to the API's JSON shape (for storage and display)."""
+        return {
+            "id": self.id,
+            "typesBlob": self.types_blob,
+            "examTypesBlob": self.exam_types_blob,
+            "examType": self.exam_type,
+            "from": format_minutes(self.start),
+            "till": format_minutes(self.end),
+            "dayScheduleId": self.day_schedule_id,
+            "examCenterId": self.exam_center_id,
+            "drivingSchool": self.driving_school,
+            "examinee": self.examinee,
+            "isPublic": self.is_public,
+        }
+
+    @property
+    def day(self):
+        """Date ordinal of the slot start, or None."""
+        return None if self.start is None else self.start // MINUTES_PER_DAY
+
+    @property
+    def date_str(self):
+        """"YYYY-MM-DD" of the slot start."""
+        return "" if self.start is None else date.fromordinal(self.day).isoformat()
+
+    @property
+    def time_str(self):
+        """"HH:MM" of the slot start."""
+        if self.start is None:
+            return ""
+        minute_of_day = self.start % MINUTES_PER_DAY
+        return f"{minute_of_day // 60:02d}:{minute_of_day % 60:02d}"
+
+    @property
+    def types(self):
+        """License types from typesBlob, parsed on first access."""
+        if self._types is None:
+            self._types = _parse_blob(self.types_blob)
+        return self._types
+
+    @property
+    def exam_types(self):
+        """Exam types from examTypesBlob, parsed on first access."""
+        if self._exam_types is None:
+            self._exam_types = _parse_blob(self.exam_types_blob)
+        return self._exam_types
+
+    def _key(self):
+        return (
+            self.id, self.start, self.end, self.exam_center_id, self.day_schedule_id, self.exam_type,
+            self.is_public, self.driving_school, self.examinee, self.types_blob, self.exam_types_blob,
+        )
+
+    def __eq__(self, other):
+        if not isinstance(other, Slot):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f"Slot(id={self.id}, from={format_minutes(self.start)!r}, center={self.exam_center_id})"
+
+
+def _parse_blob(blob):
+    if not blob:
+        return ()
+    try:
+        return tuple(json.loads(blob))
+    except ValueError:
+        return ()
+
+
+def decode_slots(body):
+    """
+    Decode a raw availability response body into a list of Slots.
+
+    Entries without an id are dropped; an empty or null body gives [].
+    Raises ValueError if the body is not JSON, not a list, holds entries
+    that are not objects (e.g. an error object with a 200) or slots whose
+    id is not a number or string, or whose text fields are not strings.
+    """
+    data = _loads(body) if body else None
+    if data is None:
+        return []
+    if not isinstance(data, list):
+        raise ValueError(f"Expected a JSON list of slots, got {type(data).__name__}: {body[:200]!r}")
+    slots = []
+    for item in data:
+        if not isinstance(item, dict):
+            raise ValueError("Expected a JSON list of slot objects")
+        slot_id = item.get("id")
+        if slot_id is None:
+            continue
+        if not isinstance(slot_id, (int, str)):
+            raise ValueError(f"Expected a number or string as slot id, got {type(slot_id).__name__}")
+        for field in _TEXT_FIELDS:
+            value = item.get(field)
+            if value is not None and not isinstance(value, str):
+                raise ValueError(f"Slot {slot_id}: expected a string in {field!r}, got {type(value).__name__}")
+        slots.append(Slot.from_dict(item))
+    return slots
@@ -0,0 +1,212 @@
+"""
+Persistent slot state in SQLite (WAL mode).
+
+Every slot event produced by SlotDiff is appended to an `events` log and
+folded into a `slots` table holding first/last seen timestamps, so a restart
+or re-auth resumes from the last known snapshot instead of treating every
+existing slot as new. A poll only rewrites its center's row in `centers`:
+the last_seen of a slot is written when it is added, changes or disappears,
+and a slot still present was last seen at its center's last_polled.
+
+Writes are handed to a background thread through a queue and committed in
+batches, so the polling loop never waits on disk. The same thread prunes
+events and removed slots older than SLOT_HISTORY_DAYS at startup and every
+PRUNE_INTERVAL seconds, so the database stops growing once the retention
+window is full.
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from constants import SLOT_DB_PATH, SLOT_HISTORY_DAYS
+from slot_diff import REMOVED
+from slot_model import Slot
+
+# Commit at most this long after the first queued write, or earlier once
+# this many cycles are queued
+FLUSH_INTERVAL = 1.0
+MAX_BATCH = 200
+PRUNE_INTERVAL = 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS slots (
+    center TEXT NOT NULL,
+    slot_id INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    removed_at REAL,
+    PRIMARY KEY (center, slot_id)
+);
+CREATE INDEX IF NOT EXISTS slots_current ON slots (center) WHERE removed_at IS NULL;
+CREATE TABLE IF NOT EXISTS events (
+    ts REAL NOT NULL,
+    center TEXT NOT NULL,
+    slot_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+CREATE TABLE IF NOT EXISTS centers (
+    center TEXT PRIMARY KEY,
+    last_polled REAL NOT NULL
+);
+"""
+
+
+def _connect(path):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+class SlotStore:
+    """SQLite-backed slot history with a batched background writer."""
+
+    def __init__(self, path=SLOT_DB_PATH, retention_days=SLOT_HISTORY_DAYS):
+        self.path = path
+        self.retention = retention_days * 86400
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _connect(path).close()  # Create the schema before the writer starts
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._writer, daemon=True, name="sbat-store")
+        self._thread.start()
+
+    def load_snapshot(self):
+        """
+        Return the last known slots as {center: [Slot, ...]}.
+
+        Centers that were polled but had no free slots map to an empty list,
+        so they count as known too.
+        """
+        conn = _connect(self.path)
+        try:
+            snapshot = {center: [] for (center,) in conn.execute("SELECT center FROM centers")}
+            for center, data in conn.execute(
+                "SELECT center, data FROM slots WHERE removed_at IS NULL"
+            ):
+                snapshot.setdefault(center, []).append(Slot.from_dict(json.loads(data)))
+        finally:
+            conn.close()
+        return snapshot
+
+    def last_polled(self):
+        """Return {center: epoch seconds of its last recorded poll}."""
+        conn = _connect(self.path)
+        try:
+            return dict(conn.execute("SELECT center, last_polled FROM centers"))
+        finally:
+            conn.close()
+
+    def history(self, since=0.0, limit=100, center=None):
+        """
+        Return up to `limit` of the newest events after `since` (epoch
+        seconds), oldest first, as dicts with ts, center, kind and slot (the
+        API's slot object). Uses its own read-only connection, so it can be
+        called from any thread while the writer is busy.
+        """
+        query = "SELECT ts, center, kind, data FROM events WHERE ts > ?"
+        params = [since]
+        if center:
+            query += " AND center = ?"
+            params.append(center)
+        query += " ORDER BY ts DESC, rowid DESC LIMIT ?"
+        params.append(limit)
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        try:
+            rows = conn.execute(query, params).fetchall()
+        finally:
+            conn.close()
+        return [
+            {"ts": ts, "center": center, "kind": kind, "slot": json.loads(data)}
+            for ts, center, kind, data in reversed(rows)
+        ]
+
+    def record(self, center, events, when=None):
+        """Queue the outcome of one successful poll of `center` for writing."""
+        self._queue.put((center, events, when or time.time()))
+
+    def close(self):
+        """Flush pending writes and stop the writer thread."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+
+    def _writer(self):
+        conn = _connect(self.path)
+        next_prune = 0.0
+        try:
+            while True:
+                if time.monotonic() >= next_prune:
+                    self._prune(conn)
+                    next_prune = time.monotonic() + PRUNE_INTERVAL
+                batch = [self._queue.get()]
+                deadline = time.monotonic() + FLUSH_INTERVAL
+                while batch[-1] is not None and len(batch) < MAX_BATCH:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(self._queue.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+                stop = batch[-1] is None
+                items = [item for item in batch if item is not None]
+                if items:
+                    try:
+                        with conn:
+                            self._write(conn, items)
+                    except sqlite3.Error as e:
+                        print(f"Warning: could not persist slot state ({e}).")
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def _prune(self, conn):
+        """Delete events and removed slots that fell out of the retention window."""
+        cutoff = time.time() - self.retention
+        try:
+            with conn:
+                conn.execute("DELETE FROM events WHERE ts < ?", (cutoff,))
+                conn.execute("DELETE FROM slots WHERE removed_at < ?", (cutoff,))
+        except sqlite3.Error as e:
+            print(f"Warning: could not prune slot history ({e}).")
+
+    @staticmethod
+    def _write(conn, items):
+        for center, events, ts in items:
+            for event in events:
+                data = json.dumps(event.slot.to_dict())
+                slot_id = event.slot.id
+                conn.execute(
+                    "INSERT INTO events (ts, center, slot_id, kind, data) VALUES (?, ?, ?, ?, ?)",
+                    (ts, center, slot_id, event.kind, data),
+                )
+                if event.kind == REMOVED:
+                    # Still holds the previous poll: the last one the slot was in
+                    conn.execute(
+                        "UPDATE slots SET removed_at = ?, "
+                        "last_seen = COALESCE((SELECT last_polled FROM centers WHERE center = ?), last_seen) "
+                        "WHERE center = ? AND slot_id = ?",
+                        (ts, center, center, slot_id),
+                    )
+                else:
+                    conn.execute(
+                        "INSERT INTO slots (center, slot_id, data, first_seen, last_seen) "
+                        "VALUES (?, ?, ?, ?, ?) "
+                        "ON CONFLICT (center, slot_id) DO UPDATE SET "
+                        "data = excluded.data, last_seen = excluded.last_seen, removed_at = NULL",
+                        (center, slot_id, data, ts, ts),
+                    )
+            conn.execute(
+                "INSERT INTO centers (center, last_polled) VALUES (?, ?) "
+                "ON CONFLICT (center) DO UPDATE SET last_polled = excluded.last_polled",
+                (center, ts),
+            )
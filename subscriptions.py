@@ -0,0 +1,294 @@
+"""
+Subscription matching for many watchers sharing one poller.
+
+A subscription selects slots by center, date range, weekday and time of day;
+every criterion is optional. JSON form (as accepted by the daemon):
+
+    {
+        "centers": ["Brakel", "Eeklo"],
+        "from": "2026-11-01", "until": "2026-12-31",
+        "weekdays": [0, 1, 2, 3, 4],
+        "timeFrom": "08:00", "timeUntil": "12:00"
+    }
+
+SubscriptionIndex avoids testing every filter against every new slot:
+
+* subscriptions are bucketed per center (plus one bucket for "any center"),
+* within a bucket, date ranges sit in a centered interval tree, so finding
+  the subscriptions whose range contains a day costs O(log n) plus the
+  number found; no subscription outside the range is looked at,
+* the subscribers of a (center, day) pair are computed once and cached,
+  weekday included, because a diff usually brings several slots on the same
+  day; the cache is dropped whenever the subscriptions change,
+* only the time-of-day window is checked per slot, and only for the
+  subscribers that have one.
+
+Matching can never cost less than producing its result: a slot wanted by
+thousands of broad filters still walks all of them once per (center, day).
+benchmarks/bench_subscriptions.py measures the match cost for 10k subscribers,
+with broad filters (output-bound) or narrow ones (--narrow, lookup-bound).
+"""
+
+import threading
+from collections import namedtuple
+from datetime import date
+
+from slot_diff import ADDED
+from slot_model import MINUTES_PER_DAY
+
+ANY_CENTER = None
+_NO_LIMIT = 10 ** 9  # Larger than any date ordinal or minute of day
+
+
+def _parse_day(value):
+    return date.fromisoformat(value).toordinal() if value else None
+
+
+def _parse_minute(value):
+    if not value:
+        return None
+    hours, minutes = value.split(":")[:2]
+    minute = int(hours) * 60 + int(minutes)
+    if not 0 <= minute <= MINUTES_PER_DAY or not 0 <= int(minutes) < 60:
+        raise ValueError(f"Invalid time of day {value!r}, expected HH:MM")
+    return minute
+
+
+class Subscription(namedtuple(
+    "Subscription", "id centers first_day last_day weekdays start_minute end_minute"
+)):
+    """
+    One watcher's filter. centers and weekdays are frozensets or None (any);
+    days are date ordinals and minutes are minutes of the day (end exclusive),
+    each None when unbounded.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_dict(cls, subscription_id, data):
+        """Build a Subscription from its JSON form; raises ValueError on bad input."""
+        centers = data.get("centers")
+        if centers is not None and not (
+            isinstance(centers, list) and all(isinstance(center, str) for center in centers)
+        ):
+            raise ValueError("centers must be a list of center names")
+        weekdays = data.get("weekdays")
+        if weekdays is not None and not (
+            isinstance(weekdays, list) and all(0 <= int(day) <= 6 for day in weekdays)
+        ):
+            raise ValueError("weekdays must be a list of 0 (Monday) to 6 (Sunday)")
+        first_day, last_day = _parse_day(data.get("from")), _parse_day(data.get("until"))
+        if first_day is not None and last_day is not None and first_day > last_day:
+            raise ValueError("from must not be after until")
+        start_minute, end_minute = _parse_minute(data.get("timeFrom")), _parse_minute(data.get("timeUntil"))
+        if start_minute is not None and end_minute is not None and start_minute >= end_minute:
+            raise ValueError("timeFrom must be before timeUntil")
+        return cls(
+            subscription_id,
+            frozenset(centers) if centers else None,
+            first_day,
+            last_day,
+            frozenset(int(day) for day in weekdays) if weekdays is not None else None,
+            start_minute,
+            end_minute,
+        )
+
+    def to_dict(self):
+        def minute(value):
+            return None if value is None else f"{value // 60:02d}:{value % 60:02d}"
+
+        return {
+            "id": self.id,
+            "centers": sorted(self.centers) if self.centers else None,
+            "from": date.fromordinal(self.first_day).isoformat() if self.first_day is not None else None,
+            "until": date.fromordinal(self.last_day).isoformat() if self.last_day is not None else None,
+            "weekdays": sorted(self.weekdays) if self.weekdays is not None else None,
+            "timeFrom": minute(self.start_minute),
+            "timeUntil": minute(self.end_minute),
+        }
+
+    @property
+    def has_time_window(self):
+        return self.start_minute is not None or self.end_minute is not None
+
+    def in_time_window(self, minute_of_day):
+        return (self.start_minute or 0) <= minute_of_day < (self.end_minute or _NO_LIMIT)
+
+    def matches(self, center, slot):
+        """Check every criterion directly (reference for the index)."""
+        if self.centers is not None and center not in self.centers:
+            return False
+        day = slot.day
+        if day is None:
+            return False
+        if not (self.first_day or 0) <= day <= (self.last_day or _NO_LIMIT):
+            return False
+        if self.weekdays is not None and date.fromordinal(day).weekday() not in self.weekdays:
+            return False
+        return not self.has_time_window or self.in_time_window(slot.start % MINUTES_PER_DAY)
+
+
+class _IntervalNode:
+    """
+    Node of a centered interval tree: holds the ranges that contain `center`,
+    sorted by first day and by last day; ranges entirely before or after it
+    go to the left or right subtree.
+    """
+
+    __slots__ = ("center", "by_first", "by_last", "left", "right")
+
+    def __init__(self, ranges):
+        endpoints = sorted(day for first, last, _ in ranges for day in (first, last))
+        # An endpoint of some range, so this node keeps at least that range
+        self.center = center = endpoints[len(endpoints) // 2]
+        here, before, after = [], [], []
+        for item in ranges:
+            first, last, _ = item
+            (before if last < center else after if first > center else here).append(item)
+        self.by_first = sorted(here, key=lambda item: item[0])
+        self.by_last = sorted(here, key=lambda item: item[1], reverse=True)
+        self.left = _IntervalNode(before) if before else None
+        self.right = _IntervalNode(after) if after else None
+
+
+class _DateBucket:
+    """
+    Subscriptions of one center bucket, indexed on their date range.
+
+    covering(day) walks one root-to-leaf path of an interval tree, which is
+    rebuilt lazily after changes: O(log n) plus the subscriptions returned.
+    Subscriptions without any date bound are kept apart and always returned.
+    """
+
+    def __init__(self):
+        self.by_id = {}
+        self._root = None
+        self._unbounded = None  # Subscriptions without from/until; None: rebuild
+
+    def add(self, subscription):
+        self.by_id[subscription.id] = subscription
+        self._unbounded = None
+
+    def remove(self, subscription_id):
+        self._unbounded = None
+        return self.by_id.pop(subscription_id, None)
+
+    def _build(self):
+        ranges, self._unbounded = [], []
+        for s in self.by_id.values():
+            if s.first_day is None and s.last_day is None:
+                self._unbounded.append(s)
+            else:
+                ranges.append((s.first_day or 0, s.last_day or _NO_LIMIT, s))
+        self._root = _IntervalNode(ranges) if ranges else None
+
+    def covering(self, day):
+        """Subscriptions whose date range contains day."""
+        if self._unbounded is None:
+            self._build()
+        found = list(self._unbounded)
+        node = self._root
+        while node is not None:
+            if day < node.center:
+                # Every range here ends at or after center, so it contains day iff it starts by then
+                for first, _, s in node.by_first:
+                    if first > day:
+                        break
+                    found.append(s)
+                node = node.left
+            elif day > node.center:
+                for _, last, s in node.by_last:
+                    if last < day:
+                        break
+                    found.append(s)
+                node = node.right
+            else:
+                found.extend(s for _, _, s in node.by_first)
+                break
+        return found
+
+
+class SubscriptionIndex:
+    """Thread-safe registry of Subscriptions with indexed matching."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}  # center or ANY_CENTER -> _DateBucket
+        self._subscriptions = {}  # id -> Subscription
+        self._next_id = 1
+        self._day_cache = {}  # (center, day) -> (ids without time window, subscriptions with one)
+
+    def __len__(self):
+        return len(self._subscriptions)
+
+    def add(self, data):
+        """Register a subscription from its JSON form and return it (with its new id)."""
+        with self._lock:
+            subscription = Subscription.from_dict(self._next_id, data)
+            self._next_id += 1
+            self._subscriptions[subscription.id] = subscription
+            for center in subscription.centers or (ANY_CENTER,):
+                self._buckets.setdefault(center, _DateBucket()).add(subscription)
+            self._day_cache.clear()
+        return subscription
+
+    def remove(self, subscription_id):
+        """Unregister a subscription; returns False if the id is unknown."""
+        with self._lock:
+            subscription = self._subscriptions.pop(subscription_id, None)
+            if subscription is None:
+                return False
+            for center in subscription.centers or (ANY_CENTER,):
+                self._buckets[center].remove(subscription_id)
+            self._day_cache.clear()
+        return True
+
+    def get(self, subscription_id):
+        return self._subscriptions.get(subscription_id)
+
+    def _day_subscribers(self, center, day):
+        key = (center, day)
+        cached = self._day_cache.get(key)
+        if cached is None:
+            weekday = date.fromordinal(day).weekday()
+            untimed, timed = [], []
+            for bucket_key in (center, ANY_CENTER):
+                bucket = self._buckets.get(bucket_key)
+                if not bucket:
+                    continue
+                for subscription in bucket.covering(day):
+                    if subscription.weekdays is not None and weekday not in subscription.weekdays:
+                        continue
+                    (timed if subscription.has_time_window else untimed).append(subscription)
+            cached = self._day_cache[key] = ([s.id for s in untimed], timed)
+        return cached
+
+    def match_slot(self, center, slot):
+        """Return the ids of the subscriptions that want this slot."""
+        if slot.day is None:
+            return []
+        with self._lock:
+            untimed, timed = self._day_subscribers(center, slot.day)
+            minute_of_day = slot.start % MINUTES_PER_DAY
+            return untimed + [s.id for s in timed if s.in_time_window(minute_of_day)]
+
+    def match(self, events):
+        """
+        Match the ADDED events of a diff. Returns {subscription id: [events]}
+        for every subscription with at least one new slot.
+        """
+        matches = {}
+        for event in events:
+            if event.kind != ADDED:
+                continue
+            for subscription_id in self.match_slot(event.center, event.slot):
+                matches.setdefault(subscription_id, []).append(event)
+        return matches
+
+    def expire_cache(self, today=None):
+        """Drop cached days before today, so the cache stays bounded."""
+        cutoff = (today or date.today()).toordinal()
+        with self._lock:
+            for key in [key for key in self._day_cache if key[1] < cutoff]:
+                del self._day_cache[key]
@@ -0,0 +1,139 @@
+"""
+Local stand-in for the SBAT login and itsme OIDC redirect chain.
+
+    GET /login                  302 to /idp/authorize (the SBAT backend starting OIDC)
+    GET /idp/authorize          with a valid `idp_session` cookie: rotates the cookie and
+                                302s to /api/callback?code=...; without one: 200 with a
+                                "confirm on your phone" page
+    GET /api/callback?code=...  302 to /praktijk/examen/callback?token=<JWT>
+
+IDP_PATTERN recognises the /idp/ pages the way oidc_refresh.IDP_URL_PATTERN
+recognises itsme.services. `requests` records (path, idp_session cookie) of
+every request the server answered.
+"""
+
+import base64
+import itertools
+import json
+import re
+import threading
+import time
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+IDP_PATTERN = re.compile(r"^http://127\.0\.0\.1:\d+/idp/")
+SESSION_COOKIE = "idp_session"
+
+
+def make_token(serial, ttl=3600):
+    """A JWT-shaped token (unsigned) with an exp claim."""
+
+    def part(data):
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+
+    return f'{part({"alg": "none"})}.{part({"sub": serial, "exp": int(time.time()) + ttl})}.sig'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        cookie = SimpleCookie(self.headers.get("Cookie", "")).get(SESSION_COOKIE)
+        session = cookie.value if cookie else None
+        with server.lock:
+            server.requests.append((url.path, session))
+
+        if url.path == "/login":
+            self._redirect("/idp/authorize?redirect_uri=/api/callback")
+        elif url.path == "/idp/authorize":
+            if session is None or session not in server.sessions:
+                self._page("<p>Confirm your identity in the itsme app.</p>")
+                return
+            with server.lock:
+                server.sessions.discard(session)
+                rotated = f"s{next(server.serial)}"
+                server.sessions.add(rotated)
+                code = f"c{next(server.serial)}"
+                server.codes.add(code)
+            self._redirect(f"/api/callback?code={code}", {"Set-Cookie": f"{SESSION_COOKIE}={rotated}; Path=/; HttpOnly"})
+        elif url.path == "/api/callback":
+            code = parse_qs(url.query).get("code", [None])[0]
+            with server.lock:
+                valid = code in server.codes
+                server.codes.discard(code)
+                token = make_token(next(server.serial))
+            if not valid:
+                self._page("<p>Invalid code.</p>", status=400)
+                return
+            server.issued.append(token)
+            self._redirect(f"/praktijk/examen/callback?token={token}")
+        else:
+            self._page("<p>Not found.</p>", status=404)
+
+    def _redirect(self, location, headers=None):
+        self.send_response(302)
+        self.send_header("Location", location)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _page(self, html, status=200):
+        body = html.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class OidcServer:
+    """Runs the stand-in on a free local port; `sessions` holds the valid IDP sessions."""
+
+    def __init__(self):
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.lock = threading.Lock()
+        self._httpd.serial = itertools.count(1)
+        self._httpd.sessions = set()
+        self._httpd.codes = set()
+        self._httpd.requests = []
+        self._httpd.issued = []
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def login_url(self):
+        return f"{self.base_url}/login"
+
+    @property
+    def sessions(self):
+        return self._httpd.sessions
+
+    @property
+    def requests(self):
+        return self._httpd.requests
+
+    @property
+    def issued(self):
+        return self._httpd.issued
+
+    def session_cookie(self, value):
+        """A Playwright cookie dict (as in context.storage_state()) for this server."""
+        return {
+            "name": SESSION_COOKIE, "value": value, "domain": "127.0.0.1", "path": "/",
+            "expires": -1, "httpOnly": True, "secure": False, "sameSite": "Lax",
+        }
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
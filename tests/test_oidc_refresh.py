@@ -0,0 +1,106 @@
+"""
+HTTP token refresh (oidc_refresh.py, AuthSession) against the stand-in OIDC
+server in oidc_server.py. No browser is started: the AuthSession tests call
+the refresh step its Playwright thread runs for a "refresh" command.
+
+    python -m pytest tests
+"""
+
+import functools
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import auth  # noqa: E402
+from oidc_refresh import FAILED, NEEDS_CONFIRMATION, TOKEN, HttpTokenRefresher  # noqa: E402
+from oidc_server import IDP_PATTERN, SESSION_COOKIE, OidcServer  # noqa: E402
+
+
+@pytest.fixture
+def server():
+    server = OidcServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def session(server, monkeypatch):
+    """An AuthSession that saw a browser login against the stand-in server."""
+    monkeypatch.setattr(auth, "HttpTokenRefresher", functools.partial(HttpTokenRefresher, idp_pattern=IDP_PATTERN))
+    session = auth.AuthSession(log_fn=lambda msg: None, http_refresh=True)
+    session._login_url = server.login_url
+    return session
+
+
+def _session_value(cookies):
+    return next(cookie["value"] for cookie in cookies if cookie["name"] == SESSION_COOKIE)
+
+
+def test_refresher_replays_cookies_and_keeps_rotated_ones(server):
+    server.sessions.add("s-browser")
+    refresher = HttpTokenRefresher(server.login_url, [server.session_cookie("s-browser")], idp_pattern=IDP_PATTERN)
+
+    token, outcome = refresher.refresh()
+
+    assert outcome == TOKEN
+    assert token == server.issued[-1]
+    assert ("/idp/authorize", "s-browser") in server.requests
+    # The callback URL itself is not loaded
+    assert [path for path, _ in server.requests] == ["/login", "/idp/authorize", "/api/callback"]
+    rotated = _session_value(refresher.cookies)
+    assert rotated != "s-browser" and rotated in server.sessions
+
+    # The rotated cookie is what the next refresh has to present
+    token2, outcome2 = HttpTokenRefresher(server.login_url, refresher.cookies, idp_pattern=IDP_PATTERN).refresh()
+    assert outcome2 == TOKEN and token2 != token
+
+
+def test_refresher_needs_confirmation_without_idp_session(server):
+    refresher = HttpTokenRefresher(server.login_url, [server.session_cookie("s-expired")], idp_pattern=IDP_PATTERN)
+    assert refresher.refresh() == (None, NEEDS_CONFIRMATION)
+    assert refresher.last_url.startswith(f"{server.base_url}/idp/authorize")
+
+
+def test_refresher_fails_on_unexpected_page(server):
+    refresher = HttpTokenRefresher(f"{server.base_url}/elsewhere", [], idp_pattern=IDP_PATTERN)
+    assert refresher.refresh() == (None, FAILED)
+
+
+def test_auth_session_refreshes_over_http(server, session):
+    server.sessions.add("s-browser")
+    session._saved_state = {"cookies": [server.session_cookie("s-browser")], "origins": []}
+
+    token, command = session._http_refresh_first("refresh")
+
+    assert token == server.issued[-1]
+    assert session.token == token
+    assert session.token_expiry is not None
+    assert _session_value(session._saved_state["cookies"]) in server.sessions
+
+
+def test_auth_session_falls_back_to_reauth_when_phone_must_confirm(server, session):
+    session._saved_state = {"cookies": [server.session_cookie("s-expired")], "origins": []}
+
+    token, command = session._http_refresh_first("refresh")
+
+    assert token is None
+    assert command == "reauth"
+    assert session.token is None
+
+
+def test_auth_session_leaves_failed_refresh_to_the_browser(server, session):
+    session._login_url = f"{server.base_url}/elsewhere"
+    session._saved_state = {"cookies": [], "origins": []}
+
+    assert session._http_refresh_first("refresh") == (None, "refresh")
+
+
+def test_auth_session_skips_http_without_a_login_chain(server, session):
+    session._login_url = None
+    session._saved_state = {"cookies": [server.session_cookie("s-browser")], "origins": []}
+
+    assert session._http_refresh_first("refresh") == (None, "refresh")
+    assert server.requests == []
@@ -0,0 +1,89 @@
+"""
+What the release model learns from (release_model.record_releases and
+SlotDiff.fresh_centers): only slots added at a center whose previous
+snapshot is at most MAX_POLL_GAP old count as a release.
+
+    python -m pytest tests
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from release_model import MAX_POLL_GAP, ReleaseModel  # noqa: E402
+from slot_diff import ADDED, SlotDiff  # noqa: E402
+from slot_model import Slot, parse_minutes  # noqa: E402
+from slot_store import SlotStore  # noqa: E402
+
+START = parse_minutes("2026-11-02T09:00")
+
+
+def _slot(slot_id):
+    return Slot(slot_id, START + 30 * slot_id, START + 30 * slot_id + 30, exam_center_id=1)
+
+
+@pytest.fixture
+def model(tmp_path):
+    return ReleaseModel(str(tmp_path / "release_model.json"))
+
+
+def _restored_diff(tmp_path, polled_ago):
+    """A SlotDiff restored from a store whose center "A" held slot 1, polled `polled_ago` seconds ago."""
+    path = str(tmp_path / "slots.db")
+    store = SlotStore(path)
+    store.record("A", SlotDiff().update("A", [_slot(1)]), when=time.time() - polled_ago)
+    store.close()
+    store = SlotStore(path)
+    return SlotDiff(store=store), store
+
+
+def test_polled_centers_are_fresh_and_others_not():
+    slot_diff = SlotDiff()
+    slot_diff.update("A", [_slot(1)])
+    slot_diff.touch("B")
+    assert slot_diff.fresh_centers(MAX_POLL_GAP) == {"A", "B"}
+    assert slot_diff.fresh_centers(-1) == set()
+
+
+@pytest.mark.parametrize("polled_ago, fresh", [(60, {"A"}), (MAX_POLL_GAP + 60, set())])
+def test_restored_snapshot_is_fresh_only_within_the_gap(tmp_path, polled_ago, fresh):
+    slot_diff, store = _restored_diff(tmp_path, polled_ago)
+    try:
+        assert set(slot_diff.slots("A")) == {1}
+        assert slot_diff.fresh_centers(MAX_POLL_GAP) == fresh
+    finally:
+        store.close()
+
+
+def test_record_releases_learns_only_fresh_centers(model):
+    assert model.record_releases({"A", "B"}, {"A", "C"}) == {"A"}
+    assert model.observations == 1
+    assert set(ReleaseModel(model.path).histograms) == {"A"}
+
+
+def test_record_releases_without_fresh_centers_saves_nothing(model):
+    assert model.record_releases({"A"}, set()) == set()
+    assert model.observations == 0
+    assert not os.path.exists(model.path)
+
+
+def test_slots_found_after_a_long_gap_are_learned_only_from_the_next_poll(tmp_path, model):
+    slot_diff, store = _restored_diff(tmp_path, MAX_POLL_GAP + 60)
+    try:
+        # First poll after the restart: slot 2 appeared at some time during the gap
+        baseline = slot_diff.fresh_centers(MAX_POLL_GAP)
+        added = [event for event in slot_diff.update("A", [_slot(1), _slot(2)]) if event.kind == ADDED]
+        assert [event.slot.id for event in added] == [2]
+        assert model.record_releases({event.center for event in added}, baseline) == set()
+
+        # The next poll follows right after: slot 3 is a release
+        baseline = slot_diff.fresh_centers(MAX_POLL_GAP)
+        added = [event for event in slot_diff.update("A", [_slot(1), _slot(2), _slot(3)]) if event.kind == ADDED]
+        assert model.record_releases({event.center for event in added}, baseline) == {"A"}
+        assert model.observations == 1
+    finally:
+        store.close()
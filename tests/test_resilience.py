@@ -0,0 +1,64 @@
+"""
+Circuit breaker of ResilientFetcher (resilience.py): a half-open probe that is
+interrupted by a stop must not keep the target's circuit closed to probes.
+
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from resilience import CircuitOpenError, ResilientFetcher, StopRequested  # noqa: E402
+
+
+class _Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.headers = {}
+
+
+def _half_open_fetcher(statuses):
+    """A fetcher whose circuit for "A" is open with its cooldown already over."""
+    fetcher = ResilientFetcher(lambda target, headers: _Response(statuses.pop(0)), rate=1000, retries=0,
+                               sleep=lambda seconds: False)
+    breaker = fetcher.breaker("A")
+    for _ in range(breaker.threshold):
+        breaker.record_failure()
+    breaker._open_until = 0.0
+    assert breaker.is_open
+    return fetcher
+
+
+def _stop_in_rate_limit(fetcher):
+    fetcher.bucket._tokens = 0.0
+    fetcher._sleep = lambda seconds: True
+    with pytest.raises(StopRequested):
+        fetcher("A", {})
+
+
+def _stop_in_backoff(fetcher):
+    fetcher.retries = 1
+    fetcher._sleep = lambda seconds: True
+    assert fetcher("A", {}).status_code == 503
+
+
+@pytest.mark.parametrize("interrupt, statuses", [(_stop_in_rate_limit, [200]), (_stop_in_backoff, [503, 200])])
+def test_interrupted_probe_lets_the_next_probe_through(interrupt, statuses):
+    fetcher = _half_open_fetcher(statuses)
+    interrupt(fetcher)
+
+    fetcher._sleep = lambda seconds: False
+    fetcher.bucket._tokens = float(fetcher.bucket.capacity)
+    assert fetcher("A", {}).status_code == 200
+    assert not fetcher.breaker("A").is_open
+
+
+def test_concurrent_request_is_refused_while_probing():
+    fetcher = _half_open_fetcher([])
+    assert fetcher.breaker("A").allow()
+    with pytest.raises(CircuitOpenError):
+        fetcher("A", {})
@@ -0,0 +1,108 @@
+"""
+SubscriptionIndex (subscriptions.py) against brute force: every match must
+equal testing Subscription.matches on every registered subscription, while
+subscriptions come and go.
+
+    python -m pytest tests
+"""
+
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from slot_diff import ADDED, REMOVED, SlotEvent  # noqa: E402
+from slot_model import MINUTES_PER_DAY, Slot  # noqa: E402
+from subscriptions import SubscriptionIndex, _DateBucket  # noqa: E402
+
+CENTERS = ["Brakel", "Eeklo", "Gent", "Sint-Niklaas"]
+FIRST = date(2026, 11, 1)
+DAYS = [FIRST + timedelta(days=offset) for offset in range(45)]
+
+
+def _random_subscription(rng):
+    data = {}
+    if rng.random() < 0.6:
+        data["centers"] = rng.sample(CENTERS, rng.randint(1, 3))
+    bounds = rng.choice(["none", "from", "until", "both", "both", "both", "single"])
+    first, last = sorted(rng.sample(range(len(DAYS)), 2))
+    if bounds == "single":
+        last = first
+    if bounds in ("from", "both", "single"):
+        data["from"] = DAYS[first].isoformat()
+    if bounds in ("until", "both", "single"):
+        data["until"] = DAYS[last].isoformat()
+    if rng.random() < 0.3:
+        data["weekdays"] = rng.sample(range(7), rng.randint(1, 6))
+    if rng.random() < 0.3:
+        start, end = sorted(rng.sample(range(6, 20), 2))
+        data["timeFrom"], data["timeUntil"] = f"{start:02d}:00", f"{end:02d}:30"
+    elif rng.random() < 0.1:
+        data["timeFrom"] = "12:00"
+    return data
+
+
+def _events(rng, count):
+    events = []
+    for slot_id in range(count):
+        # A few slots outside the range every subscription could cover
+        day = rng.choice(DAYS + [FIRST - timedelta(days=3), DAYS[-1] + timedelta(days=3)])
+        start = day.toordinal() * MINUTES_PER_DAY + rng.randrange(6 * 60, 21 * 60, 15)
+        slot = Slot(slot_id, start, start + 30)
+        events.append(SlotEvent(ADDED if slot_id % 7 else REMOVED, rng.choice(CENTERS), slot, None))
+    return events
+
+
+def _brute_force(index, events):
+    matches = {}
+    for event in events:
+        if event.kind != ADDED:
+            continue
+        for subscription in index._subscriptions.values():
+            if subscription.matches(event.center, event.slot):
+                matches.setdefault(subscription.id, []).append(event)
+    return matches
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_index_matches_brute_force_under_churn(seed):
+    rng = random.Random(seed)
+    index = SubscriptionIndex()
+    for _ in range(40):
+        for _ in range(rng.randint(1, 15)):
+            index.add(_random_subscription(rng))
+        for subscription_id in rng.sample(sorted(index._subscriptions), min(len(index), rng.randint(0, 8))):
+            assert index.remove(subscription_id)
+        events = _events(rng, 60)
+        assert index.match(events) == _brute_force(index, events)
+
+
+def _node_centers(node):
+    while node is not None:
+        yield node.center
+        yield from _node_centers(node.left)
+        node = node.right
+
+
+def test_days_on_node_centers_and_range_ends():
+    rng = random.Random(42)
+    bucket = _DateBucket()
+    subscriptions = SubscriptionIndex()
+    for _ in range(300):
+        subscription = subscriptions.add(_random_subscription(rng))
+        bucket.add(subscription)
+    bucket.covering(DAYS[0].toordinal())  # Builds the tree
+    first, last = DAYS[0].toordinal(), DAYS[-1].toordinal()
+    days = {center for center in _node_centers(bucket._root) if first <= center <= last}
+    assert days  # The random ranges put their endpoints, and so node centers, on these days
+    for s in bucket.by_id.values():
+        days.update(day for day in (s.first_day, s.last_day) if day is not None)
+    for day in sorted(days):
+        expected = {
+            s.id for s in bucket.by_id.values() if (s.first_day or 0) <= day <= (s.last_day or 10 ** 9)
+        }
+        assert {s.id for s in bucket.covering(day)} == expected
@@ -0,0 +1,181 @@
+"""
+Shared HTTP transport for all SBAT API calls.
+
+A single requests.Session keeps TCP/TLS connections to the API host alive
+between cycles, with a connection pool large enough for the concurrent
+fan-out in checker.fetch_all(). Shortly before a release window (the next
+peak of the learned release model, see wait_for_next_cycle and, for the
+matrix scheduler, prewarming_wait) the pools are pre-warmed, so the first
+polls of a window don't pay for DNS, TCP and TLS setup. A second session
+with its own pool carries hedged requests (see hedging.py), so a hedge never waits behind the stalled
+connection it is meant to bypass.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytz
+import requests
+from requests.adapters import HTTPAdapter
+
+from constants import (
+    AVAILABLE_URL,
+    MAX_CONCURRENT_REQUESTS,
+    PREWARM_LEAD_SECONDS,
+    USER_AGENT,
+)
+
+try:
+    import brotli  # noqa: F401 — urllib3 decodes "br" bodies when available
+
+    ACCEPT_ENCODING = "br, gzip, deflate"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+BRUSSELS_TZ = pytz.timezone("Europe/Brussels")
+
+_sessions = {}  # "primary" / "hedge" -> requests.Session
+_session_lock = threading.Lock()
+_pool_size = MAX_CONCURRENT_REQUESTS  # Keep-alive connections kept per session
+
+
+def _mount(session):
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=_pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+
+def _get(name):
+    with _session_lock:
+        session = _sessions.get(name)
+        if session is None:
+            session = requests.Session()
+            _mount(session)
+            session.headers.update({
+                "User-Agent": USER_AGENT,
+                "Accept-Encoding": ACCEPT_ENCODING,
+                "Connection": "keep-alive",
+            })
+            _sessions[name] = session
+        return session
+
+
+def set_pool_size(size):
+    """
+    Keep at least `size` connections alive per session, e.g. for a
+    --concurrency above MAX_CONCURRENT_REQUESTS. Pools only ever grow.
+    """
+    global _pool_size
+    with _session_lock:
+        if size <= _pool_size:
+            return
+        _pool_size = size
+        for session in _sessions.values():
+            _mount(session)
+
+
+def get_session():
+    """Return the process-wide keep-alive session, creating it on first use."""
+    return _get("primary")
+
+
+def get_hedge_session():
+    """Return the separate keep-alive session used for hedged requests."""
+    return _get("hedge")
+
+
+def post(url, session=None, **kwargs):
+    """requests.post() over the shared session (or the given one)."""
+    return (session or get_session()).post(url, **kwargs)
+
+
+def prewarm(url=AVAILABLE_URL, connections=MAX_CONCURRENT_REQUESTS, timeout=5):
+    """
+    Open up to `connections` keep-alive connections to the host of `url` in
+    both the primary and the hedge session.
+
+    Sends unauthenticated OPTIONS requests in parallel; the status code does
+    not matter, only that DNS is resolved and the TLS connections end up in
+    the pools. Returns the number of requests that got any response.
+    """
+    def warm(session):
+        try:
+            # Reading the body hands the connection back to the pool
+            session.options(url, timeout=timeout).content
+            return True
+        except requests.exceptions.RequestException:
+            return False
+
+    sessions = [get_session(), get_hedge_session()] * max(1, connections)
+    with ThreadPoolExecutor(max_workers=len(sessions), thread_name_prefix="sbat-warm") as pool:
+        return sum(pool.map(warm, sessions))
+
+
+def _next_window(next_window):
+    """(window start, seconds until it) from next_window(now), or (None, None)."""
+    now = datetime.now(BRUSSELS_TZ)
+    window = next_window(now) if next_window else None
+    return window, (window - now).total_seconds() if window else None
+
+
+def _prewarm_for(window, connections, log):
+    warmed = prewarm(connections=connections)
+    log(f"Pre-warmed {warmed} connection(s) for the {window.strftime('%H:%M')} release window.")
+
+
+def wait_for_next_cycle(duration, wait=time.sleep, log=print, next_window=None,
+                        connections=MAX_CONCURRENT_REQUESTS):
+    """
+    Sleep `duration` seconds before the next poll cycle.
+
+    next_window(now) returns the start of the next release window (aware
+    datetime) or None, e.g. ReleaseModel.next_peak, so pre-warming follows
+    the same learned schedule as the poll interval. If a window opens during
+    the sleep, wake PREWARM_LEAD_SECONDS before it, pre-warm `connections`
+    connections per session (the concurrency the pools were sized for) and
+    resume polling right at the window start instead of sleeping through it.
+
+    wait is called with a number of seconds; if it returns True (e.g.
+    threading.Event.wait on a stop event) the sleep is aborted and True is
+    returned.
+    """
+    window, until_window = _next_window(next_window)
+
+    if until_window is None or until_window >= duration:
+        return bool(wait(duration))
+
+    if until_window > PREWARM_LEAD_SECONDS and wait(until_window - PREWARM_LEAD_SECONDS):
+        return True
+    _prewarm_for(window, connections, log)
+    remaining = (window - datetime.now(BRUSSELS_TZ)).total_seconds()
+    return bool(wait(remaining)) if remaining > 0 else False
+
+
+def prewarming_wait(wait=time.sleep, log=print, next_window=None, connections=MAX_CONCURRENT_REQUESTS):
+    """
+    Wrap wait(seconds) for loops that keep polling through release windows,
+    like MatrixScheduler.run_cycle: every sleep lasts as long as asked, but
+    the pools are pre-warmed once, PREWARM_LEAD_SECONDS before each window
+    that opens during (or just after) a sleep. Returns True if wait did.
+    """
+    warmed = {"window": None}
+
+    def prewarming(seconds):
+        started = time.monotonic()
+        window, until_window = _next_window(next_window)
+        if (
+            until_window is None
+            or window == warmed["window"]
+            or until_window - PREWARM_LEAD_SECONDS >= seconds
+        ):
+            return bool(wait(seconds))
+        if until_window > PREWARM_LEAD_SECONDS and wait(until_window - PREWARM_LEAD_SECONDS):
+            return True
+        warmed["window"] = window
+        _prewarm_for(window, connections, log)
+        remaining = seconds - (time.monotonic() - started)
+        return bool(wait(remaining)) if remaining > 0 else False
+
+    return prewarming